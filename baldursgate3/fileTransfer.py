@@ -0,0 +1,226 @@
+import errno
+import json
+import os
+import shutil
+from pathlib import Path
+
+_ERROR_NOT_SAME_DEVICE = 17  # Windows
+_COPY_CHUNK = 8 * 1024 * 1024
+_SYNC_MANIFEST_FORMAT = 1
+
+
+def _is_cross_device(e: OSError) -> bool:
+    return e.errno == errno.EXDEV or getattr(e, "winerror", None) == _ERROR_NOT_SAME_DEVICE
+
+
+def _copy_data(src: str, dst: str):
+    # copy_file_range lets the kernel (or a reflink capable filesystem) copy without going through
+    # Python; everywhere else shutil streams in chunks instead of reading the whole file.
+    if hasattr(os, "copy_file_range"):
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), _COPY_CHUNK):
+                    pass
+                return
+            except OSError:
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+                shutil.copyfileobj(fsrc, fdst, _COPY_CHUNK)
+                return
+    shutil.copyfile(src, dst)
+
+
+def copy_file(src: str, dst: str, link=True):
+    tmp = f"{dst}.part"
+    if os.path.lexists(tmp):
+        # Left over by an interrupted copy; it may be a hard link of src, which writing would truncate.
+        os.unlink(tmp)
+    try:
+        if link:
+            try:
+                os.link(src, tmp)
+            except OSError:
+                _copy_data(src, tmp)
+        else:
+            _copy_data(src, tmp)
+        os.replace(tmp, dst)
+        if os.path.lexists(tmp):
+            # dst already was a hard link of src: rename() leaves both names alone.
+            os.unlink(tmp)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# Replaces dst with data in one step, leaving the file (and its timestamp) alone when nothing changed.
+def write_if_changed(dst, data: bytes) -> bool:
+    try:
+        with open(dst, "rb") as f:
+            if f.read(len(data) + 1) == data:
+                return False
+    except OSError:
+        pass
+    tmp = f"{dst}.part"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def move_file(src: str, dst: str):
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if not _is_cross_device(e):
+            raise
+        copy_file(src, dst, link=False)
+        os.unlink(src)
+
+
+def prune_empty_dirs(root):
+    root = str(root)
+    for dirpath, _, _ in os.walk(root, topdown=False):
+        if dirpath != root:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+
+# Moves (or copies, keeping the source) every file below src_root into dest_root in parallel.
+# Moves within a volume are a rename; copies try a hardlink first. Returns the files that failed.
+def transfer_tree(src_root, dest_root, move=False, replace_existing=True, max_workers=None) -> list[tuple[Path, Exception]]:
+    src_root = str(src_root)
+    dest_root = str(dest_root)
+    jobs = []
+    for dirpath, _, filenames in os.walk(src_root):
+        if not filenames:
+            continue
+        dest_dir = os.path.join(dest_root, os.path.relpath(dirpath, src_root))
+        os.makedirs(dest_dir, exist_ok=True)
+        for name in filenames:
+            dest_file = os.path.join(dest_dir, name)
+            if replace_existing or not os.path.exists(dest_file):
+                jobs.append((os.path.join(dirpath, name), dest_file))
+
+    failures = _transfer_all(jobs, move, max_workers)
+    if move:
+        prune_empty_dirs(src_root)
+    return failures
+
+
+def _transfer_all(jobs, move=False, max_workers=None) -> list[tuple[Path, Exception]]:
+    def transfer(job):
+        src, dst = job
+        try:
+            if move:
+                move_file(src, dst)
+            else:
+                copy_file(src, dst)
+        except Exception as e:
+            return Path(src), e
+        return None
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    max_workers = max_workers or min(8, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [failure for failure in executor.map(transfer, jobs) if failure is not None]
+
+
+def _load_sync_manifest(manifest_path, src_root, dest_root) -> dict:
+    try:
+        payload = json.loads(Path(manifest_path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if payload.get("format") != _SYNC_MANIFEST_FORMAT or payload.get("source") != src_root or payload.get("destination") != dest_root:
+        return {}
+    return payload.get("dirs", {})
+
+
+def _dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Copies the files below src_root into dest_root like transfer_tree(), but only looks at the files
+# that are new or changed since the last sync. manifest_path keeps, per folder, the (size, mtime) of
+# every source file already synced and the destination folder's mtime: when that mtime moved (files
+# were added to or removed from the copy), the folder's files are checked against the destination
+# again. Without replace_existing, files already synced aren't even stat'ed. The manifest is replaced in one step once the copies are done and only lists files whose
+# copy succeeded, so a sync interrupted by a crash is simply redone. Returns the files that failed.
+def sync_tree(src_root, dest_root, manifest_path, replace_existing=True, max_workers=None) -> list[tuple[Path, Exception]]:
+    src_root = os.path.abspath(src_root)
+    dest_root = os.path.abspath(dest_root)
+    previous = _load_sync_manifest(manifest_path, src_root, dest_root)
+    synced: dict[str, dict[str, list[int]]] = {}
+    jobs = []
+    pending: dict[Path, str] = {}
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        try:
+            with os.scandir(os.path.join(src_root, relative)) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        dest_dir = os.path.join(dest_root, relative)
+        known_mtime, known_files = previous.get(relative, (None, {}))
+        trusted = known_mtime is not None and known_mtime == _dir_mtime(dest_dir)
+        files = {}
+        created = False
+        for entry in entries:
+            if entry.is_dir():
+                stack.append(os.path.join(relative, entry.name))
+                continue
+            known = known_files.get(entry.name) if trusted else None
+            if known is not None and not replace_existing:
+                # Its copy is still there and is never replaced, whatever happened to the file.
+                files[entry.name] = known
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            key = [st.st_size, st.st_mtime_ns]
+            if known == key:
+                files[entry.name] = key
+                continue
+            dest_file = os.path.join(dest_dir, entry.name)
+            if not replace_existing and os.path.exists(dest_file):
+                files[entry.name] = key
+                continue
+            if not created:
+                os.makedirs(dest_dir, exist_ok=True)
+                created = True
+            jobs.append((entry.path, dest_file))
+            pending[Path(entry.path)] = relative
+            files[entry.name] = key
+        if files:
+            synced[relative] = files
+
+    failures = _transfer_all(jobs, max_workers=max_workers) if jobs else []
+    for src, _ in failures:
+        relative = pending[src]
+        del synced[relative][src.name]
+
+    dirs = {relative: [_dir_mtime(os.path.join(dest_root, relative)), files] for relative, files in synced.items()}
+    payload = {"format": _SYNC_MANIFEST_FORMAT, "source": src_root, "destination": dest_root, "dirs": dirs}
+    try:
+        write_if_changed(manifest_path, json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    except OSError as e:
+        print(f"Failed to write {Path(manifest_path).name}: {e}")
+    return failures
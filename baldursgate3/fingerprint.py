@@ -0,0 +1,97 @@
+import hashlib
+import mmap
+import os
+import threading
+
+from . import tracing
+
+FINGERPRINT_KEY = "Fingerprint"
+_READ_BUFFER = 1024 * 1024
+# Files at least this large are hashed through a read-only mapping instead of read() calls.
+_MMAP_THRESHOLD = 32 * 1024 * 1024
+_MMAP_CHUNK = 8 * 1024 * 1024
+
+# Digests computed during the current run, keyed by path and checked against the file's stat
+# key, so one PAK is never hashed twice between begin_run() calls.
+_memo: dict[str, tuple[list[int], str]] = {}
+_memo_lock = threading.Lock()
+
+
+def begin_run():
+    with _memo_lock:
+        _memo.clear()
+
+
+def _hash_file(path) -> str:
+    hasher = hashlib.md5()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= _MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    for offset in range(0, size, _MMAP_CHUNK):
+                        hasher.update(view[offset:offset + _MMAP_CHUNK])
+                return hasher.hexdigest()
+            except (OSError, ValueError):
+                hasher = hashlib.md5()
+                f.seek(0)
+        buffer = bytearray(_READ_BUFFER)
+        with memoryview(buffer) as view:
+            while read := f.readinto(buffer):
+                hasher.update(view[:read])
+    return hasher.hexdigest()
+
+
+def get_md5(path) -> str:
+    key = os.path.normcase(os.path.abspath(path))
+    current = stat_key(path)
+    with _memo_lock:
+        memo = _memo.get(key)
+    if memo is not None and memo[0] == current:
+        tracing.count("hash.memo_hit")
+        return memo[1]
+    with tracing.span("hash", "hash", pak=os.path.basename(path)):
+        value = _hash_file(path)
+    tracing.count("hash.files")
+    tracing.count("hash.bytes", current[0])
+    with _memo_lock:
+        _memo[key] = (current, value)
+    return value
+
+
+def stat_key(path) -> list[int]:
+    # st_ino carries the NTFS file id on Windows, so a replaced file with the same size and mtime still differs.
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def make_fingerprint(path, md5=None) -> list:
+    key = stat_key(path)
+    return key + [md5 if md5 is not None else get_md5(path)]
+
+
+def cached_md5(entry) -> str | None:
+    fp = entry.get(FINGERPRINT_KEY) if entry else None
+    if fp and len(fp) == 4:
+        return fp[3]
+    return (entry or {}).get("MD5", {}).get("value") or None
+
+
+# True when the PAK's stat key no longer matches the cached fingerprint, or paranoid mode is on.
+def needs_hash(path, entry, paranoid=False) -> bool:
+    fp = entry.get(FINGERPRINT_KEY)
+    return paranoid or not (fp and len(fp) == 4 and fp[:3] == stat_key(path))
+
+
+# Checks a cached entry against the PAK on disk and refreshes its fingerprint in place.
+# The PAK is only read when its stat key changed or paranoid mode is on.
+def is_fresh(path, entry, paranoid=False) -> bool:
+    if not needs_hash(path, entry, paranoid):
+        return True
+
+    expected = cached_md5(entry)
+    md5 = get_md5(path)
+    if expected and expected != md5:
+        return False
+    entry[FINGERPRINT_KEY] = make_fingerprint(path, md5)
+    return True
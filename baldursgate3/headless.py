@@ -0,0 +1,291 @@
+# Rebuilds the mods cache and modsettings.lsx of every profile of one or more MO2 instances
+# without starting Mod Organizer, e.g. from the games folder of the plugin:
+#
+#   python -m baldursgate3.headless "C:\Modding\BG3" "D:\Instances\BG3 Test" --json report.json
+#
+# Each instance folder is the one holding ModOrganizer.ini. Profiles share the plugin's metadata
+# store, so a PAK used by several profiles (or instances) is only hashed and extracted once.
+import argparse
+import configparser
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote
+
+from . import modSettings, modsCache, tracing
+
+PLUGIN_NAME = "Baldur's Gate 3 Unofficial Support Plugin"
+# mobase.ModState flags
+_STATE_EXISTS = 1
+_STATE_ACTIVE = 2
+_STATE_VALID = 32
+
+
+def _ini_value(value: str) -> str:
+    value = value.strip()
+    if value.startswith("@ByteArray(") and value.endswith(")"):
+        value = value[len("@ByteArray("):-1]
+    elif len(value) > 1 and value[0] == value[-1] == '"':
+        value = value[1:-1]
+    return value.replace("\\\\", "\\")
+
+
+# The file version of an executable, as mobase.getFileVersion() reports it ("" off Windows).
+def _file_version(path) -> str:
+    if os.name != "nt" or not os.path.exists(path):
+        return ""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        version = ctypes.windll.version
+        size = version.GetFileVersionInfoSizeW(str(path), None)
+        buffer = ctypes.create_string_buffer(size)
+        if not size or not version.GetFileVersionInfoW(str(path), 0, size, buffer):
+            return ""
+        info = ctypes.c_void_p()
+        length = wintypes.UINT()
+        if not version.VerQueryValueW(buffer, "\\", ctypes.byref(info), ctypes.byref(length)):
+            return ""
+        # VS_FIXEDFILEINFO: dwSignature, dwStrucVersion, dwFileVersionMS, dwFileVersionLS...
+        fixed = ctypes.cast(info, ctypes.POINTER(ctypes.c_uint32 * 4)).contents
+        ms, ls = fixed[2], fixed[3]
+        return f"{ms >> 16}.{ms & 0xFFFF}.{ls >> 16}.{ls & 0xFFFF}"
+    except Exception:
+        return ""
+
+
+# Profile order from modlist.txt: "+name" enabled, "-name" disabled, "*name" unmanaged (DLCs,
+# nothing to read). The top line has the highest priority; returned lowest priority first, as
+# IModList.allModsByProfilePriority() does.
+def read_modlist(path) -> list[tuple[str, bool]]:
+    entries = []
+    for line in Path(path).read_text(encoding="utf-8-sig").splitlines():
+        line = line.strip()
+        if line[:1] in ("+", "-") and len(line) > 1:
+            entries.append((line[1:], line[0] == "+"))
+    entries.reverse()
+    return entries
+
+
+class Instance:
+    def __init__(self, path):
+        self.path = Path(path)
+        ini = configparser.ConfigParser(interpolation=None, strict=False)
+        ini.optionxform = str
+        ini.read(self.path / "ModOrganizer.ini", encoding="utf-8")
+        # QSettings percent-encodes keys ("Baldur%27s%20Gate...\\paranoid_hashing").
+        self._settings = {
+            (section, unquote(key)): _ini_value(value) for section in ini.sections() for key, value in ini.items(section)
+        }
+        base = self._settings.get(("Settings", "base_directory")) or str(self.path)
+
+        def directory(key, default):
+            return Path((self._settings.get(("Settings", key)) or f"%BASE_DIR%/{default}").replace("%BASE_DIR%", base))
+
+        self.mods_path = directory("mod_directory", "mods")
+        self.profiles_path = directory("profiles_directory", "profiles")
+        self.overwrite_path = directory("overwrite_directory", "overwrite")
+        game_path = self._settings.get(("General", "gamePath"))
+        self.game_path = Path(game_path) if game_path else None
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def plugin_setting(self, key):
+        value = self._settings.get(("Plugins", f"{PLUGIN_NAME}\\{key}"))
+        return None if value is None else value.lower() == "true"
+
+    def profiles(self) -> list[Path]:
+        try:
+            return sorted(p for p in self.profiles_path.iterdir() if (p / "modlist.txt").is_file())
+        except OSError:
+            return []
+
+    def installed_mods(self) -> list[str]:
+        try:
+            return sorted(entry.name for entry in os.scandir(self.mods_path) if entry.is_dir())
+        except OSError:
+            return []
+
+
+# Minimal stand-ins for the mobase objects generate_mod_settings and _fix_modscache use.
+class _Directory:
+    def __init__(self, path):
+        self._path = str(path)
+
+    def absolutePath(self):
+        return self._path
+
+
+class HeadlessMod(_Directory):
+    def __init__(self, mods_path, name):
+        super().__init__(Path(mods_path) / name)
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class HeadlessModList:
+    def __init__(self, mods_path, entries: list[tuple[str, bool]], installed: list[str]):
+        self.mods_path = Path(mods_path)
+        listed = {name for name, _ in entries}
+        # Mods on disk that the profile doesn't list yet are added disabled, at the bottom.
+        self._order = [name for name in installed if name not in listed] + [name for name, _ in entries]
+        installed = set(installed)
+        self._states = {
+            name: (_STATE_EXISTS | _STATE_VALID | (_STATE_ACTIVE if enabled else 0)) if name in installed else 0
+            for name, enabled in entries
+        }
+        self._priorities = {name: priority for priority, name in enumerate(self._order)}
+
+    def allMods(self):
+        return list(self._order)
+
+    def allModsByProfilePriority(self, profile=None):
+        return list(self._order)
+
+    def state(self, name):
+        return self._states.get(name, _STATE_EXISTS | _STATE_VALID if name in self._priorities else 0)
+
+    def priority(self, name):
+        return self._priorities.get(name, -1)
+
+    def getMod(self, name):
+        return HeadlessMod(self.mods_path, name)
+
+
+class HeadlessProfile(_Directory):
+    def name(self):
+        return Path(self._path).name
+
+
+class HeadlessGame:
+    def __init__(self, game_path):
+        self._data = _Directory(Path(game_path) / "Data" if game_path else "")
+        self._version = _file_version(Path(game_path) / "bin" / "bg3.exe") if game_path else ""
+
+    def name(self):
+        return PLUGIN_NAME
+
+    def dataDirectory(self):
+        return self._data
+
+    def gameVersion(self):
+        return self._version
+
+
+class HeadlessOrganizer:
+    def __init__(self, instance: Instance, profile_path, game: HeadlessGame, overrides=None):
+        self.instance = instance
+        self._profile = HeadlessProfile(profile_path)
+        self._modlist = HeadlessModList(
+            instance.mods_path, read_modlist(Path(profile_path) / "modlist.txt"), instance.installed_mods()
+        )
+        self._game = game
+        self._overrides = dict(overrides or {})
+
+    def profile(self):
+        return self._profile
+
+    def modList(self):
+        return self._modlist
+
+    def managedGame(self):
+        return self._game
+
+    def modsPath(self):
+        return str(self.instance.mods_path)
+
+    def overwritePath(self):
+        return str(self.instance.overwrite_path)
+
+    def pluginSetting(self, plugin, key):
+        if key in self._overrides:
+            return self._overrides[key]
+        return self.instance.plugin_setting(key)
+
+
+def _active_count(organizer: HeadlessOrganizer) -> int:
+    modlist = organizer.modList()
+    return sum(1 for name in modlist.allMods() if modlist.state(name) & _STATE_ACTIVE)
+
+
+def run(instance_paths, profile_names=None, overrides=None) -> list[dict]:
+    organizers = []
+    for instance_path in instance_paths:
+        instance = Instance(instance_path)
+        game = HeadlessGame(instance.game_path)
+        for profile_path in instance.profiles():
+            if not profile_names or profile_path.name in profile_names:
+                organizers.append(HeadlessOrganizer(instance, profile_path, game, overrides))
+
+    # Largest profiles first: they read most of the unique PAKs with the whole worker pool, the
+    # others then mostly find them in the shared metadata store.
+    organizers.sort(key=_active_count, reverse=True)
+    was_tracing = tracing.is_enabled()
+    tracing.start()
+    report = []
+    try:
+        for organizer in organizers:
+            tracing.reset()
+            start = time.perf_counter()
+            error = None
+            try:
+                modsCache.open_cache(organizer.profile().absolutePath())
+                modSettings.generate_mod_settings(organizer, organizer.modList(), organizer.profile())
+            except Exception as e:
+                error = str(e)
+            counters = tracing.counters()
+            report.append({
+                "instance": organizer.instance.name,
+                "profile": organizer.profile().name(),
+                "active_mods": _active_count(organizer),
+                "seconds": round(time.perf_counter() - start, 3),
+                "unchanged": bool(counters.get("modsettings.unchanged")),
+                "paks_cached": counters.get("cache.profile_hit", 0),
+                "paks_shared": counters.get("cache.store_path_hit", 0) + counters.get("cache.store_md5_hit", 0),
+                "paks_extracted": counters.get("paks.extracted", 0),
+                "error": error,
+            })
+    finally:
+        if not was_tracing:
+            tracing.stop()
+    return report
+
+
+def format_report(report) -> str:
+    lines = [f"{'Instance / profile':<40} {'mods':>6} {'cached':>7} {'shared':>7} {'read':>6} {'seconds':>9}"]
+    for row in report:
+        name = f"{row['instance']} / {row['profile']}"
+        status = " unchanged" if row["unchanged"] else f" FAILED: {row['error']}" if row["error"] else ""
+        lines.append(
+            f"{name:<40} {row['active_mods']:>6} {row['paks_cached']:>7} {row['paks_shared']:>7}"
+            f" {row['paks_extracted']:>6} {row['seconds']:>9.3f}{status}"
+        )
+    lines.append(f"{len(report)} profiles in {sum(row['seconds'] for row in report):.3f}s")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild the BG3 mods cache and modsettings.lsx of every profile.")
+    parser.add_argument("instances", nargs="+", type=Path, help="MO2 instance folders (holding ModOrganizer.ini)")
+    parser.add_argument("--profile", action="append", help="only these profiles (repeatable)")
+    parser.add_argument("--paranoid", action="store_true", help="re-hash every PAK instead of trusting file stats")
+    parser.add_argument("--json", type=Path, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    overrides = {"paranoid_hashing": True} if args.paranoid else None
+    report = run(args.instances, args.profile, overrides)
+    print(format_report(report))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 1 if any(row["error"] for row in report) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
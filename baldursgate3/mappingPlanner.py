@@ -0,0 +1,73 @@
+import os
+from typing import NamedTuple
+
+from . import tracing
+
+
+# One mod type folder of one mod (or of overwrite), e.g. <mod>/PAK_FILES mapped into AppData's Mods.
+# entries are its top level (name, is_dir) pairs; complete is False when the folder also holds
+# entries that must not be mapped.
+class Source(NamedTuple):
+    path: str
+    destination: str
+    entries: list[tuple[str, bool]]
+    complete: bool
+
+
+class PlannedMapping(NamedTuple):
+    source: str
+    destination: str
+    is_directory: bool
+    create_target: bool
+
+
+# listings are (folder, ModListingCache.listing(folder)) pairs lowest priority first; destinations
+# maps each mod type to the folder it is mapped into. Mod types are kept in destinations' order.
+def sources(listings, destinations: dict[str, str]) -> list[Source]:
+    result = []
+    for mod_type, destination in destinations.items():
+        for folder, listing in listings:
+            type_listing = listing.get(mod_type)
+            if type_listing is not None and type_listing.entries:
+                result.append(Source(os.path.join(folder, mod_type), destination, *type_listing))
+    return result
+
+
+def _key(destination, name) -> tuple[str, str]:
+    # AppData lives on a case-insensitive file system.
+    return os.path.normcase(destination), name.lower()
+
+
+# USVFS applies mappings in order and a later mapping of the same file replaces an earlier one, so
+# sources come lowest priority first and keep that order. A file some higher priority source maps
+# again is dropped instead of being mapped only to be shadowed. A source that keeps every entry and
+# holds nothing but files becomes a single directory mapping of its folder: without create_target,
+# so files the game creates still land in the real folder as they did with one mapping per file.
+# Folders are always mapped one by one, since their create_target redirects the game's writes into
+# the mod; USVFS merges folders of the same name from several mods, as before.
+def plan(sources: list[Source]) -> list[PlannedMapping]:
+    winners: dict[tuple[str, str], int] = {}
+    for index, source in enumerate(sources):
+        for name, is_dir in source.entries:
+            if not is_dir:
+                winners[_key(source.destination, name)] = index
+
+    mappings = []
+    collapsed = shadowed = 0
+    for index, source in enumerate(sources):
+        kept = [
+            (name, is_dir) for name, is_dir in source.entries
+            if is_dir or winners[_key(source.destination, name)] == index
+        ]
+        shadowed += len(source.entries) - len(kept)
+        if source.complete and len(kept) == len(source.entries) > 1 and not any(is_dir for _, is_dir in kept):
+            mappings.append(PlannedMapping(source.path, source.destination, True, False))
+            collapsed += len(kept) - 1
+            continue
+        for name, is_dir in kept:
+            mappings.append(
+                PlannedMapping(os.path.join(source.path, name), os.path.join(source.destination, name), is_dir, True)
+            )
+    tracing.count("mappings.collapsed", collapsed)
+    tracing.count("mappings.shadowed", shadowed)
+    return mappings
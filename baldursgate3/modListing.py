@@ -0,0 +1,67 @@
+import fnmatch
+import os
+import threading
+from typing import NamedTuple
+
+
+# Entries of one mod type folder matching its pattern; complete is False when the folder also holds
+# entries the pattern left out (so mapping the whole folder would expose more than the entries).
+class TypeListing(NamedTuple):
+    entries: list[tuple[str, bool]]
+    complete: bool
+
+
+# Caches the top level entries of each mod's PAK_FILES / SE_CONFIG / LevelCache folders.
+# A folder is re-listed only when its modification time changed, so an unchanged modlist
+# costs one scandir per mod instead of an exists(), a glob and an is_dir() call per file.
+class ModListingCache:
+    def __init__(self, patterns: dict[str, str]):
+        self.patterns = patterns
+        self._lock = threading.Lock()
+        self._cache: dict[str, dict[str, tuple[int, TypeListing]]] = {}
+
+    def invalidate(self, mod_path=None):
+        with self._lock:
+            if mod_path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.normcase(str(mod_path)), None)
+
+    def listing(self, mod_path) -> dict[str, TypeListing]:
+        mod_path = str(mod_path)
+        key = os.path.normcase(mod_path)
+        try:
+            with os.scandir(mod_path) as it:
+                type_dirs = {
+                    entry.name: entry.stat().st_mtime_ns
+                    for entry in it
+                    if entry.name in self.patterns and entry.is_dir()
+                }
+        except OSError:
+            self.invalidate(mod_path)
+            return {}
+
+        with self._lock:
+            cached_types = self._cache.get(key, {})
+
+        types = {}
+        for mod_type, mtime in type_dirs.items():
+            previous = cached_types.get(mod_type)
+            if previous is not None and previous[0] == mtime:
+                types[mod_type] = previous
+            else:
+                types[mod_type] = (mtime, self._scan(os.path.join(mod_path, mod_type), self.patterns[mod_type]))
+
+        with self._lock:
+            self._cache[key] = types
+        return {mod_type: entries for mod_type, (_, entries) in types.items()}
+
+    @staticmethod
+    def _scan(path, pattern) -> TypeListing:
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return TypeListing([], True)
+        matching = sorted((entry.name, entry.is_dir()) for entry in entries if fnmatch.fnmatch(entry.name, pattern))
+        return TypeListing(matching, len(matching) == len(entries))
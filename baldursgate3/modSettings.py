@@ -1,19 +1,25 @@
+from __future__ import annotations
+
+import fnmatch
 import hashlib
 import json
-import multiprocessing
-import shutil
-import subprocess
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
 from pathlib import Path
-from xml.dom import minidom
+from typing import TYPE_CHECKING, NamedTuple
 import xml.etree.ElementTree as ET
 
-import mobase  # type: ignore
+# Only needed for annotations, so the headless batch mode can run outside Mod Organizer.
+if TYPE_CHECKING:
+    import mobase  # type: ignore
+
+from . import (
+    fileTransfer, fingerprint, modsCache, pakClassifier, pakIndex, pakReader, pakRecord, pakWatcher, scheduler, tracing,
+)
+from .fingerprint import get_md5
 
 divine_file = Path(__file__).resolve().parent / "tools" / "Divine.exe"
-cache_lock = threading.Lock()
-_DEFAULT_ATTRIBUTES = ("Folder", "MD5", "Name", "PublishHandle", "UUID", "Version64", "Version")
+temp_dir = Path(__file__).resolve().parent / "temp_extracted"
+_DEFAULT_ATTRIBUTES = pakRecord.ATTRIBUTES
 _IGNORED_PATHS = ("Game/GUI/Assets", "ScriptExtender")
 _BUILTIN_FOLDERS = (
     "Public/", "Public/Shared/", "Public/SharedDev/", "Public/Gustav/", "Public/GustavX/",
@@ -28,14 +34,42 @@ _BUILTIN_FOLDERS = (
     "Mods/DiceSet_04/", "Mods/DiceSet_05/", "Mods/DiceSet_06/", "Mods/DiceSet_07/",
     "Mods/Honour/", "Mods/HonourX/", "Mods/Engine/", "Mods/Game/", "Mods/FW3/", 
 )
+# Mods cache entry holding the base game GustavX.pak metadata, never pruned by _fix_modscache.
+_GUSTAV_CACHE_KEY = "__GustavBase__"
+# Profile state entry holding the inputs modsettings.lsx was last generated from. Bump
+# _SETTINGS_FORMAT whenever the generated file changes shape so old entries stop matching.
+_SETTINGS_STATE_KEY = "modsettings_inputs"
+_SETTINGS_FORMAT = 1
+# mobase.ModState.ACTIVE
+_MOD_STATE_ACTIVE = 2
+# The mobase.ModState flags modsettings.lsx depends on (EXISTS | ACTIVE); the others, like
+# ENDORSED or EMPTY, change without it and aren't known outside MO2.
+_MOD_STATE_INPUTS = 1 | _MOD_STATE_ACTIVE
+
+# The native LSPK reader handles almost every mod PAK in-process; Divine.exe is only
+# spawned for packages it cannot read (solid archives, zstd without the zstandard module...).
+_override_classifier = pakClassifier.OverrideClassifier(_BUILTIN_FOLDERS, _IGNORED_PATHS)
+
+pak_extractor: pakReader.PakExtractor = pakReader.FallbackExtractor(
+    pakReader.NativeExtractor(),
+    pakReader.DivineExtractor(divine_file, temp_dir),
+)
 
-try:
-    _CREATE_NO_WINDOW = subprocess.CREATE_NO_WINDOW
-except AttributeError:
-    _CREATE_NO_WINDOW = 0
+# Shared by generate_mod_settings, mod_installed and the warm-up: one worker pool whose
+# concurrency adapts to the observed hashing/extraction throughput.
+pak_scheduler = scheduler.PipelineScheduler()
 
+# Set by the game plugin once the UI is up: lets a launch revalidate only the mods whose
+# PAK_FILES changed since the previous one (see pakWatcher.PakWatcher).
+pak_watcher: pakWatcher.PakWatcher | None = None
 
-def _add_module_attributes(parent, metadata, skip=frozenset({"Override", "LoadOrder"})):
+# Set by the game plugin while the PAK conflict report is enabled: extraction then keeps each
+# PAK's listing in the shared store, so the file index never has to list a PAK again.
+keep_listings = False
+CONFLICT_REPORT_NAME = "pakConflicts.json"
+
+
+def _add_module_attributes(parent, metadata, skip=frozenset({"Override", "LoadOrder", fingerprint.FINGERPRINT_KEY})):
     for attr_id, attr_data in metadata.items():
         if attr_id not in skip:
             el = ET.SubElement(parent, "attribute")
@@ -44,42 +78,80 @@ def _add_module_attributes(parent, metadata, skip=frozenset({"Override", "LoadOr
             el.set("value", str(attr_data["value"]))
 
 
-def generate_mod_settings(organizer: mobase.IOrganizer, modlist: mobase.IModList, profile: mobase.IProfile):
-    _fix_modscache(organizer)
-    mod_settings = {}
+def _paranoid_hashing(organizer: mobase.IOrganizer) -> bool:
+    try:
+        return bool(organizer.pluginSetting(organizer.managedGame().name(), "paranoid_hashing"))
+    except Exception:
+        return False
 
-    game_data_path = Path(organizer.managedGame().dataDirectory().absolutePath())
-    gustav_pak = game_data_path / "GustavX.pak"
-    if gustav_pak.exists():
-        gustav_metadata = _get_metadata_from_pak(gustav_pak)
-        if gustav_metadata:
-            folder_name = gustav_metadata.get("Folder", {}).get("value", "GustavX")
-            mod_settings["__GustavBase__"] = {folder_name: gustav_metadata}
-
-    max_workers = min(multiprocessing.cpu_count(), 16)
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = []
-        for modName in modlist.allModsByProfilePriority():
-            if modlist.state(modName):
-                mod_path = Path(modlist.getMod(modName).absolutePath()) / "PAK_FILES"
-                mod_files = list(mod_path.glob("*.pak"))
-                for file in mod_files:
-                    futures.append(
-                        executor.submit(_get_metadata, modName, file, profile.absolutePath())
-                    )
-        
-        for future in as_completed(futures):
-            try:
-                meta = future.result()
-                if meta and meta["metadata"]:
-                    m = meta["metadata"]
-                    if not m.get("Override") or m.get("LoadOrder"):
-                        if (int(modlist.state(meta["modName"]) / 2) % 2 != 0):
-                            mod_settings.setdefault(meta["modName"], {})[meta["file"]] = meta["metadata"]
-            except Exception as e:
-                print(f"Error processing file: {e}")
-                
-    profile_path = Path(organizer.profile().absolutePath())
+
+def _is_cached_fresh(cache: modsCache.ModsCache, mod_name, pak_path: Path, cached: dict, paranoid=False) -> bool:
+    previous = cached.get(fingerprint.FINGERPRINT_KEY)
+    if not fingerprint.is_fresh(pak_path, cached, paranoid):
+        return False
+    if cached[fingerprint.FINGERPRINT_KEY] != previous:
+        cache.update_fingerprint(mod_name, pak_path.name, cached[fingerprint.FINGERPRINT_KEY])
+    return True
+
+
+def _get_gustav_metadata(gustav_pak: Path, profile_path, paranoid=False) -> dict | None:
+    cache = modsCache.open_cache(profile_path)
+    cached = cache.get(_GUSTAV_CACHE_KEY, gustav_pak.name)
+    if cached and _is_cached_fresh(cache, _GUSTAV_CACHE_KEY, gustav_pak, cached, paranoid):
+        return cached
+
+    results = _collect_metadata(cache, [(_GUSTAV_CACHE_KEY, gustav_pak)], refresh_cache=True)
+    return results[0]["metadata"] if results and results[0]["metadata"] else None
+
+
+def _game_build(organizer: mobase.IOrganizer) -> str:
+    try:
+        return str(organizer.managedGame().gameVersion())
+    except Exception:
+        return ""
+
+
+# Digest of everything modsettings.lsx is generated from: the modlist order and states, the
+# stat key of every active PAK and of GustavX.pak, and the game build. Costs one scandir per mod.
+def _settings_inputs(organizer: mobase.IOrganizer, modlist: mobase.IModList, gustav_pak: Path) -> str:
+    hasher = hashlib.sha1()
+
+    def add(*values):
+        hasher.update(repr(values).encode("utf-8"))
+
+    add(_SETTINGS_FORMAT, _game_build(organizer))
+    try:
+        add(fingerprint.stat_key(gustav_pak))
+    except OSError:
+        add(None)
+    for mod_name in modlist.allModsByProfilePriority():
+        state = modlist.state(mod_name)
+        add(mod_name, int(state) & _MOD_STATE_INPUTS)
+        if not state:
+            continue
+        try:
+            with os.scandir(os.path.join(modlist.getMod(mod_name).absolutePath(), "PAK_FILES")) as it:
+                paks = sorted((entry for entry in it if fnmatch.fnmatch(entry.name, "*.pak")), key=lambda e: e.name)
+                for entry in paks:
+                    st = entry.stat()
+                    add(entry.name, st.st_size, st.st_mtime_ns, entry.inode())
+        except OSError:
+            add(None)
+    return hasher.hexdigest()
+
+
+def _settings_unchanged(cache: modsCache.ModsCache, inputs: str, settings_path: Path) -> bool:
+    state = cache.get_state(_SETTINGS_STATE_KEY)
+    if not state or state[0] != inputs:
+        return False
+    try:
+        # Regenerate if anything else rewrote or removed the file since.
+        return state[1] == fingerprint.stat_key(settings_path)
+    except OSError:
+        return False
+
+
+def _render_mod_settings(modlist: mobase.IModList, mod_settings: dict) -> bytes:
     root = ET.Element("save")
     version = ET.SubElement(root, "version")
     version.set("major", "4")
@@ -123,300 +195,562 @@ def generate_mod_settings(organizer: mobase.IOrganizer, modlist: mobase.IModList
                 mod_node = ET.SubElement(mods_children, "node", id="ModuleShortDesc")
                 _add_module_attributes(mod_node, metadata)
 
-    (profile_path / "modsettings.lsx").write_bytes(
-        minidom.parseString(ET.tostring(root, encoding="unicode")).toprettyxml(indent="  ", encoding="UTF-8")
-    )
+    from xml.dom import minidom
+
+    return minidom.parseString(ET.tostring(root, encoding="unicode")).toprettyxml(indent="  ", encoding="UTF-8")
+
+
+def generate_mod_settings(organizer: mobase.IOrganizer, modlist: mobase.IModList, profile: mobase.IProfile):
+    profile_path = Path(organizer.profile().absolutePath())
+    settings_path = profile_path / "modsettings.lsx"
+    cache = modsCache.open_cache(profile.absolutePath())
+    paranoid = _paranoid_hashing(organizer)
+    game_data_path = Path(organizer.managedGame().dataDirectory().absolutePath())
+    gustav_pak = game_data_path / "GustavX.pak"
+
+    with tracing.span("settings_inputs"):
+        inputs = _settings_inputs(organizer, modlist, gustav_pak)
+    if not paranoid and _settings_unchanged(cache, inputs, settings_path):
+        tracing.count("modsettings.unchanged")
+        print("Mod list and PAK files unchanged, keeping modsettings.lsx.")
+        return True
+
+    # One flush for everything this launch writes to the caches.
+    with cache.batch():
+        fingerprint.begin_run()
+        changes = pak_watcher.changes() if pak_watcher is not None and not paranoid else None
+        with tracing.span("fix_modscache", mods=-1 if changes is None else len(changes)):
+            found = _fix_modscache(organizer, changes)
+        if pak_watcher is not None and changes is None and found is not None:
+            pak_watcher.full_scan_done(found)
+        mod_settings = {}
+
+        # Only recorded as the inputs' result when nothing failed, so failed PAKs are retried next launch.
+        complete = True
+        if gustav_pak.exists():
+            with tracing.span("gustav_metadata"):
+                gustav_metadata = _get_gustav_metadata(gustav_pak, profile.absolutePath(), paranoid)
+            if gustav_metadata:
+                folder_name = gustav_metadata.get("Folder", {}).get("value", "GustavX")
+                mod_settings["__GustavBase__"] = {folder_name: gustav_metadata}
+            else:
+                complete = False
+
+        jobs = []
+        with tracing.span("list_paks"):
+            for modName in modlist.allModsByProfilePriority():
+                if modlist.state(modName):
+                    mod_path = Path(modlist.getMod(modName).absolutePath()) / "PAK_FILES"
+                    jobs.extend((modName, file) for file in mod_path.glob("*.pak"))
+
+        for meta in _collect_metadata(cache, jobs):
+            complete = complete and not meta["failed"]
+            if modlist.state(meta["modName"]) & _MOD_STATE_ACTIVE:
+                _add_module(mod_settings, meta["modName"], meta["file"], meta["metadata"])
+
+    with tracing.span("write_modsettings") as write_span:
+        changed = fileTransfer.write_if_changed(settings_path, _render_mod_settings(modlist, mod_settings))
+        if complete:
+            cache.set_state(_SETTINGS_STATE_KEY, [inputs, fingerprint.stat_key(settings_path)])
+        write_span.set(changed=changed, complete=complete)
     
     return True
 
+# PAKs without metadata (no meta.lsx) and overrides that aren't load ordered stay out of modsettings.lsx.
+def _add_module(mod_settings: dict, mod_name, file_name, metadata):
+    if metadata and (not metadata.get("Override") or metadata.get("LoadOrder")):
+        mod_settings.setdefault(mod_name, {})[file_name] = metadata
+
+
+# Module UUIDs in the order _render_mod_settings writes them; mod_order lists the active mods
+# lowest priority first.
+def _module_order(mod_order, mod_settings: dict) -> list[str]:
+    return [
+        metadata.get("UUID", {}).get("value", "")
+        for mod_name in mod_order
+        for _, metadata in sorted(mod_settings.get(mod_name, {}).items(), key=lambda x: x[0])
+    ]
+
+
+# What a fast launch leaves to revalidate_cached_launch: every active (mod name, PAK path) job in
+# priority order, the ones whose PAK changed since it was cached, and the module order that was
+# written. Plain data only, so it can be handed to a worker thread.
+class CachedLaunch(NamedTuple):
+    profile_path: str
+    jobs: list[tuple[str, Path]]
+    stale: list[tuple[str, Path]]
+    written_order: list[str]
+
+
+# Opt-in fast launch: writes modsettings.lsx from the cached metadata of every active PAK, even of
+# PAKs changed on disk since they were cached, so the game starts without waiting for them to be
+# hashed and read again. Only PAKs no cache knows anything about, and a changed GustavX.pak, are
+# still read first. Returns None when nothing was stale (the file is then exactly the one
+# generate_mod_settings writes), otherwise the launch to revalidate in the background.
+def write_cached_mod_settings(organizer: mobase.IOrganizer, modlist: mobase.IModList, profile: mobase.IProfile) -> CachedLaunch | None:
+    if _paranoid_hashing(organizer):
+        generate_mod_settings(organizer, modlist, profile)
+        return None
+    profile_path = Path(profile.absolutePath())
+    settings_path = profile_path / "modsettings.lsx"
+    cache = modsCache.open_cache(profile_path)
+    gustav_pak = Path(organizer.managedGame().dataDirectory().absolutePath()) / "GustavX.pak"
+
+    with tracing.span("settings_inputs"):
+        inputs = _settings_inputs(organizer, modlist, gustav_pak)
+    if _settings_unchanged(cache, inputs, settings_path):
+        tracing.count("modsettings.unchanged")
+        print("Mod list and PAK files unchanged, keeping modsettings.lsx.")
+        return None
+
+    with cache.batch():
+        fingerprint.begin_run()
+        mod_settings = {}
+        complete = True
+        if gustav_pak.exists():
+            with tracing.span("gustav_metadata"):
+                gustav_metadata = _get_gustav_metadata(gustav_pak, profile_path)
+            if gustav_metadata:
+                folder_name = gustav_metadata.get("Folder", {}).get("value", "GustavX")
+                mod_settings["__GustavBase__"] = {folder_name: gustav_metadata}
+            else:
+                complete = False
+
+        jobs = []
+        with tracing.span("list_paks"):
+            for mod_name in modlist.allModsByProfilePriority():
+                if modlist.state(mod_name) & _MOD_STATE_ACTIVE:
+                    mod_path = Path(modlist.getMod(mod_name).absolutePath()) / "PAK_FILES"
+                    jobs.extend((mod_name, file) for file in mod_path.glob("*.pak"))
+
+        stale = []
+        unknown = []
+        with tracing.span("cached_metadata", paks=len(jobs)) as cached_span:
+            for mod_name, file in jobs:
+                cached = cache.get(mod_name, file.name)
+                try:
+                    if cached is None:
+                        unknown.append((mod_name, file))
+                        continue
+                    if fingerprint.needs_hash(file, cached):
+                        stale.append((mod_name, file))
+                except OSError:
+                    complete = False
+                    continue
+                _add_module(mod_settings, mod_name, file.name, cached)
+            cached_span.set(stale=len(stale), unknown=len(unknown))
+        tracing.count("cache.stale_used", len(stale))
+        # Nothing to place these by: found in the shared store, or read before the game starts.
+        for meta in _collect_metadata(cache, unknown):
+            complete = complete and not meta["failed"]
+            _add_module(mod_settings, meta["modName"], meta["file"], meta["metadata"])
+
+    written_order = _module_order(dict.fromkeys(mod_name for mod_name, _ in jobs), mod_settings)
+    with tracing.span("write_modsettings") as write_span:
+        changed = fileTransfer.write_if_changed(settings_path, _render_mod_settings(modlist, mod_settings))
+        if complete and not stale:
+            cache.set_state(_SETTINGS_STATE_KEY, [inputs, fingerprint.stat_key(settings_path)])
+        write_span.set(changed=changed, complete=complete)
+    if not stale:
+        return None
+    print(f"Started from cached metadata, {len(stale)} changed PAK files are checked in the background.")
+    return CachedLaunch(str(profile_path), jobs, stale, written_order)
+
+
+# Re-reads the changed PAKs of a fast launch, chunk by chunk, and returns the module order
+# generate_mod_settings would write now. Never touches mobase, so it can run on any thread;
+# progress(done, total) is called after each chunk and a set cancel event stops it between chunks
+# (returning None). The cache ends up as a full generate_mod_settings would leave it, and the
+# next launch writes modsettings.lsx from it again, since its settings state was not recorded.
+def revalidate_cached_launch(launch: CachedLaunch, cancel=None, progress=None, chunk_size=8) -> list[str] | None:
+    cache = modsCache.open_cache(launch.profile_path)
+    stale = launch.stale
+    with tracing.span("revalidate", paks=len(stale)):
+        for start in range(0, len(stale), chunk_size):
+            if cancel is not None and cancel.is_set():
+                return None
+            # Every chunk is written to the cache as it finishes.
+            for meta in _collect_metadata(cache, stale[start:start + chunk_size], refresh_cache=True):
+                if not meta["metadata"]:
+                    # Unreadable now: drop the old metadata, as _fix_modscache would have.
+                    cache.delete(meta["modName"], meta["file"])
+            if progress is not None:
+                progress(min(start + chunk_size, len(stale)), len(stale))
+
+    mod_settings = {}
+    for mod_name, file in launch.jobs:
+        _add_module(mod_settings, mod_name, file.name, cache.get(mod_name, file.name))
+    return _module_order(dict.fromkeys(mod_name for mod_name, _ in launch.jobs), mod_settings)
+
+
 def mod_installed(organizer: mobase.IOrganizer, modlist: mobase.IModList, profile: mobase.IProfile, mod):
-    cache_path = Path(profile.absolutePath()) / "modsCache.json"
-    if not cache_path.exists():
+    profile_path = profile.absolutePath()
+    if not modsCache.cache_exists(profile_path):
         return False
     mod_name = mod.name()
-    profile_path = profile.absolutePath()
+    cache = modsCache.open_cache(profile_path)
+    fingerprint.begin_run()
 
-    try:
-        mods_cache = json.loads(cache_path.read_text(encoding="utf-8"))
-    except (FileNotFoundError, json.JSONDecodeError):
-        mods_cache = {}
-
-    mod_data = mods_cache.get(mod_name)
+    mod_data = cache.get_mod(mod_name)
+    paranoid = _paranoid_hashing(organizer)
     mod_path = Path(modlist.getMod(mod_name).absolutePath()) / "PAK_FILES"
     mod_files = list(mod_path.glob("*.pak"))
-    max_workers = max(multiprocessing.cpu_count() - 1, 1)
 
-    if not mod_data:
-        mods_cache[mod_name] = {"Files": {}}
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(_get_metadata, mod_name, f, profile_path) for f in mod_files]
-            for future in as_completed(futures):
-                try:
-                    meta = future.result()
-                    if meta:
-                        mods_cache[mod_name]["Files"][meta["file"]] = meta["metadata"]
-                except Exception as e:
-                    print(f"Error processing file: {e}")
-    else:
-        existing = mod_data.get("Files", {})
-        to_refresh = []
-        for f in mod_files:
-            cached = existing.get(f.name)
-            if not (cached and cached.get("MD5", {}).get("value") == get_md5(f)):
-                to_refresh.append(f)
+    with cache.batch():
+        if not mod_data:
+            to_refresh = mod_files
+        else:
+            to_refresh = []
+            _prehash(((f, mod_data.get(f.name)) for f in mod_files), paranoid)
+            for f in mod_files:
+                cached = mod_data.get(f.name)
+                if not (cached and _is_cached_fresh(cache, mod_name, f, cached, paranoid)):
+                    to_refresh.append(f)
+
         if to_refresh:
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [executor.submit(_get_metadata, mod_name, f, profile_path, True) for f in to_refresh]
-                for future in as_completed(futures):
-                    try:
-                        meta = future.result()
-                        if meta:
-                            mods_cache[mod_name]["Files"][meta["file"]] = meta["metadata"]
-                    except Exception as e:
-                        print(f"Error processing file: {e}")
-
-    cache_path.write_text(json.dumps(mods_cache, indent=4, ensure_ascii=False), encoding="utf-8")
+            _collect_metadata(cache, [(mod_name, f) for f in to_refresh], refresh_cache=True)
     return True
 
 
+def gustav_jobs(game_data_path) -> list:
+    gustav_pak = Path(game_data_path) / "GustavX.pak"
+    return [(_GUSTAV_CACHE_KEY, gustav_pak)] if gustav_pak.exists() else []
+
+
+# Jobs whose cached metadata is missing or whose PAK changed on disk since it was cached.
+def stale_jobs(cache: modsCache.ModsCache, jobs) -> list:
+    stale = []
+    for mod_name, file in jobs:
+        cached = cache.get(mod_name, file.name)
+        try:
+            if cached is None or fingerprint.needs_hash(file, cached):
+                stale.append((mod_name, file))
+        except OSError:
+            pass
+    return stale
+
+
+# Resolves and caches metadata ahead of a launch; generate_mod_settings then finds it in the cache.
+# Background callers pass a work_scheduler of their own so they stay off the launch's pak_scheduler.
+def prefetch_metadata(cache: modsCache.ModsCache, jobs, max_concurrency=1, work_scheduler: scheduler.PipelineScheduler | None = None):
+    return _collect_metadata(cache, jobs, refresh_cache=True, max_concurrency=max_concurrency, work_scheduler=work_scheduler)
+
+
+def _pak_listing(cache: modsCache.ModsCache, md5, pak_path) -> list[str] | None:
+    listing = cache.store.get_listing(md5)
+    if listing is None:
+        # Extracted before keep_listings was turned on; the file table alone is cheap to read.
+        try:
+            listing = pak_extractor.list(pak_path)
+        except Exception as e:
+            print(f"Could not list {Path(pak_path).name}: {e}")
+            return None
+        cache.store.put_listing(md5, listing)
+    return listing
+
+
+# Brings the profile's cross-PAK file index up to date with the mods cache (as left by the last
+# generate_mod_settings or warm-up) and returns it for conflict queries.
+def update_file_index(organizer: mobase.IOrganizer, modlist: mobase.IModList, profile: mobase.IProfile) -> pakIndex.PakFileIndex:
+    cache = modsCache.open_cache(profile.absolutePath())
+    index = pakIndex.open_index(profile.absolutePath())
+    paks = {}
+    priorities = {}
+    for mod_name, files in cache.fingerprints().items():
+        if mod_name == _GUSTAV_CACHE_KEY or not modlist.state(mod_name) & _MOD_STATE_ACTIVE:
+            continue
+        priorities[mod_name] = modlist.priority(mod_name)
+        mod_path = Path(modlist.getMod(mod_name).absolutePath()) / "PAK_FILES"
+        for file_name, entry in files.items():
+            paks[(mod_name, file_name)] = (entry[fingerprint.FINGERPRINT_KEY][3], mod_path / file_name)
+    with tracing.span("file_index", paks=len(paks)) as index_span, cache.batch():
+        index_span.set(indexed=index.update(paks, priorities, lambda md5, path: _pak_listing(cache, md5, path)))
+    return index
+
+
+# Writes every file provided by more than one active PAK, the winning PAK first, to
+# pakConflicts.json in the profile folder. Returns the number of conflicting files.
+def write_conflict_report(organizer: mobase.IOrganizer, modlist: mobase.IModList, profile: mobase.IProfile) -> int:
+    conflicts = update_file_index(organizer, modlist, profile).conflicts()
+    report = {
+        path: [{"mod": provider.mod, "pak": provider.pak} for provider in providers]
+        for path, providers in sorted(conflicts.items())
+    }
+    with tracing.span("write_conflict_report", conflicts=len(report)):
+        fileTransfer.write_if_changed(
+            Path(profile.absolutePath()) / CONFLICT_REPORT_NAME, json.dumps(report, indent=2).encode("utf-8")
+        )
+    return len(report)
+
+
 def mod_removed(organizer: mobase.IOrganizer, profile: mobase.IProfile, mod):
-    cache_path = Path(profile.absolutePath()) / "modsCache.json"
-    if not cache_path.exists():
+    if not modsCache.cache_exists(profile.absolutePath()):
         return True
     mod_name = mod.name() if hasattr(mod, "name") else str(mod)
-    try:
-        mods_cache = json.loads(cache_path.read_text(encoding="utf-8"))
-        if mod_name in mods_cache:
-            del mods_cache[mod_name]
-            cache_path.write_text(json.dumps(mods_cache, indent=4, ensure_ascii=False), encoding="utf-8")
-    except (FileNotFoundError, json.JSONDecodeError):
-        pass
+    modsCache.open_cache(profile.absolutePath()).delete_mod(mod_name)
     return True
 
 
-def _extract_pak(file):
-    temp_dir = Path(__file__).resolve().parent / "temp_extracted"
-    temp_dir.mkdir(parents=True, exist_ok=True)
-    file_hash = hashlib.md5(str(file).encode()).hexdigest()[:10]
-    output_dir = temp_dir / file_hash
-
-    if output_dir.exists():
-        shutil.rmtree(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    command = [
-        str(divine_file),
-        "-a", "extract-package",
-        "-g", "bg3",
-        "-s", str(file),
-        "-d", str(output_dir),
-        "-x", "*/meta.lsx",
-        "-l", "off"
-    ]
-
-    subprocess.run(command, creationflags=_CREATE_NO_WINDOW, check=True)
-    return output_dir
-
 def check_hash(pak_path, module_info_node):
     hash_element = module_info_node.find(".//attribute[@id='MD5']")
     return hash_element is not None and hash_element.attrib.get("value") == get_md5(pak_path)
 
-def get_md5(pak_path):
-    hasher = hashlib.md5()
-    with open(pak_path, 'rb') as f:
-        while chunk := f.read(8192):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+def check_override_pak(pak_path, module_info_node, listing, cache: modsCache.ModsCache | None = None, md5=None):
+    folder_name = None
+    if module_info_node is not None:
+        folder_element = module_info_node.find(".//attribute[@id='Folder']")
+        if folder_element is not None:
+            folder_name = folder_element.attrib["value"]
 
-def check_override_pak(pak_path, module_info_node):
-    cache_key = str(pak_path)
-    cache = getattr(check_override_pak, "cache", None)
-    if cache is not None and cache_key in cache:
-        return cache[cache_key]
+    if cache is not None and md5:
+        cached = cache.get_classification(md5, folder_name)
+        if cached is not None:
+            return cached
 
+    tracing.count("classification.computed")
     try:
-        result = subprocess.run(
-            [str(divine_file), "-a", "list-package", "-g", "bg3", "-s", str(pak_path)],
-            creationflags=_CREATE_NO_WINDOW,
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        list_output = result.stdout
-        override = {"Override": False, "LoadOrder": False}
-        public_folder_path = ""
-
-        if module_info_node is not None:
-            folder_element = module_info_node.find(".//attribute[@id='Folder']")
-            if folder_element is not None:
-                folder_name = folder_element.attrib["value"]
-                mods_folder_path = f"Mods/{folder_name}"
-                public_folder_path = f"Public/{folder_name}"
-                if public_folder_path in list_output:
-                    override["LoadOrder"] = True
-                files_in_folder = [l.strip() for l in list_output.splitlines() if mods_folder_path in l]
-                if len(files_in_folder) > 1:
-                    override["LoadOrder"] = True
-
-        for line in list_output.splitlines():
-            if any(ignored in line for ignored in _IGNORED_PATHS):
-                continue
-            if any(folder in line for folder in _BUILTIN_FOLDERS):
-                override["Override"] = True
-                if public_folder_path and public_folder_path in list_output:
-                    override["LoadOrder"] = True
-                return override
-
-        if not getattr(check_override_pak, "cache", None):
-            check_override_pak.cache = {}
-        check_override_pak.cache[cache_key] = override
-        return override
+        override = _override_classifier.classify_text("\n".join(listing), folder_name)
     except Exception as e:
         print(f"Error checking override status: {e}")
         return False
 
-def _metadata_result(mod_name, file_name, metadata):
-    return {"modName": mod_name, "file": file_name, "metadata": metadata}
+    if cache is not None and md5:
+        cache.put_classification(md5, folder_name, override)
+    return override
 
+# failed marks PAKs that could not be hashed or read this time, as opposed to PAKs without a
+# meta.lsx: those resolve to empty metadata too, but reading them again gives the same result.
+def _metadata_result(mod_name, file_name, metadata, failed=False):
+    return {"modName": mod_name, "file": file_name, "metadata": metadata, "failed": failed}
 
-def _get_metadata_from_pak(pak_path: Path) -> dict | None:
-    extracted_pak = None
-    try:
-        extracted_pak = _extract_pak(pak_path)
-        if not extracted_pak:
-            return None
-        meta_files = list(extracted_pak.glob("**/meta.lsx"))
-        if not meta_files:
-            return None
-        tree = ET.parse(str(meta_files[0]))
-        module_info_node = tree.getroot().find(".//node[@id='ModuleInfo']")
-        if module_info_node is None:
-            return None
-        override_result = check_override_pak(pak_path, module_info_node)
-        meta_data = dict(override_result) if isinstance(override_result, dict) else {}
-        for attr in _DEFAULT_ATTRIBUTES:
-            el = module_info_node.find(f"./attribute[@id='{attr}']")
-            if el is not None:
-                meta_data[attr] = {"value": el.attrib.get("value"), "type": el.attrib.get("type", "LSString")}
-                if attr == "MD5":
-                    meta_data[attr]["value"] = get_md5(pak_path)
-        return meta_data
-    except Exception as e:
-        print(f"Error extracting metadata from {pak_path.name}: {e}")
+
+def _metadata_from_contents(pak_path: Path, contents: pakReader.PakContents, cache: modsCache.ModsCache | None = None, md5=None) -> dict | None:
+    if not contents.meta_lsx:
+        print(f"No meta.lsx files found in PAK: {pak_path.name}")
+        return None
+    module_info_node = ET.fromstring(contents.meta_lsx).find(".//node[@id='ModuleInfo']")
+    if module_info_node is None:
         return None
-    finally:
-        if extracted_pak and extracted_pak.exists():
-            try:
-                shutil.rmtree(extracted_pak)
-            except Exception:
-                pass
 
+    md5 = md5 or get_md5(pak_path)
+    if cache is not None and keep_listings and contents.listing:
+        cache.store.put_listing(md5, contents.listing)
+    override_result = check_override_pak(pak_path, module_info_node, contents.listing, cache, md5)
+    meta_data = dict(override_result) if isinstance(override_result, dict) else {}
+    for attr in _DEFAULT_ATTRIBUTES:
+        el = module_info_node.find(f"./attribute[@id='{attr}']")
+        if el is not None:
+            meta_data[attr] = {"value": el.attrib.get("value"), "type": el.attrib.get("type", "LSString")}
+            if attr == "MD5":
+                meta_data[attr]["value"] = md5
+    meta_data[fingerprint.FINGERPRINT_KEY] = fingerprint.make_fingerprint(pak_path, md5)
+    return meta_data
+
+
+def _link_shared(cache: modsCache.ModsCache, mod_name, file: Path, md5, data: dict, stat_key=None) -> dict:
+    meta_data = dict(data)
+    meta_data[fingerprint.FINGERPRINT_KEY] = fingerprint.make_fingerprint(file, md5)
+    cache.link(mod_name, file.name, meta_data[fingerprint.FINGERPRINT_KEY])
+    cache.store.remember_path(file, stat_key or meta_data[fingerprint.FINGERPRINT_KEY][:3], md5)
+    return _metadata_result(mod_name, file.name, meta_data)
+
+
+# Whether a profile cache entry still matches its PAK's stat key; a PAK that can't be stat'ed counts
+# as changed.
+def _stat_unchanged(file: Path, cached: dict) -> bool:
+    try:
+        return not fingerprint.needs_hash(file, cached)
+    except OSError:
+        return False
 
-def _get_metadata(mod_name, file, profile_path, refresh_cache=False):
-    cache_path = Path(profile_path) / "modsCache.json"
-    with cache_lock:
-        if cache_path.exists() and not refresh_cache:
-            try:
-                mods_cache = json.loads(cache_path.read_text(encoding="utf-8"))
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
-            else:
-                files = mods_cache.get(mod_name, {}).get("Files", {})
-                if file.name in files:
-                    return _metadata_result(mod_name, file.name, files[file.name])
 
-    extracted_pak = None
-    try:
-        extracted_pak = _extract_pak(file)
-        if not extracted_pak:
-            return _metadata_result(mod_name, file.name, {})
-        meta_files = list(extracted_pak.glob("**/meta.lsx"))
-        if not meta_files:
-            print(f"No meta.lsx files found in extracted PAK: {file.name}")
-            return _metadata_result(mod_name, file.name, {})
-
-        tree = ET.parse(str(meta_files[0]))
-        module_info_node = tree.getroot().find(".//node[@id='ModuleInfo']")
-        if module_info_node is None:
-            return _metadata_result(mod_name, file.name, {})
-
-        override_result = check_override_pak(file, module_info_node)
-        meta_data = dict(override_result) if isinstance(override_result, dict) else {}
-        for attr in _DEFAULT_ATTRIBUTES:
-            el = module_info_node.find(f"./attribute[@id='{attr}']")
-            if el is not None:
-                meta_data[attr] = {"value": el.attrib.get("value"), "type": el.attrib.get("type", "LSString")}
-                if attr == "MD5":
-                    meta_data[attr]["value"] = get_md5(file)
-
-        with cache_lock:
-            try:
-                mods_cache = json.loads(cache_path.read_text(encoding="utf-8"))
-            except (FileNotFoundError, json.JSONDecodeError):
-                mods_cache = {}
-            mods_cache.setdefault(mod_name, {"Files": {}})["Files"][file.name] = meta_data
-            cache_path.write_text(json.dumps(mods_cache, indent=4, ensure_ascii=False), encoding="utf-8")
-        return _metadata_result(mod_name, file.name, meta_data)
-    except Exception as e:
-        print(f"Error in _get_metadata for {file.name}: {e}")
-        return _metadata_result(mod_name, file.name, {})
-    finally:
-        if extracted_pak and extracted_pak.exists():
+# Resolves metadata for a whole queue of (mod name, PAK path) jobs. Profile misses are looked up in
+# the shared content addressed store (by path and stat, then by md5), so only PAK contents never seen
+# by any profile are extracted, once per distinct md5. Each miss is a pipeline on pak_scheduler
+# (hash -> native read -> parse), largest PAK first; PAKs the native reader can't handle are sent
+# to the fallback extractor together once everything else has drained.
+# The pak watcher only limits which mods _fix_modscache looks at, so a profile cache hit is still
+# checked against the PAK's stat key. A changed PAK is treated as a miss: hashed on the pipeline
+# and found again in the shared store if only its stats changed.
+def _collect_metadata(cache: modsCache.ModsCache, jobs, refresh_cache=False, max_concurrency=None, work_scheduler=None) -> list[dict]:
+    results = []
+    misses = []
+    store = cache.store
+    for mod_name, file in jobs:
+        cached = None if refresh_cache else cache.get(mod_name, file.name)
+        if cached is not None and _stat_unchanged(file, cached):
+            results.append(_metadata_result(mod_name, file.name, cached))
+        else:
+            misses.append((mod_name, file))
+    tracing.count("cache.profile_hit", len(results))
+    tracing.count("cache.profile_miss", len(misses))
+    if not misses:
+        return results
+
+    # md5 -> jobs sharing that content while its first PAK is in flight, and md5 -> finished metadata.
+    waiting: dict[str, list] = {}
+    resolved: dict[str, dict | None] = {}
+    failed: set[str] = set()
+
+    def link(mod_name, file: Path, md5, data, stat_key=None):
+        try:
+            results.append(_link_shared(cache, mod_name, file, md5, data, stat_key))
+        except OSError as e:
+            print(f"Error reading {file.name}: {e}")
+            results.append(_metadata_result(mod_name, file.name, {}, True))
+
+    def finish(md5, group):
+        data = resolved[md5]
+        for mod_name, file in group:
+            if data is None:
+                results.append(_metadata_result(mod_name, file.name, {}, md5 in failed))
+            else:
+                link(mod_name, file, md5, data)
+
+    def parse(mod_name, file: Path, contents, md5):
+        with tracing.span("pak_metadata", mod=mod_name, pak=file.name):
+            return _metadata_from_contents(file, contents, cache, md5)
+
+    def pipeline(mod_name, file: Path, size):
+        try:
+            md5 = yield scheduler.Work(get_md5, (file,), size)
+        except OSError as e:
+            print(f"Error hashing {file.name}: {e}")
+            results.append(_metadata_result(mod_name, file.name, {}, True))
+            return
+        if md5 in resolved:
+            finish(md5, [(mod_name, file)])
+            return
+        if md5 in waiting:
+            waiting[md5].append((mod_name, file))
+            return
+        data = store.get(md5)
+        if data is not None:
+            tracing.count("cache.store_md5_hit")
+            resolved[md5] = data
+            finish(md5, [(mod_name, file)])
+            return
+
+        waiting[md5] = [(mod_name, file)]
+        tracing.count("paks.extracted")
+        meta_data = None
+        try:
+            contents = yield scheduler.Work(pak_extractor.try_read, (file,), size)
+            if contents is None:
+                tracing.count("paks.batched")
+                contents = yield scheduler.Batch("extract", pak_extractor.read_many, file)
+            meta_data = yield scheduler.Work(parse, (mod_name, file, contents, md5))
+        except Exception as e:
+            print(f"Error extracting metadata from {file.name}: {e}")
+            failed.add(md5)
+        if meta_data is not None:
+            meta_data = {k: v for k, v in meta_data.items() if k != fingerprint.FINGERPRINT_KEY}
+            store.put(md5, meta_data)
+        resolved[md5] = meta_data
+        finish(md5, waiting.pop(md5))
+
+    with tracing.span("collect_metadata", misses=len(misses)), cache.batch():
+        pipelines = []
+        for mod_name, file in misses:
             try:
-                shutil.rmtree(extracted_pak)
-            except Exception as e:
-                print(f"Error cleaning up {extracted_pak}: {e}")
-
-def _fix_modscache(organizer: mobase.IOrganizer):
+                stat_key = fingerprint.stat_key(file)
+            except OSError as e:
+                print(f"Error reading {file.name}: {e}")
+                results.append(_metadata_result(mod_name, file.name, {}, True))
+                continue
+            md5 = store.key_for_path(file, stat_key)
+            data = store.get(md5) if md5 else None
+            if data is not None:
+                tracing.count("cache.store_path_hit")
+                link(mod_name, file, md5, data, stat_key)
+            else:
+                pipelines.append((stat_key[0], pipeline(mod_name, file, stat_key[0])))
+        (work_scheduler or pak_scheduler).run(pipelines, max_concurrency)
+    # The scheduler drops a pipeline that raised between its steps, and with it every job waiting
+    # on the same md5; report those as failed so the run isn't taken for a complete one.
+    reported = {(result["modName"], result["file"]) for result in results}
+    for mod_name, file in misses:
+        if (mod_name, file.name) not in reported:
+            results.append(_metadata_result(mod_name, file.name, {}, True))
+    return results
+
+
+# Hashes every cached PAK whose freshness check will need a digest in one scheduled pass,
+# largest first, so the sequential checks that follow only hit the per-run memo.
+def _prehash(candidates, paranoid=False):
+    def pipeline(pak_path, size):
+        try:
+            yield scheduler.Work(get_md5, (pak_path,), size)
+        except OSError:
+            pass
+
+    pipelines = []
+    for pak_path, cached in candidates:
+        try:
+            if cached and fingerprint.needs_hash(pak_path, cached, paranoid):
+                size = fingerprint.stat_key(pak_path)[0]
+                pipelines.append((size, pipeline(pak_path, size)))
+        except OSError:
+            pass
+    pak_scheduler.run(pipelines)
+
+
+# Drops cache entries for removed mods and for PAKs that are gone or changed on disk, and returns
+# the names of the mods where it found something. With changed_mods, only those mods' PAKs are
+# compared; removed mods are always pruned.
+def _fix_modscache(organizer: mobase.IOrganizer, changed_mods: set[str] | None = None) -> set[str] | None:
     try:
         profile_path = Path(organizer.profile().absolutePath())
-        cache_json_path = profile_path / "modsCache.json"
-
-        if not cache_json_path.exists():
-            print(f"{cache_json_path} does not exist. Exiting.")
-            return True
-        mods_cache = json.loads(cache_json_path.read_text(encoding="utf-8"))
+        if not modsCache.cache_exists(profile_path):
+            print(f"{profile_path / modsCache.CACHE_DB_NAME} does not exist. Exiting.")
+            return set()
+        cache = modsCache.open_cache(profile_path)
+        paranoid = _paranoid_hashing(organizer)
 
         modlist = organizer.modList()
         installed_mods = {mod: True for mod in modlist.allMods()}
 
-        mods_to_remove = []
-        for mod_name, mod_data in mods_cache.items():
-            if mod_name not in installed_mods:
-                mods_to_remove.append(mod_name)
-                continue
-
-            mod_path = Path(modlist.getMod(mod_name).absolutePath()) / "PAK_FILES"
-            if not mod_path.exists():
-                print(f"Mod path {mod_path} does not exist. Skipping {mod_name}.")
-                continue
-
-            current_files = {f.name: f for f in mod_path.glob("*.pak")}
-            cached_files = mod_data.get("Files", {})
-
-            missing_files = set(cached_files.keys()) - set(current_files.keys())
-            for missing_file in missing_files:
-                print(f"Removing missing file {missing_file} from {mod_name}.")
-                del mod_data["Files"][missing_file]
-
-            for file_name, pak_path in current_files.items():
-                cached_file = cached_files.get(file_name)
-                if cached_file:
-                    cached_md5 = cached_file.get("MD5", {}).get("value")
-                    if cached_md5 and cached_md5 != get_md5(pak_path):
-                        print(f"PAK {file_name} changed (MD5 mismatch), invalidating cache for {mod_name}.")
-                        del mod_data["Files"][file_name]
-
-            if not mod_data["Files"]:
-                mods_to_remove.append(mod_name)
-
-        for mod_name in mods_to_remove:
-            print(f"Removing mod {mod_name} from mods cache.")
-            del mods_cache[mod_name]
-        cache_json_path.write_text(json.dumps(mods_cache, indent=4, ensure_ascii=False), encoding="utf-8")
+        found = set()
+        with cache.batch():
+            to_check = []
+            for mod_name, cached_files in cache.fingerprints().items():
+                if mod_name == _GUSTAV_CACHE_KEY:
+                    continue
+                if mod_name not in installed_mods:
+                    print(f"Removing mod {mod_name} from mods cache.")
+                    cache.delete_mod(mod_name)
+                    found.add(mod_name)
+                    continue
+                if changed_mods is not None and mod_name not in changed_mods:
+                    continue
+
+                mod_path = Path(modlist.getMod(mod_name).absolutePath()) / "PAK_FILES"
+                if not mod_path.exists():
+                    print(f"Mod path {mod_path} does not exist. Skipping {mod_name}.")
+                    continue
+
+                current_files = {f.name: f for f in mod_path.glob("*.pak")}
+
+                missing_files = set(cached_files.keys()) - set(current_files.keys())
+                for missing_file in missing_files:
+                    print(f"Removing missing file {missing_file} from {mod_name}.")
+                    cache.delete(mod_name, missing_file)
+                    found.add(mod_name)
+
+                for file_name, pak_path in current_files.items():
+                    cached_file = cached_files.get(file_name)
+                    if cached_file:
+                        to_check.append((mod_name, file_name, pak_path, cached_file))
+
+            _prehash(((pak_path, cached_file) for _, _, pak_path, cached_file in to_check), paranoid)
+            for mod_name, file_name, pak_path, cached_file in to_check:
+                if not _is_cached_fresh(cache, mod_name, pak_path, cached_file, paranoid):
+                    print(f"PAK {file_name} changed (MD5 mismatch), invalidating cache for {mod_name}.")
+                    cache.delete(mod_name, file_name)
+                    found.add(mod_name)
 
         print("Successfully fixed mods cache.")
-        return True
+        return found
 
     except Exception as e:
         print(f"Failed to fix mods cache: {str(e)}")
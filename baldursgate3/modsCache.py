@@ -0,0 +1,558 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import fingerprint, pakRecord, tracing
+
+CACHE_DB_NAME = "modsCache.db"
+LEGACY_CACHE_NAME = "modsCache.json"
+STORE_DB_PATH = Path(__file__).resolve().parent / "metadataCache.db"
+# Upper bound for the serialized metadata and PAK listings kept in the shared store before LRU
+# eviction kicks in.
+STORE_SIZE_LIMIT = 32 * 1024 * 1024
+# Writers to a profile cache lock one of this many stripes, picked by mod name.
+LOCK_STRIPES = 16
+
+_PROFILE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    mod TEXT NOT NULL,
+    file TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    ino INTEGER,
+    md5 TEXT NOT NULL,
+    PRIMARY KEY (mod, file)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metadata_last_used ON metadata (last_used);
+CREATE TABLE IF NOT EXISTS classifications (
+    key TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    override INTEGER NOT NULL,
+    load_order INTEGER NOT NULL,
+    PRIMARY KEY (key, folder)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS paths (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    key TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS prefixes (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS listings (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+_caches: dict[str, "ModsCache"] = {}
+_caches_lock = threading.Lock()
+_store: "MetadataStore | None" = None
+
+
+def open_store() -> "MetadataStore":
+    global _store
+    with _caches_lock:
+        if _store is None:
+            _store = MetadataStore(STORE_DB_PATH)
+        return _store
+
+
+def open_cache(profile_path) -> "ModsCache":
+    store = open_store()
+    key = str(Path(profile_path).resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ModsCache(profile_path, store)
+        return cache
+
+
+# Writes everything still buffered, e.g. before a profile switch or when Mod Organizer quits.
+def flush_all():
+    with _caches_lock:
+        stores = [*_caches.values(), *([_store] if _store is not None else [])]
+    for store in stores:
+        try:
+            store.flush()
+        except Exception as e:
+            print(f"Failed to write {store.path.name}: {e}")
+
+
+def cache_exists(profile_path) -> bool:
+    profile_path = Path(profile_path)
+    return (profile_path / CACHE_DB_NAME).exists() or (profile_path / LEGACY_CACHE_NAME).exists()
+
+
+def _split_entry(meta: dict):
+    data = {k: v for k, v in meta.items() if k != fingerprint.FINGERPRINT_KEY}
+    fp = meta.get(fingerprint.FINGERPRINT_KEY) or [None, None, None, fingerprint.cached_md5(meta)]
+    return fp, data
+
+
+def _join_entry(size, mtime_ns, ino, md5, data: dict) -> dict:
+    meta = dict(data)
+    meta[fingerprint.FINGERPRINT_KEY] = [size, mtime_ns, ino, md5]
+    return meta
+
+
+class _SqliteStore:
+    def __init__(self, path, schema):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        # batch() nesting depth of each thread; a batch only defers the flushes of its own thread.
+        self._local = threading.local()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(schema)
+
+    @contextmanager
+    def batch(self):
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield self
+        finally:
+            self._local.depth -= 1
+            if not self._local.depth:
+                self.flush()
+
+    def _changed(self):
+        if not getattr(self._local, "depth", 0):
+            self.flush()
+
+    # Buffered writes are taken out under the lock, turned into SQL and, when the transaction
+    # fails, put back under any newer writes so the next flush retries them.
+    def _take_buffers(self):
+        return None
+
+    def _writes(self, buffers) -> list[tuple[str, list]]:
+        return []
+
+    def _restore_buffers(self, buffers):
+        pass
+
+    # Returns whether anything was written. Failures are logged rather than raised: the writes stay
+    # buffered, and losing them altogether would only cost a re-extraction next launch.
+    def flush(self) -> bool:
+        with self._lock:
+            buffers = self._take_buffers()
+            writes = [(sql, rows) for sql, rows in self._writes(buffers) if rows]
+            if not writes:
+                return False
+            with tracing.span("cache_flush", "cache", db=self.path.name, rows=sum(len(rows) for _, rows in writes)):
+                try:
+                    self._conn.execute("BEGIN")
+                    for sql, rows in writes:
+                        self._conn.executemany(sql, rows)
+                    self._conn.execute("COMMIT")
+                    return True
+                except sqlite3.Error as e:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    self._restore_buffers(buffers)
+                    print(f"Failed to write {self.path.name}, keeping the changes for the next flush: {e}")
+                    return False
+
+
+# Content addressed metadata shared by every profile (and every instance using this plugin copy).
+# Entries are keyed by the PAK md5, so identical PAKs in several mods or profiles are only ever
+# extracted once. Least recently used entries are evicted, with their listings, once metadata,
+# listings and folder prefixes together pass STORE_SIZE_LIMIT bytes.
+class MetadataStore(_SqliteStore):
+    def __init__(self, path, size_limit=STORE_SIZE_LIMIT):
+        super().__init__(path, _STORE_SCHEMA)
+        self.size_limit = size_limit
+        self._pending: dict[str, tuple[str, int]] = {}
+        self._touched: set[str] = set()
+        self._pending_classifications: dict[tuple[str, str], dict] = {}
+        self._pending_paths: dict[str, tuple] = {}
+        self._pending_listings: dict[str, bytes] = {}
+        self._pending_prefixes: list[tuple[int, str]] = []
+        self._prefix_ids: dict[str, int] | None = None
+        self._prefix_paths: dict[int, str] = {}
+        self._next_prefix_id = 1
+        # Entries parsed so far as compact PakRecords, read without the lock; put() and evict()
+        # replace or drop them.
+        self._parsed: dict[str, pakRecord.PakRecord | dict] = {}
+
+    def get(self, key) -> dict | None:
+        data = self._parsed.get(key)
+        if data is None:
+            with self._lock:
+                pending = self._pending.get(key)
+                row = (pending[0],) if pending is not None else self._conn.execute(
+                    "SELECT data FROM metadata WHERE key = ?", (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            data = self._parsed.setdefault(key, pakRecord.compact(json.loads(row[0])))
+        # Only refreshes last_used, so an update lost to a concurrent flush costs nothing.
+        self._touched.add(key)
+        return pakRecord.expand(data)
+
+    def put(self, key, data: dict):
+        serialized = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            self._pending[key] = (serialized, int(time.time()))
+            self._parsed[key] = pakRecord.compact(json.loads(serialized))
+            self._changed()
+
+    def key_for_path(self, path, stat_key) -> str | None:
+        path = os.path.normcase(os.path.abspath(path))
+        with self._lock:
+            pending = self._pending_paths.get(path)
+            row = pending[1:] if pending else self._conn.execute(
+                "SELECT size, mtime_ns, ino, key FROM paths WHERE path = ?", (path,)
+            ).fetchone()
+        if row and list(row[:3]) == list(stat_key):
+            return row[3]
+        return None
+
+    def remember_path(self, path, stat_key, key):
+        path = os.path.normcase(os.path.abspath(path))
+        with self._lock:
+            self._pending_paths[path] = (path, *stat_key, key)
+            self._changed()
+
+    # Override/LoadOrder flags keyed by PAK content, so they survive restarts and file moves.
+    def get_classification(self, key, folder_name) -> dict | None:
+        lookup = (key, folder_name or "")
+        with self._lock:
+            if lookup in self._pending_classifications:
+                return dict(self._pending_classifications[lookup])
+            row = self._conn.execute(
+                "SELECT override, load_order FROM classifications WHERE key = ? AND folder = ?", lookup
+            ).fetchone()
+        return {"Override": bool(row[0]), "LoadOrder": bool(row[1])} if row else None
+
+    def put_classification(self, key, folder_name, classification: dict):
+        with self._lock:
+            self._pending_classifications[(key, folder_name or "")] = dict(classification)
+            self._changed()
+
+    def _load_prefixes(self):
+        if self._prefix_ids is None:
+            self._prefix_paths = dict(self._conn.execute("SELECT id, path FROM prefixes"))
+            self._prefix_ids = {path: prefix_id for prefix_id, path in self._prefix_paths.items()}
+            self._next_prefix_id = max(self._prefix_paths, default=0) + 1
+
+    def _prefix_id(self, prefix) -> int:
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = self._prefix_ids[prefix] = self._next_prefix_id
+            self._next_prefix_id += 1
+            self._prefix_paths[prefix_id] = prefix
+            self._pending_prefixes.append((prefix_id, prefix))
+        return prefix_id
+
+    # Full file listing of a PAK. Folder prefixes are stored once in the prefixes table and each
+    # listing as zlib compressed "<prefix id>\t<file name>" lines.
+    def get_listing(self, key) -> list[str] | None:
+        with self._lock:
+            data = self._pending_listings.get(key)
+            if data is None:
+                row = self._conn.execute("SELECT data FROM listings WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                data = row[0]
+            self._load_prefixes()
+            prefixes = self._prefix_paths
+        text = zlib.decompress(data).decode("utf-8")
+        listing = []
+        for line in text.split("\n") if text else ():
+            prefix_id, _, name = line.partition("\t")
+            prefix = prefixes[int(prefix_id)]
+            listing.append(f"{prefix}/{name}" if prefix else name)
+        return listing
+
+    def put_listing(self, key, listing: list[str]):
+        with self._lock:
+            self._load_prefixes()
+            lines = []
+            for path in listing:
+                prefix, _, name = path.replace("\\", "/").rpartition("/")
+                lines.append(f"{self._prefix_id(prefix)}\t{name}")
+            self._pending_listings[key] = zlib.compress("\n".join(lines).encode("utf-8"))
+            self._changed()
+
+    def _take_buffers(self):
+        pending, self._pending = self._pending, {}
+        touched, self._touched = self._touched - pending.keys(), set()
+        classifications, self._pending_classifications = self._pending_classifications, {}
+        paths, self._pending_paths = self._pending_paths, {}
+        listings, self._pending_listings = self._pending_listings, {}
+        prefixes, self._pending_prefixes = self._pending_prefixes, []
+        return pending, touched, classifications, paths, listings, prefixes
+
+    def _restore_buffers(self, buffers):
+        pending, touched, classifications, paths, listings, prefixes = buffers
+        self._pending = {**pending, **self._pending}
+        self._touched |= touched
+        self._pending_classifications = {**classifications, **self._pending_classifications}
+        self._pending_paths = {**paths, **self._pending_paths}
+        self._pending_listings = {**listings, **self._pending_listings}
+        self._pending_prefixes = prefixes + self._pending_prefixes
+
+    def _writes(self, buffers):
+        pending, touched, classifications, paths, listings, prefixes = buffers
+        now = int(time.time())
+        return [
+            (
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                [(key, data, len(data), used) for key, (data, used) in pending.items()],
+            ),
+            ("UPDATE metadata SET last_used = ? WHERE key = ?", [(now, key) for key in touched]),
+            (
+                "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?)",
+                [(*key, int(c["Override"]), int(c["LoadOrder"])) for key, c in classifications.items()],
+            ),
+            ("INSERT OR REPLACE INTO paths VALUES (?, ?, ?, ?, ?)", list(paths.values())),
+            ("INSERT OR IGNORE INTO prefixes VALUES (?, ?)", prefixes),
+            ("INSERT OR REPLACE INTO listings VALUES (?, ?)", list(listings.items())),
+        ]
+
+    def flush(self):
+        with self._lock:
+            grew = bool(self._pending or self._pending_listings)
+            wrote = super().flush()
+            if wrote and grew:
+                self.evict()
+            return wrote
+
+    def _stored_size(self) -> int:
+        return self._conn.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM metadata)"
+            " + (SELECT COALESCE(SUM(LENGTH(data)), 0) FROM listings)"
+            " + (SELECT COALESCE(SUM(LENGTH(path)), 0) FROM prefixes)"
+        ).fetchone()[0]
+
+    # Ids of the prefixes still used by a listing; eviction is rare enough to decode them all.
+    def _used_prefixes(self) -> set[int]:
+        used = set()
+        for (data,) in self._conn.execute("SELECT data FROM listings"):
+            text = zlib.decompress(data).decode("utf-8")
+            used.update(int(line.partition("\t")[0]) for line in text.split("\n") if line)
+        return used
+
+    def evict(self):
+        with self._lock:
+            total = self._stored_size()
+            if total <= self.size_limit:
+                return
+            target = total - int(self.size_limit * 0.9)
+            evicted = []
+            rows = self._conn.execute(
+                "SELECT m.key, m.size + COALESCE(LENGTH(l.data), 0) FROM metadata m"
+                " LEFT JOIN listings l ON l.key = m.key ORDER BY m.last_used"
+            )
+            for key, size in rows:
+                if target <= 0:
+                    break
+                evicted.append((key,))
+                target -= size
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("DELETE FROM metadata WHERE key = ?", evicted)
+                self._conn.executemany("DELETE FROM classifications WHERE key = ?", evicted)
+                self._conn.executemany("DELETE FROM paths WHERE key = ?", evicted)
+                # Listings of PAKs without metadata (no meta.lsx) have nothing to be evicted with.
+                self._conn.execute("DELETE FROM listings WHERE key NOT IN (SELECT key FROM metadata)")
+                used = self._used_prefixes()
+                self._conn.executemany(
+                    "DELETE FROM prefixes WHERE id = ?",
+                    [(prefix_id,) for (prefix_id,) in self._conn.execute("SELECT id FROM prefixes") if prefix_id not in used],
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                print(f"Failed to evict entries from the shared metadata cache: {e}")
+                return
+            self._prefix_ids = None
+            for (key,) in evicted:
+                self._parsed.pop(key, None)
+            print(f"Evicted {len(evicted)} entries from the shared metadata cache.")
+
+
+# Per-profile index from (mod, file) to the PAK fingerprint and its entry in the shared
+# MetadataStore, shared by every caller through open_cache(). The whole index is loaded into
+# memory once; reads never lock, writers lock the stripe of their mod and replace that mod's
+# dict rather than changing it, so readers always see a consistent copy. Writes are buffered per
+# stripe until flush(): once at the end of each batch(), i.e. once per operation.
+class ModsCache(_SqliteStore):
+    def __init__(self, profile_path, store: MetadataStore):
+        self.profile_path = Path(profile_path)
+        self.store = store
+        super().__init__(self.profile_path / CACHE_DB_NAME, _PROFILE_SCHEMA)
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        # (mod, file) -> row, or None to delete; (mod, None) deletes the whole mod first.
+        self._dirty: list[dict[tuple[str, str | None], tuple | None]] = [{} for _ in range(LOCK_STRIPES)]
+        self._files: dict[str, dict[str, tuple]] = {}
+        for mod_name, file_name, *row in self._conn.execute("SELECT mod, file, size, mtime_ns, ino, md5 FROM files"):
+            self._files.setdefault(mod_name, {})[file_name] = tuple(row)
+        self._migrate_json()
+
+    def _migrate_json(self):
+        legacy_path = self.profile_path / LEGACY_CACHE_NAME
+        if not legacy_path.exists():
+            return
+        try:
+            legacy = json.loads(legacy_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not migrate {legacy_path}: {e}")
+            legacy = {}
+        count = 0
+        with self.batch():
+            for mod_name, mod_data in legacy.items():
+                for file_name, meta in mod_data.get("Files", {}).items():
+                    if fingerprint.cached_md5(meta):
+                        self.put(mod_name, file_name, meta)
+                        count += 1
+        legacy_path.replace(legacy_path.with_suffix(".json.migrated"))
+        print(f"Migrated {count} entries from {LEGACY_CACHE_NAME} to {CACHE_DB_NAME}.")
+
+    @contextmanager
+    def batch(self):
+        with self.store.batch(), super().batch():
+            yield self
+
+    def _row(self, mod_name, file_name):
+        return self._files.get(mod_name, {}).get(file_name)
+
+    def get(self, mod_name, file_name) -> dict | None:
+        row = self._row(mod_name, file_name)
+        if row is None:
+            return None
+        data = self.store.get(row[3])
+        return _join_entry(*row, data) if data is not None else None
+
+    def get_mod(self, mod_name) -> dict[str, dict]:
+        files = {}
+        for file_name, row in self._files.get(mod_name, {}).items():
+            data = self.store.get(row[3])
+            if data is not None:
+                files[file_name] = _join_entry(*row, data)
+        return files
+
+    def fingerprints(self) -> dict[str, dict[str, dict]]:
+        return {
+            mod_name: {file_name: {fingerprint.FINGERPRINT_KEY: list(row)} for file_name, row in rows.items()}
+            for mod_name, rows in list(self._files.items())
+        }
+
+    # Small per-profile values such as the inputs modsettings.lsx was last generated from.
+    def get_state(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_state(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value)))
+
+    def get_classification(self, md5, folder_name) -> dict | None:
+        return self.store.get_classification(md5, folder_name)
+
+    def put_classification(self, md5, folder_name, classification: dict):
+        self.store.put_classification(md5, folder_name, classification)
+
+    def put(self, mod_name, file_name, meta: dict):
+        fp, data = _split_entry(meta)
+        if not fp[3]:
+            return
+        self.store.put(fp[3], data)
+        self.link(mod_name, file_name, fp)
+
+    def _stripe(self, mod_name) -> int:
+        return hash(mod_name) % LOCK_STRIPES
+
+    def _set(self, mod_name, file_name, row):
+        stripe = self._stripe(mod_name)
+        with self._stripes[stripe]:
+            files = dict(self._files.get(mod_name, {}))
+            if row is None:
+                files.pop(file_name, None)
+            else:
+                files[file_name] = row
+            if files:
+                self._files[mod_name] = files
+            else:
+                self._files.pop(mod_name, None)
+            self._dirty[stripe][(mod_name, file_name)] = row
+        self._changed()
+
+    # Points (mod, file) at metadata that is already in the shared store.
+    def link(self, mod_name, file_name, fp):
+        self._set(mod_name, file_name, tuple(fp))
+
+    def update_fingerprint(self, mod_name, file_name, fp):
+        self.link(mod_name, file_name, fp)
+
+    def delete(self, mod_name, file_name):
+        self._set(mod_name, file_name, None)
+
+    def delete_mod(self, mod_name):
+        stripe = self._stripe(mod_name)
+        with self._stripes[stripe]:
+            self._files.pop(mod_name, None)
+            dirty = self._dirty[stripe]
+            for key in [k for k in dirty if k[0] == mod_name]:
+                del dirty[key]
+            dirty[(mod_name, None)] = None
+        self._changed()
+
+    def _take_buffers(self):
+        pending = {}
+        for stripe, lock in enumerate(self._stripes):
+            with lock:
+                dirty, self._dirty[stripe] = self._dirty[stripe], {}
+            pending.update(dirty)
+        return pending
+
+    # Newer writes win; rows of a mod deleted since are not brought back.
+    def _restore_buffers(self, pending):
+        by_stripe: dict[int, list] = {}
+        for key, row in pending.items():
+            by_stripe.setdefault(self._stripe(key[0]), []).append((key, row))
+        for stripe, rows in by_stripe.items():
+            with self._stripes[stripe]:
+                dirty = self._dirty[stripe]
+                newer = dict(dirty)
+                for (mod_name, file_name), row in rows:
+                    if (mod_name, file_name) not in newer and (mod_name, None) not in newer:
+                        dirty[(mod_name, file_name)] = row
+
+    def _writes(self, pending):
+        return [
+            ("DELETE FROM files WHERE mod = ?", [(mod,) for mod, file_name in pending if file_name is None]),
+            (
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                [(*key, *row) for key, row in pending.items() if row is not None],
+            ),
+            (
+                "DELETE FROM files WHERE mod = ? AND file = ?",
+                [key for key, row in pending.items() if row is None and key[1] is not None],
+            ),
+        ]
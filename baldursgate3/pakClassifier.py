@@ -0,0 +1,63 @@
+import re
+from typing import Iterable
+
+
+def _build_trie(needles: Iterable[str]) -> dict:
+    trie: dict = {}
+    # Shorter needles sort first; once one ends, every longer needle sharing it as a prefix is
+    # already covered by the substring match and can be dropped.
+    for needle in sorted(set(needles)):
+        node = trie
+        for char in needle:
+            if "" in node:
+                break
+            node = node.setdefault(char, {})
+        else:
+            node.clear()
+            node[""] = {}
+    return trie
+
+
+def _trie_pattern(node: dict) -> str:
+    if "" in node:
+        return ""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items())]
+    return branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+
+
+def substring_pattern(needles: Iterable[str]) -> str:
+    return _trie_pattern(_build_trie(needles))
+
+
+# Classifies a PAK listing as an override and/or load order PAK. A line is an override line when it
+# contains one of the builtin folders and none of the ignored paths; the PAK needs a load order entry
+# when it contains Public/<Folder> or more than one line mentioning Mods/<Folder>.
+class OverrideClassifier:
+    def __init__(self, builtin_folders: Iterable[str], ignored_paths: Iterable[str]):
+        self._builtin = re.compile(substring_pattern(builtin_folders))
+        self._ignored = re.compile(substring_pattern(ignored_paths))
+
+    def _has_override_line(self, text: str) -> bool:
+        pos = 0
+        while match := self._builtin.search(text, pos):
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            line_end = text.find("\n", match.end())
+            if line_end == -1:
+                line_end = len(text)
+            if not self._ignored.search(text, line_start, line_end):
+                return True
+            pos = line_end + 1
+        return False
+
+    # Takes the whole listing as one newline separated string, so every scan runs in C.
+    def classify_text(self, text: str, folder_name: str | None = None) -> dict:
+        override = self._has_override_line(text)
+        load_order = False
+        if folder_name:
+            mods_folder_path = f"Mods/{folder_name}"
+            if f"Public/{folder_name}" in text:
+                load_order = True
+            elif (first := text.find(mods_folder_path)) != -1:
+                line_end = text.find("\n", first)
+                load_order = line_end != -1 and text.find(mods_folder_path, line_end + 1) != -1
+        return {"Override": override, "LoadOrder": load_order}
@@ -0,0 +1,124 @@
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+
+class Provider(NamedTuple):
+    mod: str
+    pak: str
+    priority: int
+
+
+_indexes: dict[str, "PakFileIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def open_index(profile_path) -> "PakFileIndex":
+    key = str(Path(profile_path).resolve())
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = PakFileIndex()
+        return index
+
+
+# The game resolves paths case-insensitively, so the index keys are lower case.
+def _normalize(path: str) -> str:
+    return path.replace("\\", "/").strip("/").lower()
+
+
+# Which PAKs of a profile provide each file, built from the PAK listings kept in the shared metadata
+# store. Paths are held as an interned folder prefix plus a file name, so the thousands of files of
+# one folder share its string, and every file refers to its (mod, pak) key instead of copying it.
+# update() only re-reads the PAKs whose md5 changed; mod priorities are looked up at query time,
+# so reordering mods costs nothing.
+class PakFileIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paks: dict[tuple[str, str], tuple[str, list[tuple[str, str]]]] = {}
+        self._files: dict[str, dict[str, list[tuple[str, str]]]] = {}
+        self._priorities: dict[str, int] = {}
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(names) for names in self._files.values())
+
+    # paks maps (mod, pak file name) to (md5, path on disk); read_listing(md5, path) returns the
+    # PAK's file list or None when it can't be read. Returns the number of PAKs (re)indexed.
+    def update(self, paks: dict[tuple[str, str], tuple[str, object]], priorities: dict[str, int],
+               read_listing: Callable[[str, object], list[str] | None]) -> int:
+        with self._lock:
+            self._priorities = dict(priorities)
+            stale = [key for key, (md5, _) in self._paks.items() if key not in paks or paks[key][0] != md5]
+            for key in stale:
+                self._remove(key)
+            added = [(key, md5, path) for key, (md5, path) in paks.items() if key not in self._paks]
+
+        for key, md5, path in added:
+            listing = read_listing(md5, path)
+            if listing is None:
+                continue
+            entries = []
+            for file_path in listing:
+                prefix, _, name = _normalize(file_path).rpartition("/")
+                entries.append((sys.intern(prefix), sys.intern(name)))
+            with self._lock:
+                if key in self._paks:
+                    continue
+                self._paks[key] = (md5, entries)
+                for prefix, name in entries:
+                    self._files.setdefault(prefix, {}).setdefault(name, []).append(key)
+        return len(added)
+
+    def _remove(self, key):
+        _, entries = self._paks.pop(key)
+        for prefix, name in entries:
+            names = self._files[prefix]
+            keys = names[name]
+            keys.remove(key)
+            if not keys:
+                del names[name]
+                if not names:
+                    del self._files[prefix]
+
+    def _providers(self, keys) -> list[Provider]:
+        providers = [Provider(mod, pak, self._priorities.get(mod, -1)) for mod, pak in keys]
+        providers.sort(key=lambda provider: (-provider.priority, provider.pak))
+        return providers
+
+    # Every PAK containing path, the one that wins (highest mod priority) first.
+    def providers(self, path) -> list[Provider]:
+        prefix, _, name = _normalize(path).rpartition("/")
+        with self._lock:
+            return self._providers(self._files.get(prefix, {}).get(name, ()))
+
+    def winner(self, path) -> Provider | None:
+        providers = self.providers(path)
+        return providers[0] if providers else None
+
+    # Files provided by more than one PAK, optionally only below a folder such as "Public".
+    def conflicts(self, folder="") -> dict[str, list[Provider]]:
+        folder = _normalize(folder)
+        result = {}
+        with self._lock:
+            for prefix, names in self._files.items():
+                if folder and prefix != folder and not prefix.startswith(folder + "/"):
+                    continue
+                for name, keys in names.items():
+                    if len(keys) > 1:
+                        result[f"{prefix}/{name}" if prefix else name] = self._providers(keys)
+        return result
+
+    # Files of one mod that other PAKs provide as well.
+    def conflicts_of(self, mod_name) -> dict[str, list[Provider]]:
+        result = {}
+        with self._lock:
+            for (mod, _), (_, entries) in self._paks.items():
+                if mod != mod_name:
+                    continue
+                for prefix, name in entries:
+                    keys = self._files[prefix][name]
+                    if len(keys) > 1:
+                        result[f"{prefix}/{name}" if prefix else name] = self._providers(keys)
+        return result
@@ -0,0 +1,377 @@
+import hashlib
+import os
+import shutil
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import NamedTuple
+
+from . import tracing
+
+try:
+    import lz4.block as _lz4_block  # type: ignore
+except ImportError:
+    _lz4_block = None
+
+try:
+    import zstandard as _zstandard  # type: ignore
+except ImportError:
+    _zstandard = None
+
+LSPK_SIGNATURE = b"LSPK"
+SUPPORTED_VERSIONS = (15, 16, 18)
+
+# Header layouts follow LSLib's LSPKHeader15/LSPKHeader16, entry layouts FileEntry15/FileEntry18.
+_HEADER15 = struct.Struct("<IQIBB16s")
+_HEADER16 = struct.Struct("<IQIBB16sH")
+_FILE_LIST_HEADER = struct.Struct("<II")
+_ENTRY15 = struct.Struct("<256sQQQIIII")
+_ENTRY18 = struct.Struct("<256sIHBBII")
+
+_COMPRESSION_NONE = 0
+_COMPRESSION_ZLIB = 1
+_COMPRESSION_LZ4 = 2
+_COMPRESSION_ZSTD = 3
+_PACKAGE_FLAG_SOLID = 0x04
+
+
+class PakFormatError(Exception):
+    pass
+
+
+class PakEntry(NamedTuple):
+    name: str
+    offset: int
+    size_on_disk: int
+    uncompressed_size: int
+    archive_part: int
+    flags: int
+
+
+class PakContents(NamedTuple):
+    listing: list[str]
+    meta_lsx: bytes | None
+
+
+def lz4_block_decompress(data: bytes, uncompressed_size: int) -> bytes:
+    if _lz4_block is not None:
+        return _lz4_block.decompress(data, uncompressed_size=uncompressed_size)
+
+    out = bytearray()
+    pos = 0
+    end = len(data)
+    try:
+        while pos < end:
+            token = data[pos]
+            pos += 1
+
+            literal_length = token >> 4
+            if literal_length == 15:
+                while True:
+                    extra = data[pos]
+                    pos += 1
+                    literal_length += extra
+                    if extra != 255:
+                        break
+            out += data[pos:pos + literal_length]
+            pos += literal_length
+            if pos >= end:
+                break
+
+            offset = data[pos] | (data[pos + 1] << 8)
+            pos += 2
+            match_length = token & 0x0F
+            if match_length == 15:
+                while True:
+                    extra = data[pos]
+                    pos += 1
+                    match_length += extra
+                    if extra != 255:
+                        break
+            match_length += 4
+
+            start = len(out) - offset
+            if offset == 0 or start < 0:
+                raise PakFormatError("Invalid LZ4 match offset")
+            if match_length <= offset:
+                out += out[start:start + match_length]
+            else:
+                pattern = out[start:]
+                out += (pattern * (match_length // offset + 1))[:match_length]
+    except IndexError:
+        raise PakFormatError("Truncated LZ4 block") from None
+
+    if len(out) != uncompressed_size:
+        raise PakFormatError(f"LZ4 block decoded to {len(out)} bytes, expected {uncompressed_size}")
+    return bytes(out)
+
+
+def _decompress(data: bytes, method: int, uncompressed_size: int) -> bytes:
+    if method == _COMPRESSION_NONE:
+        return data
+    if method == _COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if method == _COMPRESSION_LZ4:
+        return lz4_block_decompress(data, uncompressed_size)
+    if method == _COMPRESSION_ZSTD:
+        if _zstandard is None:
+            raise PakFormatError("zstd compressed entry and the zstandard module is not available")
+        return _zstandard.ZstdDecompressor().decompress(data, max_output_size=uncompressed_size)
+    raise PakFormatError(f"Unknown compression method {method}")
+
+
+class LSPKReader:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(4) != LSPK_SIGNATURE:
+                raise PakFormatError(f"{self.path.name} is not an LSPK package")
+            version = struct.unpack("<I", f.read(4))[0]
+            if version not in SUPPORTED_VERSIONS:
+                raise PakFormatError(f"Unsupported LSPK version {version}")
+            f.seek(4)
+            header = _HEADER15 if version == 15 else _HEADER16
+            fields = header.unpack(f.read(header.size))
+            self.version = version
+            file_list_offset = fields[1]
+            self.flags = fields[3]
+            self.priority = fields[4]
+            self.num_parts = fields[6] if version != 15 else 1
+
+            f.seek(file_list_offset)
+            num_files, compressed_size = _FILE_LIST_HEADER.unpack(f.read(_FILE_LIST_HEADER.size))
+            compressed = f.read(compressed_size)
+
+        entry_struct = _ENTRY18 if version >= 18 else _ENTRY15
+        raw = lz4_block_decompress(compressed, entry_struct.size * num_files)
+        self.entries = [self._parse_entry(fields) for fields in entry_struct.iter_unpack(raw)]
+
+    def _parse_entry(self, fields) -> PakEntry:
+        name = fields[0].split(b"\0", 1)[0].decode("utf-8").replace("\\", "/")
+        if self.version >= 18:
+            _, offset_low, offset_high, part, flags, size_on_disk, uncompressed_size = fields
+            offset = offset_low | (offset_high << 32)
+        else:
+            _, offset, size_on_disk, uncompressed_size, part, flags, _crc, _unknown = fields
+        return PakEntry(name, offset, size_on_disk, uncompressed_size, part, flags)
+
+    def listing(self) -> list[str]:
+        return [entry.name for entry in self.entries]
+
+    def find_meta_lsx(self) -> PakEntry | None:
+        candidates = [e for e in self.entries if e.name.rsplit("/", 1)[-1].casefold() == "meta.lsx"]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda e: (not e.name.startswith("Mods/"), e.name.count("/"), e.name))
+
+    def _part_path(self, part: int) -> Path:
+        if part == 0:
+            return self.path
+        return self.path.with_name(f"{self.path.stem}_{part}{self.path.suffix}")
+
+    def read(self, entry: PakEntry) -> bytes:
+        if self.flags & _PACKAGE_FLAG_SOLID:
+            raise PakFormatError("Solid packages are not supported by the native reader")
+        with open(self._part_path(entry.archive_part), "rb") as f:
+            f.seek(entry.offset)
+            data = f.read(entry.size_on_disk)
+        if len(data) != entry.size_on_disk:
+            raise PakFormatError(f"Truncated entry {entry.name}")
+        return _decompress(data, entry.flags & 0x0F, entry.uncompressed_size)
+
+
+class PakExtractor(ABC):
+    name = ""
+
+    @abstractmethod
+    def read(self, pak_path) -> PakContents:
+        ...
+
+    # In-process read for pipelined callers; None means the PAK has to go through read_many()
+    # (e.g. because it needs an external tool that should only be spawned once per batch).
+    def try_read(self, pak_path) -> PakContents | None:
+        return None
+
+    def list(self, pak_path) -> list[str]:
+        return self.read(pak_path).listing
+
+    # Reads a whole work queue; failures are returned in place of the contents instead of raised.
+    def read_many(self, pak_paths, executor=None) -> dict[Path, PakContents | Exception]:
+        def safe_read(pak_path):
+            try:
+                return self.read(pak_path)
+            except Exception as e:
+                return e
+
+        pak_paths = [Path(p) for p in pak_paths]
+        results = executor.map(safe_read, pak_paths) if executor is not None else map(safe_read, pak_paths)
+        return dict(zip(pak_paths, results))
+
+
+class NativeExtractor(PakExtractor):
+    name = "native"
+
+    def try_read(self, pak_path) -> PakContents | None:
+        try:
+            return self.read(pak_path)
+        except Exception:
+            return None
+
+    def list(self, pak_path) -> list[str]:
+        return LSPKReader(pak_path).listing()
+
+    def read(self, pak_path) -> PakContents:
+        with tracing.span("native_read", "extract", pak=Path(pak_path).name):
+            reader = LSPKReader(pak_path)
+            meta_entry = reader.find_meta_lsx()
+            meta_lsx = reader.read(meta_entry) if meta_entry is not None else None
+            return PakContents(reader.listing(), meta_lsx)
+
+
+class DivineExtractor(PakExtractor):
+    name = "divine"
+
+    def __init__(self, divine_path, temp_dir):
+        self.divine_path = Path(divine_path)
+        self.temp_dir = Path(temp_dir)
+
+    def _run(self, *args, **kwargs):
+        import subprocess
+
+        tracing.count("divine.spawned")
+        with tracing.span("divine", "subprocess", action=args[1] if len(args) > 1 else ""):
+            return subprocess.run(
+                [str(self.divine_path), *args],
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+                check=True,
+                **kwargs,
+            )
+
+    def list(self, pak_path) -> list[str]:
+        # The file table is plain LZ4 even in packages the native reader can't extract from,
+        # so only spawn Divine for the listing when the header itself is unreadable.
+        try:
+            return LSPKReader(pak_path).listing()
+        except Exception:
+            pass
+        result = self._run("-a", "list-package", "-g", "bg3", "-s", str(pak_path), capture_output=True, text=True)
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+    def read(self, pak_path) -> PakContents:
+        output_dir = self.temp_dir / hashlib.md5(str(pak_path).encode()).hexdigest()[:10]
+        if output_dir.exists():
+            shutil.rmtree(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            self._run(
+                "-a", "extract-package", "-g", "bg3", "-s", str(pak_path), "-d", str(output_dir),
+                "-x", "*/meta.lsx", "-l", "off",
+            )
+            meta_lsx = _find_extracted_meta(output_dir)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        return PakContents(self.list(pak_path), meta_lsx)
+
+    # Hardlinks the queue into one staging directory and extracts every meta.lsx with a single
+    # extract-packages run, so the .NET runtime starts once per batch instead of twice per PAK.
+    # --use-package-name puts each package in its own <index> folder; a PAK whose folder is missing
+    # is extracted again on its own. Split PAKs stay out of the batch, since Divine would take their
+    # staged parts for packages of their own.
+    def read_many(self, pak_paths, executor=None) -> dict[Path, PakContents | Exception]:
+        pak_paths = [Path(p) for p in pak_paths]
+        if len(pak_paths) < 2:
+            return super().read_many(pak_paths, executor)
+
+        batch_dir = self.temp_dir / f"batch_{hashlib.md5(str(pak_paths).encode()).hexdigest()[:10]}"
+        staging_dir = batch_dir / "paks"
+        output_dir = batch_dir / "extracted"
+        results: dict[Path, PakContents | Exception] = {}
+        staged: dict[str, Path] = {}
+        try:
+            if batch_dir.exists():
+                shutil.rmtree(batch_dir)
+            staging_dir.mkdir(parents=True)
+            for index, pak_path in enumerate(pak_paths):
+                if pak_path.with_name(f"{pak_path.stem}_1{pak_path.suffix}").exists():
+                    continue
+                try:
+                    os.link(pak_path, staging_dir / f"{index}.pak")
+                except OSError:
+                    continue
+                staged[str(index)] = pak_path
+
+            if staged:
+                self._run(
+                    "-a", "extract-packages", "-g", "bg3", "-s", str(staging_dir), "-d", str(output_dir),
+                    "-x", "*/meta.lsx", "-l", "off", "--use-package-name",
+                )
+                for index, pak_path in staged.items():
+                    if not (output_dir / index).is_dir():
+                        continue
+                    try:
+                        results[pak_path] = PakContents(self.list(pak_path), _find_extracted_meta(output_dir / index))
+                    except Exception as e:
+                        results[pak_path] = e
+        except Exception as e:
+            print(f"Batch extraction failed, extracting packages one by one: {e}")
+            results.clear()
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+        remaining = [p for p in pak_paths if p not in results]
+        if remaining:
+            results.update(super().read_many(remaining, executor))
+        return results
+
+
+def _find_extracted_meta(output_dir: Path) -> bytes | None:
+    meta_files = list(output_dir.glob("**/meta.lsx"))
+    return meta_files[0].read_bytes() if meta_files else None
+
+
+class FallbackExtractor(PakExtractor):
+    name = "fallback"
+
+    def __init__(self, *backends: PakExtractor):
+        self.backends = backends
+
+    def try_read(self, pak_path) -> PakContents | None:
+        return self.backends[0].try_read(pak_path) if self.backends else None
+
+    def read(self, pak_path) -> PakContents:
+        errors = []
+        for backend in self.backends:
+            try:
+                return backend.read(pak_path)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+        raise PakFormatError(f"No extractor could read {Path(pak_path).name} ({'; '.join(errors)})")
+
+    def list(self, pak_path) -> list[str]:
+        errors = []
+        for backend in self.backends:
+            try:
+                return backend.list(pak_path)
+            except Exception as e:
+                errors.append(f"{backend.name}: {e}")
+        raise PakFormatError(f"No extractor could list {Path(pak_path).name} ({'; '.join(errors)})")
+
+    def read_many(self, pak_paths, executor=None) -> dict[Path, PakContents | Exception]:
+        pending = [Path(p) for p in pak_paths]
+        results: dict[Path, PakContents | Exception] = {}
+        errors: dict[Path, list[str]] = {p: [] for p in pending}
+        for backend in self.backends:
+            if not pending:
+                break
+            for pak_path, contents in backend.read_many(pending, executor).items():
+                if isinstance(contents, Exception):
+                    errors[pak_path].append(f"{backend.name}: {contents}")
+                else:
+                    results[pak_path] = contents
+            pending = [p for p in pending if p not in results]
+        for pak_path in pending:
+            results[pak_path] = PakFormatError(
+                f"No extractor could read {pak_path.name} ({'; '.join(errors[pak_path])})"
+            )
+        return results
@@ -0,0 +1,119 @@
+import sys
+
+# meta.lsx attributes kept for every PAK, in the order they are written to modsettings.lsx.
+ATTRIBUTES = ("Folder", "MD5", "Name", "PublishHandle", "UUID", "Version64", "Version")
+_SLOTS = ("folder", "md5", "name", "publish_handle", "uuid", "version64", "version")
+_INTEGER_ATTRIBUTES = frozenset({"PublishHandle", "Version64", "Version"})
+
+_POSITIONS = {attribute: index for index, attribute in enumerate(ATTRIBUTES)}
+
+_OVERRIDE = 1
+_LOAD_ORDER = 2
+_HAS_OVERRIDE = 4
+_HAS_LOAD_ORDER = 8
+# Flag key -> (presence bit, value bit); Override has to come before LoadOrder.
+_FLAGS = {"Override": (_HAS_OVERRIDE, _OVERRIDE), "LoadOrder": (_HAS_LOAD_ORDER, _LOAD_ORDER)}
+
+# ((attribute, slot, type), ...) tuples shared by every record with the same attributes and types.
+_layouts: dict[tuple, tuple] = {}
+
+
+def _pack(attribute, value):
+    if not isinstance(value, str):
+        return value
+    if attribute in _INTEGER_ATTRIBUTES:
+        if value.isascii() and value.isdigit() and str(int(value)) == value:
+            return int(value)
+    elif attribute == "MD5":
+        if len(value) == 32:
+            try:
+                packed = bytes.fromhex(value)
+            except ValueError:
+                return value
+            if packed.hex() == value:
+                return packed
+    elif attribute == "UUID":
+        if len(value) == 36 and value[8] == value[13] == value[18] == value[23] == "-":
+            try:
+                packed = bytes.fromhex(value.replace("-", ""))
+            except ValueError:
+                return value
+            if _uuid_text(packed) == value:
+                return packed
+    return value
+
+
+def _uuid_text(packed: bytes) -> str:
+    h = packed.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _unpack(attribute, value):
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, bytes):
+        return _uuid_text(value) if attribute == "UUID" else value.hex()
+    return value
+
+
+# One PAK's metadata as held in memory: the Override/LoadOrder flags packed into one int, UUID and
+# MD5 as raw bytes, numeric attributes as ints and the attribute types in a layout tuple shared
+# with every record of the same shape. to_dict() gives back exactly the dict it was made from.
+class PakRecord:
+    __slots__ = ("flags", "layout", *_SLOTS)
+
+    # Attribute slots not named in layout are left unset.
+    def __init__(self, flags, layout):
+        self.flags = flags
+        self.layout = layout
+
+    # None when meta is not in the shape the plugin writes (extra keys, other order), so the
+    # caller can keep that entry as a dict and nothing is lost.
+    @classmethod
+    def from_dict(cls, meta: dict) -> "PakRecord | None":
+        flags = 0
+        layout = []
+        values = []
+        position = -1
+        for key, attribute in meta.items():
+            if attribute is True or attribute is False:
+                flag = _FLAGS.get(key)
+                if flag is None or layout or flags & flag[0] or flags > flag[0]:
+                    return None
+                flags |= flag[0] | (flag[1] if attribute else 0)
+                continue
+            index = _POSITIONS.get(key, -1)
+            if index <= position or type(attribute) is not dict or len(attribute) != 2:
+                return None
+            value = attribute.get("value", 0)
+            attribute_type = attribute.get("type")
+            if type(attribute_type) is not str or not (value is None or type(value) is str):
+                return None
+            position = index
+            layout.append((key, _SLOTS[index], sys.intern(attribute_type)))
+            values.append(_pack(key, value))
+        layout = tuple(layout)
+        record = cls(flags, _layouts.setdefault(layout, layout))
+        for (_, slot, _), value in zip(layout, values):
+            setattr(record, slot, value)
+        return record
+
+    def to_dict(self) -> dict:
+        meta = {}
+        flags = self.flags
+        if flags & _HAS_OVERRIDE:
+            meta["Override"] = bool(flags & _OVERRIDE)
+        if flags & _HAS_LOAD_ORDER:
+            meta["LoadOrder"] = bool(flags & _LOAD_ORDER)
+        for attribute, slot, attribute_type in self.layout:
+            meta[attribute] = {"value": _unpack(attribute, getattr(self, slot)), "type": attribute_type}
+        return meta
+
+
+# Records where the metadata fits one, the dict itself otherwise.
+def compact(meta: dict):
+    return PakRecord.from_dict(meta) or meta
+
+
+def expand(data) -> dict:
+    return data.to_dict() if isinstance(data, PakRecord) else dict(data)
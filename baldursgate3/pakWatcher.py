@@ -0,0 +1,209 @@
+import os
+import threading
+from pathlib import Path
+
+from . import tracing
+
+# Watching more directories than this is left to the polling fallback: QFileSystemWatcher needs a
+# handle (and on Windows, a share of a thread) per directory.
+MAX_WATCHES = 4096
+POLL_INTERVAL = 30.0
+
+
+def _pak_snapshot(path) -> frozenset:
+    try:
+        with os.scandir(path) as it:
+            return frozenset((entry.name, *_stat(entry)) for entry in it)
+    except OSError:
+        return frozenset()
+
+
+def _stat(entry):
+    st = entry.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+class _QtBackend:
+    def __init__(self, on_change):
+        from PyQt6.QtCore import QFileSystemWatcher  # type: ignore
+
+        self._watcher = QFileSystemWatcher()
+        self._watcher.directoryChanged.connect(on_change)
+
+    def add(self, paths) -> list[str]:
+        return list(self._watcher.addPaths(paths)) if paths else []
+
+    def remove(self, paths):
+        if paths:
+            self._watcher.removePaths(paths)
+
+    def stop(self):
+        paths = self._watcher.directories()
+        if paths:
+            self._watcher.removePaths(paths)
+
+
+# Compares a (name, size, mtime) snapshot of every polled directory on a timer.
+class _PollingBackend:
+    def __init__(self, on_change, interval=POLL_INTERVAL):
+        self._on_change = on_change
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, frozenset] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="BG3 PAK poller", daemon=True)
+        self._thread.start()
+
+    def add(self, paths) -> list[str]:
+        with self._lock:
+            for path in paths:
+                self._snapshots[path] = _pak_snapshot(path)
+        return []
+
+    def remove(self, paths):
+        with self._lock:
+            for path in paths:
+                self._snapshots.pop(path, None)
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        with self._lock:
+            paths = list(self._snapshots)
+        for path in paths:
+            snapshot = _pak_snapshot(path)
+            with self._lock:
+                if path not in self._snapshots or self._snapshots[path] == snapshot:
+                    continue
+                self._snapshots[path] = snapshot
+            self._on_change(path)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.poll()
+
+
+# Tracks which mods had their PAK_FILES touched since the last launch, so that launch only
+# revalidates those. Each mod's PAK_FILES folder (or the mod folder itself while it has none) is
+# watched through QFileSystemWatcher; folders it refuses, or that exceed MAX_WATCHES, are polled.
+# The polling thread is only started once there is a folder to poll.
+#
+# changes() returns None whenever the dirty set can't be trusted: right after start, after an
+# overflow or a profile switch, and every verify_every launches. The caller then does a full scan and
+# hands the mods it found changed to full_scan_done(); if a verification scan finds a change the
+# watcher never reported, events were missed and every later launch falls back to full scans.
+class PakWatcher:
+    def __init__(self, mods_path, verify_every=20, use_qt=True, poll_interval=POLL_INTERVAL):
+        self.mods_path = Path(mods_path)
+        self.verify_every = verify_every
+        self.trusted = True
+        self._lock = threading.Lock()
+        self._dirty: set[str] = set()
+        self._full_scan = True
+        self._verifying: set[str] | None = None
+        self._launches = 0
+        self._targets: dict[str, str] = {}
+        self._path_to_mod: dict[str, str] = {}
+        self._rewatch = False
+        self._qt_paths: set[str] = set()
+        self._polled: set[str] = set()
+        self._qt = None
+        if use_qt:
+            try:
+                self._qt = _QtBackend(self._path_changed)
+            except Exception as e:
+                print(f"QFileSystemWatcher unavailable, polling mod folders instead: {e}")
+        self._poll_interval = poll_interval
+        self._poller: _PollingBackend | None = None
+
+    def _target(self, mod_name) -> str:
+        pak_dir = self.mods_path / mod_name / "PAK_FILES"
+        return os.path.normcase(str(pak_dir if pak_dir.is_dir() else pak_dir.parent))
+
+    # (Re)computes the folder to watch for every mod; only the differences reach the backends.
+    # Must be called from the thread that owns the Qt watcher (the UI thread).
+    def watch(self, mod_names):
+        targets = {name: self._target(name) for name in mod_names}
+        with self._lock:
+            removed = {path for name, path in self._targets.items() if targets.get(name) != path}
+            added = [path for name, path in targets.items() if self._targets.get(name) != path]
+            self._targets = targets
+            self._path_to_mod = {path: name for name, path in targets.items()}
+            self._rewatch = False
+        root = os.path.normcase(str(self.mods_path))
+        candidates = ([] if root in self._qt_paths or root in self._polled else [root]) + added
+
+        if self._poller is not None:
+            self._poller.remove(removed)
+        self._polled -= removed
+        if self._qt is not None:
+            self._qt.remove([path for path in removed if path in self._qt_paths])
+            self._qt_paths -= removed
+            to_watch = candidates[:max(MAX_WATCHES - len(self._qt_paths), 0)]
+            failed = {os.path.normcase(path) for path in self._qt.add(to_watch)}
+            self._qt_paths |= set(to_watch) - failed
+        polled = [path for path in candidates if path not in self._qt_paths]
+        if polled:
+            if self._poller is None:
+                self._poller = _PollingBackend(self._path_changed, self._poll_interval)
+            self._poller.add(polled)
+        self._polled |= set(polled)
+        tracing.count("watcher.polled_dirs", len(polled))
+
+    def stop(self):
+        if self._qt is not None:
+            self._qt.stop()
+        if self._poller is not None:
+            self._poller.stop()
+
+    # Called from the Qt event loop or the polling thread.
+    def _path_changed(self, path):
+        path = os.path.normcase(str(path))
+        tracing.count("watcher.events")
+        with self._lock:
+            mod_name = self._path_to_mod.get(path)
+            if mod_name is None:
+                # The mods folder itself changed (mods added, removed or renamed outside MO2).
+                self._full_scan = True
+                return
+            self._dirty.add(mod_name)
+            if not os.path.exists(path) or os.path.basename(path) != os.path.normcase("PAK_FILES"):
+                # PAK_FILES was created or removed (or the watch was dropped with its folder).
+                self._rewatch = True
+
+    def mod_changed(self, mod_name):
+        with self._lock:
+            self._dirty.add(mod_name)
+
+    def request_full_scan(self):
+        with self._lock:
+            self._full_scan = True
+
+    # Mods to revalidate for this launch, or None for a full scan. The dirty set is handed over
+    # and cleared; events arriving afterwards count towards the next launch.
+    def changes(self) -> set[str] | None:
+        if self._rewatch:
+            self.watch(list(self._targets))
+        with self._lock:
+            self._launches += 1
+            dirty, self._dirty = self._dirty, set()
+            if not self.trusted or self._full_scan:
+                self._full_scan = False
+                self._verifying = None
+                return None
+            if self.verify_every and self._launches % self.verify_every == 0:
+                self._verifying = dirty
+                return None
+            return dirty
+
+    def full_scan_done(self, changed_mods: set[str]):
+        with self._lock:
+            expected, self._verifying = self._verifying, None
+        if expected is None:
+            return
+        missed = set(changed_mods) - expected
+        if missed:
+            self.trusted = False
+            tracing.count("watcher.missed", len(missed))
+            print(f"File watcher missed changes in {len(missed)} mods ({', '.join(sorted(missed)[:5])}), using full scans from now on.")
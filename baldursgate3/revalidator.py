@@ -0,0 +1,62 @@
+import threading
+
+
+# Runs modSettings.revalidate_cached_launch for a fast launch in a background thread. The UI polls
+# done/total for progress and result() once is_running() turns False: (written order, resolved
+# order), or None if it was cancelled or failed. Like the warm-up, it never calls into mobase.
+class LaunchRevalidator:
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._cancel = threading.Event()
+        self._result = None
+
+    def start(self, launch):
+        self.cancel()
+        cancel = threading.Event()
+        with self._lock:
+            self._cancel = cancel
+            self.total = len(launch.stale)
+            self.done = 0
+            self._result = None
+            self._thread = threading.Thread(
+                target=self._run, args=(cancel, launch), name="BG3 launch revalidation", daemon=True
+            )
+            self._thread.start()
+
+    def cancel(self):
+        # Never joins: a chunk already in flight finishes on its own and only writes to the cache.
+        self._cancel.set()
+
+    def is_running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def wait(self, timeout=None) -> bool:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.is_running()
+
+    def result(self) -> tuple[list[str], list[str]] | None:
+        with self._lock:
+            return self._result
+
+    def _run(self, cancel: threading.Event, launch):
+        from . import modSettings
+
+        def progress(done, total):
+            if not cancel.is_set():
+                self.done = done
+
+        try:
+            resolved = modSettings.revalidate_cached_launch(launch, cancel, progress)
+        except Exception as e:
+            print(f"Revalidating changed PAK files failed: {e}")
+            return
+        with self._lock:
+            # A newer start() owns the result now.
+            if resolved is not None and not cancel.is_set():
+                self._result = (launch.written_order, resolved)
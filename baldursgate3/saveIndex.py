@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+from . import fileTransfer, fingerprint, pakReader, tracing
+
+INDEX_PATH = Path(__file__).resolve().parent / "saveIndex.json"
+THUMBNAIL_CACHE_SIZE = 32
+SAVE_EXTENSION = ".lsv"
+THUMBNAIL_EXTENSION = ".webp"
+_INDEX_FORMAT = 1
+# Parses arriving within this many seconds of each other are written to INDEX_PATH together.
+FLUSH_DELAY = 2.0
+
+
+# Top level values of the SaveInfo.json stored inside an .lsv (an LSPK package like the PAKs).
+def read_save_info(save_path) -> dict:
+    reader = pakReader.LSPKReader(save_path)
+    for entry in reader.entries:
+        if entry.name.rsplit("/", 1)[-1].casefold() == "saveinfo.json":
+            info = json.loads(reader.read(entry).decode("utf-8-sig"))
+            return {key: value for key, value in info.items() if isinstance(value, (str, int, float, bool))}
+    return {}
+
+
+# Save games of one folder tree (Story/<save>/<save>.lsv plus its .webp thumbnail). scan() only
+# re-lists save folders whose modification time changed; SaveInfo.json is parsed the first time a
+# save's metadata is asked for and kept in INDEX_PATH under the .lsv stat key, so it is read once per
+# save file ever. Thumbnails are decoded on demand through the caller's decoder and kept in a small
+# LRU, as the save tab only ever shows one at a time.
+class SaveIndex:
+    def __init__(self, index_path=INDEX_PATH, thumbnail_cache_size=THUMBNAIL_CACHE_SIZE):
+        self.index_path = Path(index_path)
+        self.thumbnail_cache_size = thumbnail_cache_size
+        self._lock = threading.Lock()
+        self._folders: dict[str, tuple[int, list[Path]]] = {}
+        self._infos: dict[str, list] | None = None
+        self._pruned = False
+        self._dirty = False
+        self._flush_timer: threading.Timer | None = None
+        self._thumbnails: OrderedDict[tuple, Any] = OrderedDict()
+
+    def _load(self):
+        if self._infos is not None:
+            return
+        self._infos = {}
+        try:
+            payload = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if payload.get("format") == _INDEX_FORMAT:
+                self._infos = payload["saves"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def flush(self):
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            payload = json.dumps({"format": _INDEX_FORMAT, "saves": self._infos}, ensure_ascii=False)
+            self._dirty = False
+        try:
+            fileTransfer.write_if_changed(self.index_path, payload.encode("utf-8"))
+        except OSError as e:
+            print(f"Failed to write {self.index_path.name}: {e}")
+
+    # Every .lsv below folder (one level of save folders, as the game writes them).
+    def scan(self, folder) -> list[Path]:
+        folder = Path(folder)
+        saves = []
+        seen = set()
+        with tracing.span("save_scan") as scan_span, self._lock:
+            try:
+                with os.scandir(folder) as it:
+                    entries = list(it)
+            except OSError:
+                entries = []
+            rescanned = 0
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(SAVE_EXTENSION):
+                    saves.append(Path(entry.path))
+                    continue
+                if not entry.is_dir():
+                    continue
+                key = os.path.normcase(entry.path)
+                seen.add(key)
+                mtime = entry.stat().st_mtime_ns
+                cached = self._folders.get(key)
+                if cached is None or cached[0] != mtime:
+                    rescanned += 1
+                    cached = self._folders[key] = (mtime, self._list_saves(entry.path))
+                saves.extend(cached[1])
+            root = os.path.normcase(str(folder))
+            for key in [key for key in self._folders if key not in seen and os.path.dirname(key) == root]:
+                del self._folders[key]
+            scan_span.set(saves=len(saves), rescanned=rescanned)
+        return saves
+
+    @staticmethod
+    def _list_saves(path) -> list[Path]:
+        try:
+            with os.scandir(path) as it:
+                return sorted(Path(e.path) for e in it if e.name.lower().endswith(SAVE_EXTENSION) and e.is_file())
+        except OSError:
+            return []
+
+    def info(self, save_path) -> dict:
+        save_path = Path(save_path)
+        key = os.path.normcase(str(save_path))
+        try:
+            stat_key = fingerprint.stat_key(save_path)
+        except OSError:
+            return {}
+        with self._lock:
+            self._load()
+            cached = self._infos.get(key)
+        if cached is not None and cached[:3] == stat_key:
+            return cached[3]
+
+        tracing.count("saves.parsed")
+        try:
+            info = read_save_info(save_path)
+        except Exception as e:
+            print(f"Could not read save info from {save_path.name}: {e}")
+            info = {}
+        with self._lock:
+            self._infos[key] = [*stat_key, info]
+            if not self._pruned:
+                # Once per session, forget saves deleted since the index was written.
+                self._pruned = True
+                for stale in [k for k in self._infos if not os.path.exists(k)]:
+                    del self._infos[stale]
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return info
+
+    # decode(path) turns the thumbnail file into an image; results are reused until the file changes.
+    def thumbnail(self, save_path, decode: Callable[[Path], Any]):
+        thumbnail_path = Path(save_path).with_suffix(THUMBNAIL_EXTENSION)
+        try:
+            key = (os.path.normcase(str(thumbnail_path)), *fingerprint.stat_key(thumbnail_path))
+        except OSError:
+            return None
+        with self._lock:
+            image = self._thumbnails.get(key)
+            if image is not None:
+                self._thumbnails.move_to_end(key)
+                return image
+        tracing.count("saves.thumbnails_decoded")
+        image = decode(thumbnail_path)
+        if image is None:
+            return None
+        with self._lock:
+            self._thumbnails[key] = image
+            while len(self._thumbnails) > self.thumbnail_cache_size:
+                self._thumbnails.popitem(last=False)
+        return image
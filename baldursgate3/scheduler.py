@@ -0,0 +1,144 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Generator, NamedTuple
+
+from . import tracing
+
+
+# One step of a pipeline, run on the worker pool. cost is the number of bytes the step reads
+# and drives the adaptive concurrency limit; pure CPU steps leave it at 0.
+class Work(NamedTuple):
+    func: Callable
+    args: tuple = ()
+    cost: int = 0
+
+
+# A step that is collected across pipelines and run once for all of them, after every other
+# step has drained: func receives the list of keys and returns {key: result}.
+class Batch(NamedTuple):
+    name: str
+    func: Callable[[list], dict]
+    key: Any
+
+
+# Additive increase while throughput keeps improving, one step back when it drops, which is
+# what happens once the disk (or the CPU, for hashing) is saturated.
+class AdaptiveLimit:
+    def __init__(self, minimum=1, maximum=8, initial=None, window=0.25):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(maximum, initial or 2))
+        self.window = window
+        self._lock = threading.Lock()
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._previous = None
+
+    def record(self, cost):
+        if not cost:
+            return
+        with self._lock:
+            self._window_bytes += cost
+            now = time.perf_counter()
+            elapsed = now - self._window_start
+            if elapsed < self.window:
+                return
+            throughput = self._window_bytes / elapsed
+            limit = self.limit
+            if self._previous is None or throughput > self._previous * 1.05:
+                self.limit = min(self.maximum, self.limit + 1)
+            elif throughput < self._previous * 0.85:
+                self.limit = max(self.minimum, self.limit - 1)
+            if self.limit != limit:
+                tracing.count("scheduler.limit_changes")
+            self._previous = throughput
+            self._window_start = now
+            self._window_bytes = 0
+
+
+def _call(work: Work):
+    return work.func(*work.args)
+
+
+# Runs many small generator pipelines over one shared thread pool. Each pipeline yields Work (or
+# Batch) steps and receives their results, so hashing one PAK overlaps with extracting and parsing
+# others. Ready steps are ordered by pipeline depth (finish what was started) and then by priority,
+# so the largest PAKs go first. Pipeline code between yields runs on the calling thread only; a
+# pipeline raising there is logged and dropped, so callers account for the items it never finished.
+# initializer runs once on every worker thread, e.g. to lower its priority.
+class PipelineScheduler:
+    def __init__(self, max_workers=None, initializer=None, thread_name_prefix="bg3-pak"):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.limit = AdaptiveLimit(1, self.max_workers, initial=min(4, self.max_workers))
+        self.initializer = initializer
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.thread_name_prefix, initializer=self.initializer
+                )
+            return self._executor
+
+    def run(self, pipelines: list[tuple[int, Generator]], max_concurrency=None):
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        pool = self._pool()
+        sequence = itertools.count()
+        ready: list = []
+        batches: dict[str, tuple[Callable, list]] = {}
+        in_flight: dict = {}
+
+        def advance(pipeline, priority, depth, value=None, error=None):
+            try:
+                step = pipeline.throw(error) if error is not None else pipeline.send(value)
+            except StopIteration:
+                return
+            except Exception as e:
+                print(f"Error processing file, dropping its pipeline: {e!r}")
+                return
+            if isinstance(step, Batch):
+                batches.setdefault(step.name, (step.func, []))[1].append((step.key, pipeline, priority, depth + 1))
+            else:
+                heapq.heappush(ready, (-depth, -priority, next(sequence), step, pipeline, priority, depth + 1))
+
+        for priority, pipeline in pipelines:
+            advance(pipeline, priority, 0)
+
+        while ready or in_flight or batches:
+            cap = self.limit.limit if max_concurrency is None else min(self.limit.limit, max_concurrency)
+            while ready and len(in_flight) < cap:
+                _, _, _, work, pipeline, priority, depth = heapq.heappop(ready)
+                in_flight[pool.submit(_call, work)] = (work, pipeline, priority, depth)
+            if not in_flight:
+                for func, members in batches.values():
+                    in_flight[pool.submit(func, [key for key, *_ in members])] = (None, members, 0, 0)
+                batches = {}
+                continue
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                work, pipeline, priority, depth = in_flight.pop(future)
+                error = future.exception()
+                if work is None:
+                    results = {} if error is not None else future.result()
+                    for key, member, member_priority, member_depth in pipeline:
+                        value = results.get(key, error or KeyError(key))
+                        if isinstance(value, Exception):
+                            advance(member, member_priority, member_depth, error=value)
+                        else:
+                            advance(member, member_priority, member_depth, value)
+                    continue
+                if error is None:
+                    self.limit.record(work.cost)
+                    advance(pipeline, priority, depth, future.result())
+                else:
+                    advance(pipeline, priority, depth, error=error)
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+# Lightweight spans and counters for the launch hot path. While disabled, span() hands out one
+# shared no-op context manager and count() returns immediately, so instrumented code pays a
+# global lookup per call. Set BG3_PLUGIN_TRACE=1 to trace from the start.
+_enabled = bool(os.environ.get("BG3_PLUGIN_TRACE"))
+_events: list[dict] = []
+_counters: Counter = Counter()
+_lock = threading.Lock()
+_origin_ns = time.perf_counter_ns()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _events.append({
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": (self.start - _origin_ns) / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.args,
+        })
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def start():
+    global _enabled
+    reset()
+    _enabled = True
+
+
+def stop():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+
+def span(name, category="plugin", **args):
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def count(name, value=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+def counters() -> dict[str, int]:
+    with _lock:
+        return dict(_counters)
+
+
+# Writes the recorded spans in the Chrome trace event format (chrome://tracing, Perfetto).
+def export_chrome_trace(path):
+    with _lock:
+        events = list(_events)
+        counter_values = dict(_counters)
+    end = max((e["ts"] + e["dur"] for e in events), default=0)
+    events.append({
+        "name": "counters", "ph": "C", "ts": end, "pid": os.getpid(), "tid": 0, "args": counter_values,
+    })
+    payload = {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": counter_values}}
+    path = Path(path)
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def summary(limit=10) -> str:
+    with _lock:
+        events = list(_events)
+        counter_values = dict(_counters)
+    phases: dict[str, list[float]] = defaultdict(list)
+    by_pak: Counter = Counter()
+    by_mod: Counter = Counter()
+    for event in events:
+        phases[event["name"]].append(event["dur"])
+        args = event["args"]
+        # Only per PAK spans are attributed, so enclosing spans are not counted twice.
+        if "pak" in args:
+            by_pak[args["pak"]] += event["dur"]
+            if "mod" in args:
+                by_mod[args["mod"]] += event["dur"]
+
+    lines = ["Phase                                   calls   total ms     max ms"]
+    for name, durations in sorted(phases.items(), key=lambda item: -sum(item[1])):
+        lines.append(f"{name:<38} {len(durations):>6} {sum(durations) / 1000:>10.1f} {max(durations) / 1000:>10.1f}")
+    if by_mod:
+        lines.append("Slowest mods:")
+        lines.extend(f"  {duration / 1000:>10.1f} ms  {mod}" for mod, duration in by_mod.most_common(limit))
+    if by_pak:
+        lines.append("Slowest PAKs:")
+        lines.extend(f"  {duration / 1000:>10.1f} ms  {pak}" for pak, duration in by_pak.most_common(limit))
+    if counter_values:
+        lines.append("Counters:")
+        lines.extend(f"  {name:<36} {value}" for name, value in sorted(counter_values.items()))
+    return "\n".join(lines)
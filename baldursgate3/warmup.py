@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from . import scheduler, tracing
+
+# Lowers the calling thread's CPU (and on Windows, I/O) priority. Best effort.
+_THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+_THREAD_PRIORITY_LOWEST = -2
+
+
+def _lower_thread_priority():
+    try:
+        if os.name == "nt":
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            thread = kernel32.GetCurrentThread()
+            if not kernel32.SetThreadPriority(thread, _THREAD_MODE_BACKGROUND_BEGIN):
+                kernel32.SetThreadPriority(thread, _THREAD_PRIORITY_LOWEST)
+        elif hasattr(os, "setpriority"):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except Exception:
+        pass
+
+
+# Fills the mods cache for the active modlist in a background thread so that the next launch
+# only reads cached metadata. Work is done a chunk of PAKs at a time on a single low priority
+# worker of its own, never on the pool a launch uses; between chunks the thread yields, honours
+# cancel() and sleeps while pause_for() periods are running.
+# The mobase API is only touched by the caller: start() receives plain (mod name, path) pairs.
+class WarmupIndexer:
+    def __init__(self, chunk_size=16, quiet_period=5.0):
+        self.chunk_size = chunk_size
+        self.quiet_period = quiet_period
+        self.total = 0
+        self.done = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._cancel = threading.Event()
+        self._paused_until = 0.0
+        self._scheduler = scheduler.PipelineScheduler(
+            max_workers=1, initializer=_lower_thread_priority, thread_name_prefix="bg3-warmup"
+        )
+
+    def start(self, profile_path, mods: list[tuple[str, str]], game_data_path=None):
+        self.cancel()
+        cancel = threading.Event()
+        with self._lock:
+            self._cancel = cancel
+            self.total = 0
+            self.done = 0
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(cancel, str(profile_path), list(mods), game_data_path),
+                name="BG3 metadata warm-up",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def cancel(self):
+        # Never joins: a chunk already in flight finishes on its own and only writes to the cache.
+        self._cancel.set()
+
+    def pause_for(self, seconds=None):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + (self.quiet_period if seconds is None else seconds))
+
+    def is_running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def wait(self, timeout=None) -> bool:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.is_running()
+
+    def _wait_while_paused(self, cancel: threading.Event) -> bool:
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return not cancel.is_set()
+            if cancel.wait(min(remaining, 0.5)):
+                return False
+
+    def _run(self, cancel: threading.Event, profile_path, mods, game_data_path):
+        # Imported on the worker thread: MO2 loads the plugin long before the indexer has work.
+        from . import modsCache, modSettings
+
+        _lower_thread_priority()
+        try:
+            cache = modsCache.open_cache(profile_path)
+            jobs = modSettings.gustav_jobs(game_data_path) if game_data_path else []
+            for mod_name, mod_path in mods:
+                if cancel.is_set():
+                    return
+                jobs.extend((mod_name, file) for file in sorted(Path(mod_path, "PAK_FILES").glob("*.pak")))
+
+            pending = modSettings.stale_jobs(cache, jobs)
+            self.total = len(pending)
+            with tracing.span("warmup", paks=len(pending)):
+                for start in range(0, len(pending), self.chunk_size):
+                    if not self._wait_while_paused(cancel):
+                        print(f"Metadata warm-up stopped after {self.done} of {self.total} PAKs.")
+                        return
+                    chunk = pending[start:start + self.chunk_size]
+                    modSettings.prefetch_metadata(cache, chunk, max_concurrency=1, work_scheduler=self._scheduler)
+                    self.done += len(chunk)
+                    # Give the GIL back to the UI thread between chunks.
+                    time.sleep(0.01)
+            if pending:
+                print(f"Metadata warm-up cached {self.total} PAKs.")
+        except Exception as e:
+            print(f"Metadata warm-up failed: {e}")
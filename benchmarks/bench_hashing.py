@@ -0,0 +1,79 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from baldursgate3 import fingerprint  # noqa: E402
+
+_BLOCK = 1024 * 1024
+
+
+def _legacy_md5(path):
+    hasher = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(8192):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _make_files(directory: Path, count, size_mb) -> list[Path]:
+    block = os.urandom(_BLOCK)
+    paths = []
+    for i in range(count):
+        path = directory / f"synthetic_{i}.pak"
+        with open(path, "wb") as f:
+            for n in range(size_mb):
+                # Vary each block so the files are not trivially compressible on disk.
+                f.write(n.to_bytes(8, "little") + block[8:])
+        paths.append(path)
+    return paths
+
+
+def _timed(label, func, total_bytes, results):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    results[label] = {"seconds": round(elapsed, 4), "MiB/s": round(total_bytes / _BLOCK / elapsed, 1)}
+    print(f"{label:<28} {elapsed:8.3f}s {results[label]['MiB/s']:10.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PAK hashing strategies on synthetic files.")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=256, help="size of each synthetic file in MiB")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dir", type=Path, default=None, help="where to create the files (default: temp dir)")
+    parser.add_argument("--json", type=Path, default=None, help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        paths = _make_files(Path(tmp), args.files, args.size_mb)
+        total = sum(p.stat().st_size for p in paths)
+        print(f"{len(paths)} files, {total / _BLOCK / 1024:.2f} GiB")
+        results = {}
+
+        _timed("legacy md5 8K serial", lambda: [_legacy_md5(p) for p in paths], total, results)
+        fingerprint.begin_run()
+        _timed("md5 serial", lambda: [fingerprint.get_md5(p) for p in paths], total, results)
+        _timed("md5 memoized", lambda: [fingerprint.get_md5(p) for p in paths], total, results)
+        # As the hash stage of pak_scheduler pipelines; hashlib releases the GIL while digesting.
+        fingerprint.begin_run()
+        with ThreadPoolExecutor(max_workers=args.workers or min(8, os.cpu_count() or 1)) as pool:
+            _timed("md5 parallel", lambda: list(pool.map(fingerprint.get_md5, paths)), total, results)
+
+        fingerprint.begin_run()
+        assert [_legacy_md5(p) for p in paths] == [fingerprint.get_md5(p) for p in paths]
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Emulates the Divine.exe actions the plugin uses (list-package, extract-package and
+# extract-packages) on top of the native LSPK reader, so the Divine code paths run on Linux.
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from baldursgate3 import pakReader  # noqa: E402
+
+# Rough per process cost of starting the .NET runtime, paid once per invocation like Divine.
+STARTUP_DELAY = float(os.environ.get("FAKE_DIVINE_STARTUP", "0.15"))
+
+
+def _extract_meta(source, destination):
+    reader = pakReader.LSPKReader(source)
+    # Synthetic solid packages keep the regular entry layout; only the native reader refuses them.
+    reader.flags &= ~pakReader._PACKAGE_FLAG_SOLID
+    entry = reader.find_meta_lsx()
+    if entry is None:
+        return
+    target = Path(destination) / entry.name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(reader.read(entry))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-a", "--action")
+    parser.add_argument("-g", "--game")
+    parser.add_argument("-s", "--source")
+    parser.add_argument("-d", "--destination")
+    parser.add_argument("-x", "--expression")
+    parser.add_argument("-l", "--loglevel")
+    parser.add_argument("--use-package-name", action="store_true")
+    args = parser.parse_args()
+    time.sleep(STARTUP_DELAY)
+
+    if args.action == "list-package":
+        for name in pakReader.LSPKReader(args.source).listing():
+            print(f"{name}\t0\t0")
+    elif args.action == "extract-package":
+        _extract_meta(args.source, args.destination)
+    elif args.action == "extract-packages":
+        # Like Divine, every package lands in the destination itself unless --use-package-name is given.
+        for name in os.listdir(args.source):
+            if name.lower().endswith(".pak"):
+                destination = os.path.join(args.destination, name[:-4]) if args.use_package_name else args.destination
+                _extract_meta(os.path.join(args.source, name), destination)
+    else:
+        print(f"Unsupported action {args.action}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# In-memory IOrganizer / IModList / IProfile stand-ins over a synthetic instance folder.
+from pathlib import Path
+
+import mobase  # type: ignore
+
+_ACTIVE_STATE = int(mobase.ModState.EXISTS | mobase.ModState.ACTIVE | mobase.ModState.VALID)
+
+
+class MockDirectory:
+    def __init__(self, path):
+        self._path = str(path)
+
+    def absolutePath(self):
+        return self._path
+
+
+class MockMod(mobase.IModInterface):
+    def __init__(self, mods_path, name):
+        self._name = name
+        self._path = str(Path(mods_path) / name)
+
+    def name(self):
+        return self._name
+
+    def absolutePath(self):
+        return self._path
+
+
+class MockModList(mobase.IModList):
+    def __init__(self, mods_path, mod_names, states=None):
+        self.mods_path = Path(mods_path)
+        self.mod_names = list(mod_names)
+        self.states = dict(states or {})
+        self.installed_callbacks = []
+        self.removed_callbacks = []
+
+    def allMods(self):
+        return list(self.mod_names)
+
+    def allModsByProfilePriority(self, profile=None):
+        return list(self.mod_names)
+
+    def priority(self, name):
+        return self.mod_names.index(name) if name in self.mod_names else -1
+
+    def state(self, name):
+        return self.states.get(name, _ACTIVE_STATE) if name in self.mod_names else 0
+
+    def getMod(self, name):
+        return MockMod(self.mods_path, name)
+
+    def onModInstalled(self, callback):
+        self.installed_callbacks.append(callback)
+
+    def onModRemoved(self, callback):
+        self.removed_callbacks.append(callback)
+
+    def install(self, name):
+        self.mod_names.append(name)
+        mod = self.getMod(name)
+        for callback in self.installed_callbacks:
+            callback(mod)
+        return mod
+
+
+class MockProfile(mobase.IProfile):
+    def __init__(self, path):
+        self._path = str(path)
+
+    def absolutePath(self):
+        return self._path
+
+    def name(self):
+        return Path(self._path).name
+
+
+class MockGame:
+    def __init__(self, data_path, version="4.1.1.6758295"):
+        self._data = MockDirectory(data_path)
+        self._version = version
+
+    def name(self):
+        return "Baldur's Gate 3 Unofficial Support Plugin"
+
+    def dataDirectory(self):
+        return self._data
+
+    def gameVersion(self):
+        return self._version
+
+
+class MockOrganizer(mobase.IOrganizer):
+    def __init__(self, root, mod_names, settings=None):
+        self.root = Path(root)
+        self._modlist = MockModList(self.root / "mods", mod_names)
+        self._profile = MockProfile(self.root / "profile")
+        self._game = MockGame(self.root / "data")
+        self.settings = dict(settings or {})
+
+    def modList(self):
+        return self._modlist
+
+    def profile(self):
+        return self._profile
+
+    def managedGame(self):
+        return self._game
+
+    def modsPath(self):
+        return str(self.root / "mods")
+
+    def overwritePath(self):
+        return str(self.root / "overwrite")
+
+    def pluginSetting(self, plugin, key):
+        return self.settings.get(key)
+
+    def __getattr__(self, name):
+        # Callback registration (onAboutToRun, onFinishedRun...) is accepted and ignored.
+        if name.startswith("on"):
+            return lambda *args, **kwargs: True
+        raise AttributeError(name)
@@ -0,0 +1,535 @@
+# Benchmark suite for the BG3 plugin that runs outside Mod Organizer (and on Linux).
+#
+#   python benchmarks/run.py --mods 10,100,1000 --output results.json
+#
+# "cold" scenarios start from an empty profile and metadata cache, "warm" ones reuse what the
+# previous scenario left behind; the OS file cache is not dropped. Plugin level scenarios
+# (mappings, dataLooksValid) also need PyQt6 and a modorganizer-basic_games checkout passed as
+# --basic-games; without them they are reported as skipped.
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path[:0] = [str(BENCH_DIR / "stubs"), str(BENCH_DIR), str(REPO_ROOT)]
+
+import mobase  # type: ignore  # noqa: E402
+
+import synthetic  # noqa: E402
+from mock_organizer import MockOrganizer  # noqa: E402
+from baldursgate3 import (  # noqa: E402
+    fileTransfer, fingerprint, mappingPlanner, modListing, modSettings, modsCache, pakReader, pakRecord, saveIndex, tracing, warmup,
+)
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _timed(func):
+    tracing.reset()
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "-C", str(REPO_ROOT), "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _fake_divine(work_dir: Path) -> Path:
+    wrapper = work_dir / "Divine"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{BENCH_DIR / "fake_divine.py"}" "$@"\n')
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IXUSR)
+    return wrapper
+
+
+def _use_backend(settings_module, backend, work_dir: Path):
+    temp_dir = work_dir / "temp_extracted"
+    divine = pakReader.DivineExtractor(_fake_divine(work_dir), temp_dir)
+    settings_module.divine_file = divine.divine_path
+    settings_module.temp_dir = temp_dir
+    if backend == "divine":
+        settings_module.pak_extractor = divine
+    else:
+        settings_module.pak_extractor = pakReader.FallbackExtractor(pakReader.NativeExtractor(), divine)
+
+
+def _reset_caches(cache_module, store_path: Path, wipe=False):
+    for cache in cache_module._caches.values():
+        cache._conn.close()
+    cache_module._caches.clear()
+    if cache_module._store is not None:
+        cache_module._store._conn.close()
+        cache_module._store = None
+    cache_module.STORE_DB_PATH = store_path
+    if wipe:
+        for path in store_path.parent.glob(store_path.name + "*"):
+            path.unlink()
+    fingerprint.begin_run()
+
+
+def load_plugin(basic_games_path):
+    # game_baldursgate3 sits in basic_games/games and imports its siblings relatively.
+    try:
+        import PyQt6  # type: ignore  # noqa: F401
+    except ImportError:
+        return None, "PyQt6 is not installed"
+    if not basic_games_path:
+        return None, "no --basic-games checkout given"
+    package = types.ModuleType("basic_games")
+    package.__path__ = [str(basic_games_path)]
+    games = types.ModuleType("basic_games.games")
+    games.__path__ = [str(REPO_ROOT)]
+    sys.modules.setdefault("basic_games", package)
+    sys.modules.setdefault("basic_games.games", games)
+    try:
+        return importlib.import_module("basic_games.games.game_baldursgate3"), None
+    except Exception as e:
+        return None, f"could not import the plugin: {e!r}"
+
+
+def _plugin_game(plugin, organizer):
+    game = plugin.BG3Game.__new__(plugin.BG3Game)
+    game._organizer = organizer
+    game._mod_listing = plugin.modListing.ModListingCache(
+        {mod_type: data["pattern"] for mod_type, data in game._mods_paths.items()}
+    )
+    return game
+
+
+def run_scenarios(mod_count, args, plugin, results):
+    def record(name, seconds, **extra):
+        entry = {"scenario": name, "mods": mod_count, "seconds": round(seconds, 4), **extra}
+        if args.trace:
+            entry["counters"] = tracing.counters()
+            tracing.export_chrome_trace(args.trace / f"{mod_count}_{name.replace('/', '_')}.json")
+        results.append(entry)
+        _log(f"{mod_count:>6} mods  {name:<48} {seconds:9.3f}s")
+
+    with tempfile.TemporaryDirectory(prefix="bg3bench_", dir=args.work_dir) as tmp:
+        work_dir = Path(tmp)
+        seconds, mod_names = _timed(
+            lambda: synthetic.make_instance(work_dir, mod_count, args.paks_per_mod, args.files_per_pak, seed=mod_count)
+        )
+        _log(f"{mod_count:>6} mods  generated instance in {seconds:.1f}s")
+        store_path = work_dir / "metadataCache.db"
+        os.environ["LOCALAPPDATA"] = str(work_dir / "appdata")
+        settings_modules = [modSettings] + ([plugin.modSettings] if plugin else [])
+        cache_modules = [modsCache] + ([plugin.modsCache] if plugin else [])
+        for module in settings_modules:
+            _use_backend(module, args.backend, work_dir)
+
+        organizer = MockOrganizer(work_dir, mod_names, {"paranoid_hashing": False})
+        modlist = organizer.modList()
+        profile = organizer.profile()
+        paks = mod_count * args.paks_per_mod
+
+        _reset_caches(modsCache, store_path, wipe=True)
+        seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, profile))
+        record("generate_mod_settings/cold", seconds, paks=paks)
+
+        _reset_caches(modsCache, store_path)
+        seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, profile))
+        record("generate_mod_settings/warm_unchanged", seconds, paks=paks)
+
+        modsCache.open_cache(profile.absolutePath()).set_state(modSettings._SETTINGS_STATE_KEY, None)
+        seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, profile))
+        record("generate_mod_settings/warm_regenerate", seconds, paks=paks)
+
+        organizer.settings["paranoid_hashing"] = True
+        seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, profile))
+        record("generate_mod_settings/warm_paranoid", seconds, paks=paks)
+        organizer.settings["paranoid_hashing"] = False
+
+        other_profile = work_dir / "profile_2"
+        other_profile.mkdir()
+        organizer._profile = type(profile)(other_profile)
+        seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, organizer.profile()))
+        record("generate_mod_settings/new_profile_shared_store", seconds, paks=paks)
+        organizer._profile = profile
+
+        _reset_caches(modsCache, store_path, wipe=True)
+        indexer = warmup.WarmupIndexer()
+        warm_profile = work_dir / "profile_3"
+        warm_profile.mkdir()
+        organizer._profile = type(profile)(warm_profile)
+        mods = [(name, modlist.getMod(name).absolutePath()) for name in mod_names]
+        seconds, _ = _timed(lambda: (indexer.start(warm_profile, mods, work_dir / "data"), indexer.wait()))
+        record("warmup/background_index", seconds, paks=paks)
+        seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, organizer.profile()))
+        record("generate_mod_settings/after_warmup", seconds, paks=paks)
+        organizer._profile = profile
+
+        fingerprint.begin_run()
+        seconds, _ = _timed(lambda: modSettings._fix_modscache(organizer))
+        record("fix_modscache/warm", seconds, paks=paks)
+        fingerprint.begin_run()
+        seconds, _ = _timed(lambda: modSettings._fix_modscache(organizer, set(mod_names[:1])))
+        record("fix_modscache/dirty_only", seconds, paks=args.paks_per_mod)
+
+        seconds, index = _timed(lambda: modSettings.update_file_index(organizer, modlist, profile))
+        record("file_index/build", seconds, paks=paks, files=len(index))
+        seconds, _ = _timed(lambda: modSettings.update_file_index(organizer, modlist, profile))
+        record("file_index/unchanged", seconds, paks=paks)
+        seconds, conflicts = _timed(lambda: index.conflicts("Public"))
+        record("file_index/conflicts", seconds, conflicts=len(conflicts))
+
+        new_mod = f"Installed Mod {mod_count}"
+        synthetic.add_mod(work_dir, new_mod, paks_per_mod=args.paks_per_mod, files_per_pak=args.files_per_pak)
+        mod = modlist.install(new_mod)
+        seconds, _ = _timed(lambda: modSettings.mod_installed(organizer, modlist, profile, mod))
+        record("mod_installed/new_mod", seconds, paks=args.paks_per_mod)
+        seconds, _ = _timed(lambda: modSettings.mod_installed(organizer, modlist, profile, mod))
+        record("mod_installed/reinstall_unchanged", seconds, paks=args.paks_per_mod)
+        seconds, _ = _timed(lambda: modSettings.update_file_index(organizer, modlist, profile))
+        record("file_index/after_install", seconds, paks=args.paks_per_mod)
+
+        # One mod updated since the last launch (same module UUIDs, new contents): the default launch
+        # reads it before the game starts, the fast one writes modsettings.lsx from the cache and
+        # leaves the updated PAKs to revalidation.
+        updated = mod_names[len(mod_names) // 2]
+        cache = modsCache.open_cache(profile.absolutePath())
+        uuids = [
+            cache.get(updated, f"{updated.replace(' ', '')}_{p}.pak")["UUID"]["value"] for p in range(args.paks_per_mod)
+        ]
+        for launch_mode in ("blocking", "cached"):
+            synthetic.add_mod(
+                work_dir, updated, random.Random(launch_mode), args.paks_per_mod, args.files_per_pak, module_uuids=uuids
+            )
+            if launch_mode == "blocking":
+                seconds, _ = _timed(lambda: modSettings.generate_mod_settings(organizer, modlist, profile))
+                record("launch/one_mod_updated_blocking", seconds, paks=paks)
+                continue
+            seconds, launch = _timed(lambda: modSettings.write_cached_mod_settings(organizer, modlist, profile))
+            record("launch/one_mod_updated_cached", seconds, paks=paks, stale=len(launch.stale))
+            seconds, resolved = _timed(lambda: modSettings.revalidate_cached_launch(launch))
+            record("launch/revalidate_in_background", seconds, paks=len(launch.stale), order_changed=resolved != launch.written_order)
+
+        if plugin:
+            for module in cache_modules[1:]:
+                _reset_caches(module, store_path)
+            game = _plugin_game(plugin, organizer)
+            seconds, mappings = _timed(game.mappings)
+            record("mappings/cold", seconds, mappings=len(mappings))
+            seconds, mappings = _timed(game.mappings)
+            record("mappings/warm", seconds, mappings=len(mappings))
+
+        _reset_caches(modsCache, store_path)
+        for module in cache_modules[1:]:
+            _reset_caches(module, store_path)
+        shutil.rmtree(work_dir / "temp_extracted", ignore_errors=True)
+
+
+# Several PAKs per mod, every fifth mod shipping a copy of its predecessor's PAK, the odd readme
+# next to the PAKs and overwrite replacing a few files: how many mappings planning saves over one
+# mapping per entry. tests/test_mappingPlanner.py checks that the game's view stays the same.
+def run_mappings(mod_count, args, results):
+    def record(name, seconds, **extra):
+        entry = {"scenario": f"mapping_plan/{name}", "mods": mod_count, "seconds": round(seconds, 4), **extra}
+        results.append(entry)
+        _log(f"{mod_count:>6} mods  {'mapping_plan/' + name:<50} {seconds:9.3f}s")
+
+    mods_paths = {"PAK_FILES": ("*.pak", "Mods"), "SE_CONFIG": ("*", "Script Extender"), "LevelCache": ("*", "LevelCache")}
+    with tempfile.TemporaryDirectory(prefix="bg3mappings_", dir=args.work_dir) as tmp:
+        root = Path(tmp)
+        mod_names = synthetic.make_instance(root, mod_count, paks_per_mod=max(args.paks_per_mod, 3), files_per_pak=2)
+        for i, mod_name in enumerate(mod_names):
+            pak_dir = root / "mods" / mod_name / "PAK_FILES"
+            if i % 5 == 4:
+                previous = next((root / "mods" / mod_names[i - 1] / "PAK_FILES").glob("*.pak"))
+                shutil.copy2(previous, pak_dir / previous.name)
+            if i % 11 == 3:
+                (pak_dir / "readme.txt").write_text(mod_name)
+        (root / "overwrite" / "PAK_FILES").mkdir()
+        shutil.copy2(next((root / "mods" / mod_names[0] / "PAK_FILES").glob("*.pak")), root / "overwrite" / "PAK_FILES")
+        (root / "overwrite" / "SE_CONFIG").mkdir()
+        (root / "overwrite" / "SE_CONFIG" / "config_0.json").write_text("{}")
+
+        cache = modListing.ModListingCache({mod_type: pattern for mod_type, (pattern, _) in mods_paths.items()})
+        folders = [str(root / "mods" / name) for name in mod_names] + [str(root / "overwrite")]
+        listings = [(folder, cache.listing(folder)) for folder in folders]
+        destinations = {mod_type: str(root / "appdata" / name) for mod_type, (_, name) in mods_paths.items()}
+        sources = mappingPlanner.sources(listings, destinations)
+
+        seconds, planned = _timed(lambda: mappingPlanner.plan(sources))
+        file_destinations = [
+            os.path.join(source.destination, name).lower()
+            for source in sources
+            for name, is_dir in source.entries
+            if not is_dir
+        ]
+        record(
+            "plan", seconds, per_entry=sum(len(source.entries) for source in sources), planned=len(planned),
+            folder_mappings=sum(1 for m in planned if m.is_directory and not m.create_target),
+            shadowed=len(file_destinations) - len(set(file_destinations)),
+        )
+
+
+# Copying AppData's LevelCache to overwrite after a run: "transfer_tree" is the plain walk that
+# checks every destination file, the sync_tree scenarios diff against the manifest of the previous
+# run. Every scenario checks that overwrite ends up with every LevelCache file.
+def run_level_cache(args, results, levels=200, files_per_level=50):
+    count = levels * files_per_level
+
+    def record(name, seconds, **extra):
+        entry = {"scenario": f"level_cache/{name}", "files": count, "seconds": round(seconds, 4), **extra}
+        results.append(entry)
+        _log(f"{count:>6} files {'level_cache/' + name:<50} {seconds:9.3f}s")
+
+    with tempfile.TemporaryDirectory(prefix="bg3levelcache_", dir=args.work_dir) as tmp:
+        source, dest, manifest = Path(tmp) / "LevelCache", Path(tmp) / "overwrite", Path(tmp) / "levelCacheSync.json"
+        files = synthetic.make_level_cache(source, levels, files_per_level)
+
+        def check(failures):
+            missing = [f for f in files if not (dest / f.relative_to(source)).exists()]
+            if failures or missing:
+                raise AssertionError(f"LevelCache sync left {len(missing)} files missing, {len(failures)} failed")
+
+        def sync():
+            return fileTransfer.sync_tree(source, dest, manifest, replace_existing=False)
+
+        seconds, failures = _timed(sync)
+        check(failures)
+        record("sync_cold", seconds)
+        seconds, failures = _timed(lambda: fileTransfer.transfer_tree(source, dest, replace_existing=False))
+        check(failures)
+        record("transfer_tree_unchanged", seconds)
+        seconds, failures = _timed(sync)
+        check(failures)
+        record("sync_unchanged", seconds)
+
+        files += synthetic.make_level_cache(source / "Level_New", 1, 20, seed=2)
+        for path in files[:20]:
+            path.write_bytes(b"changed")
+        seconds, failures = _timed(sync)
+        check(failures)
+        record("sync_after_run", seconds, new=20, changed=20)
+
+        for path in files[100:110]:
+            (dest / path.relative_to(source)).unlink()
+        seconds, failures = _timed(sync)
+        check(failures)
+        record("sync_after_overwrite_cleanup", seconds, deleted=10)
+
+
+# Holding 10k PAKs' metadata in memory as the cache's dicts and as PakRecords (tracemalloc, so
+# only what the objects themselves allocate), and converting between the two.
+def run_records(args, results, count=10000):
+    def record(name, seconds, **extra):
+        entry = {"scenario": f"pak_records/{name}", "records": count, "seconds": round(seconds, 4), **extra}
+        results.append(entry)
+        _log(f"{count:>6} PAKs  {'pak_records/' + name:<50} {seconds:9.3f}s")
+
+    def allocated(build):
+        tracemalloc.start()
+        objects = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return objects, size
+
+    serialized = [json.dumps(meta) for meta in synthetic.make_metadata(count)]
+    dicts, dict_bytes = allocated(lambda: [json.loads(text) for text in serialized])
+    records, record_bytes = allocated(lambda: [pakRecord.compact(json.loads(text)) for text in serialized])
+    if any(not isinstance(r, pakRecord.PakRecord) for r in records):
+        raise AssertionError("synthetic metadata did not fit PakRecord")
+    record("memory_dicts", 0, bytes=dict_bytes)
+    record("memory_records", 0, bytes=record_bytes, ratio=round(dict_bytes / record_bytes, 2))
+    seconds, _ = _timed(lambda: [pakRecord.compact(meta) for meta in dicts])
+    record("from_dict", seconds)
+    seconds, expanded = _timed(lambda: [pakRecord.expand(r) for r in records])
+    if expanded != dicts:
+        raise AssertionError("PakRecord round trip changed the metadata")
+    record("to_dict", seconds)
+    seconds, _ = _timed(lambda: [json.dumps(pakRecord.expand(r), ensure_ascii=False) for r in records])
+    record("to_cache_format", seconds)
+    seconds, _ = _timed(lambda: [pakRecord.compact(json.loads(text)) for text in serialized])
+    record("from_cache_format", seconds)
+
+
+# Listing the save tab: "cold" is the first listing of a session with an empty index, "reopened" a
+# new session over the index file the previous one wrote. Thumbnails are "decoded" by reading the
+# file, which stands in for QImage outside Mod Organizer. Tracing stays on throughout, since the
+# parsed counts come from its counters.
+def run_saves(args, results):
+    def record(name, seconds, **extra):
+        entry = {"scenario": f"saves/{name}", "saves": args.saves, "seconds": round(seconds, 4), **extra}
+        results.append(entry)
+        _log(f"{args.saves:>6} saves {name:<48} {seconds:9.3f}s")
+
+    def show_all(index):
+        for path in index.scan(story):
+            index.info(path)
+            index.thumbnail(path, lambda thumbnail: thumbnail.read_bytes())
+
+    was_tracing = tracing.is_enabled()
+    tracing.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bg3saves_", dir=args.work_dir) as tmp:
+            story = Path(tmp) / "Story"
+            synthetic.make_saves(story, args.saves)
+            index = saveIndex.SaveIndex(Path(tmp) / "saveIndex.json", thumbnail_cache_size=args.saves)
+            seconds, _ = _timed(lambda: show_all(index))
+            record("cold", seconds, parsed=tracing.counters().get("saves.parsed", 0))
+            seconds, _ = _timed(lambda: show_all(index))
+            record("warm", seconds, parsed=tracing.counters().get("saves.parsed", 0))
+            index.flush()
+            index = saveIndex.SaveIndex(Path(tmp) / "saveIndex.json")
+            seconds, _ = _timed(lambda: show_all(index))
+            record("reopened", seconds, parsed=tracing.counters().get("saves.parsed", 0))
+            synthetic.make_saves(story, 1, seed=2, first=args.saves)
+            seconds, saves = _timed(lambda: index.scan(story))
+            record("list_after_new_save", seconds, listed=len(saves))
+    finally:
+        if not was_tracing:
+            tracing.stop()
+
+
+# Imports a module in a fresh interpreter; prints the seconds it took and which of the HEAVY_MODULES
+# it loaded that weren't loaded before.
+HEAVY_MODULES = (
+    "concurrent.futures", "minidom", "xml.dom.minidom", "shutil", "sqlite3", "subprocess", "tempfile",
+    "urllib.request", "zipfile",
+)
+_IMPORT_PROBE = """
+import sys, time, types
+sys.path[:0] = {paths!r}
+{setup}
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds, ",".join(name for name in {heavy!r} if name in sys.modules and name not in before))
+"""
+_PLUGIN_SETUP = """
+package = types.ModuleType("basic_games")
+package.__path__ = [{basic_games!r}]
+games = types.ModuleType("basic_games.games")
+games.__path__ = [{repo!r}]
+sys.modules["basic_games"] = package
+sys.modules["basic_games.games"] = games
+"""
+
+
+# Import cost of the plugin and of the modules the batch mode and warm-up load, each in a fresh
+# interpreter (best of a few runs, since interpreter start-up noise dominates single runs).
+def run_imports(args, plugin, results):
+    modules = [("modSettings", "baldursgate3.modSettings", ""), ("headless", "baldursgate3.headless", "")]
+    if plugin:
+        setup = _PLUGIN_SETUP.format(basic_games=str(args.basic_games), repo=str(REPO_ROOT))
+        modules.insert(0, ("plugin", "basic_games.games.game_baldursgate3", setup))
+    paths = [str(BENCH_DIR / "stubs"), str(REPO_ROOT)]
+    for name, module, setup in modules:
+        code = _IMPORT_PROBE.format(paths=paths, setup=setup, module=module, heavy=HEAVY_MODULES)
+        runs = []
+        for _ in range(min(args.repeat, 5)):
+            output = subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=str(REPO_ROOT)
+            ).stdout.split()
+            runs.append((float(output[0]), output[1] if len(output) > 1 else ""))
+        seconds, heavy = min(runs)
+        entry = {"scenario": f"import/{name}", "seconds": round(seconds, 4), "heavy_modules": heavy.split(",") if heavy else []}
+        results.append(entry)
+        _log(f"         {entry['scenario']:<50} {seconds:9.4f}s  {heavy or '-'}")
+
+
+def _directories(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(entry for entry in node if isinstance(entry, mobase.IFileTree))
+
+
+# "leaf" asks about the deepest folder only; "all_subtrees" asks about every folder of the archive,
+# as the installer does. Each repetition starts from a fresh checker, so memoized answers from the
+# previous one don't count.
+def run_data_checker(args, plugin, results):
+    for shape, size in (("wide", 10000), ("deep", 2000)):
+        tree = synthetic.make_file_tree(mobase.IFileTree, shape, size)
+        directories = list(_directories(tree))
+        leaf = max(directories, key=lambda node: node.path().count("/"))
+        for name, nodes in (("leaf", [leaf]), ("all_subtrees", directories)):
+            def check():
+                checker = plugin.BG3ModDataChecker()
+                return [checker.dataLooksValid(node) for node in nodes]
+
+            seconds, _ = _timed(lambda: [check() for _ in range(args.repeat)])
+            scenario = f"dataLooksValid/{shape}_{name}"
+            entry = {"scenario": scenario, "entries": size, "folders": len(nodes), "seconds": round(seconds / args.repeat, 6)}
+            results.append(entry)
+            _log(f"         {scenario:<50} {entry['seconds']:9.6f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the BG3 plugin against synthetic mod lists.")
+    parser.add_argument("--mods", default="10,100,1000,5000", help="comma separated mod counts")
+    parser.add_argument("--paks-per-mod", type=int, default=1)
+    parser.add_argument("--files-per-pak", type=int, default=20)
+    parser.add_argument("--backend", choices=("native", "divine"), default="native")
+    parser.add_argument("--saves", type=int, default=300, help="save games for the save tab scenarios, 0 to skip")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions for the micro benchmarks")
+    parser.add_argument("--basic-games", type=Path, default=None, help="modorganizer-basic_games checkout")
+    parser.add_argument("--work-dir", type=Path, default=None, help="where synthetic instances are created")
+    parser.add_argument("--output", type=Path, default=None, help="write JSON results here instead of stdout")
+    parser.add_argument("--trace", type=Path, default=None, help="write a Chrome trace per scenario into this folder")
+    args = parser.parse_args()
+    if args.trace:
+        args.trace.mkdir(parents=True, exist_ok=True)
+        tracing.start()
+
+    plugin, skipped = load_plugin(args.basic_games)
+    results = []
+    for mod_count in (int(count) for count in args.mods.split(",") if count.strip()):
+        run_scenarios(mod_count, args, plugin, results)
+        run_mappings(mod_count, args, results)
+    if args.saves:
+        run_saves(args, results)
+    run_level_cache(args, results)
+    run_records(args, results)
+    run_imports(args, plugin, results)
+    if plugin:
+        run_data_checker(args, plugin, results)
+    else:
+        _log(f"Skipping mappings and dataLooksValid: {skipped}")
+
+    report = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "backend": args.backend,
+        "paks_per_mod": args.paks_per_mod,
+        "files_per_pak": args.files_per_pak,
+        "skipped": skipped,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
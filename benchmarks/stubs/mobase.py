@@ -0,0 +1,141 @@
+# Minimal stand-in for MO2's mobase module so the plugin can be imported and benchmarked
+# outside Mod Organizer. Only what the plugin touches is modelled; any other name resolves
+# to an inert placeholder class so imports of basic_games keep working.
+import enum
+import fnmatch
+from pathlib import PurePosixPath
+
+
+class ModState(enum.IntFlag):
+    EXISTS = 1
+    ACTIVE = 2
+    ESSENTIAL = 4
+    EMPTY = 8
+    ENDORSED = 16
+    VALID = 32
+    ALTERNATE = 64
+
+
+class Mapping:
+    def __init__(self, source="", destination="", is_directory=False, create_target=False):
+        self.source = source
+        self.destination = destination
+        self.isDirectory = is_directory
+        self.createTarget = create_target
+
+    def __repr__(self):
+        return f"Mapping({self.source!r} -> {self.destination!r}, dir={self.isDirectory})"
+
+
+class PluginSetting:
+    def __init__(self, key, description, default_value):
+        self.key = key
+        self.description = description
+        self.default_value = default_value
+
+
+class ModDataChecker:
+    class CheckReturn(enum.Enum):
+        INVALID = 0
+        FIXABLE = 1
+        VALID = 2
+
+    INVALID = CheckReturn.INVALID
+    FIXABLE = CheckReturn.FIXABLE
+    VALID = CheckReturn.VALID
+
+
+class IPluginFileMapper:
+    def __init__(self):
+        pass
+
+
+class IOrganizer:
+    pass
+
+
+class IModList:
+    pass
+
+
+class IProfile:
+    pass
+
+
+class IModInterface:
+    pass
+
+
+class FileTreeEntry:
+    def __init__(self, name, parent=None):
+        self._name = name
+        self._parent = parent
+
+    def name(self):
+        return self._name
+
+    def parent(self):
+        return self._parent
+
+    def isDir(self):
+        return False
+
+    def isFile(self):
+        return True
+
+    def path(self, sep="/"):
+        parts = []
+        node = self
+        while node is not None and node._parent is not None:
+            parts.append(node._name)
+            node = node._parent
+        return sep.join(reversed(parts))
+
+
+class IFileTree(FileTreeEntry):
+    def __init__(self, name="", parent=None):
+        super().__init__(name, parent)
+        self._children: dict[str, FileTreeEntry] = {}
+
+    def isDir(self):
+        return True
+
+    def isFile(self):
+        return False
+
+    def add_file(self, name) -> FileTreeEntry:
+        entry = self._children[name.casefold()] = FileTreeEntry(name, self)
+        return entry
+
+    def add_directory(self, name) -> "IFileTree":
+        entry = self._children.get(name.casefold())
+        if not isinstance(entry, IFileTree):
+            entry = self._children[name.casefold()] = IFileTree(name, self)
+        return entry
+
+    def __iter__(self):
+        return iter(list(self._children.values()))
+
+    def __len__(self):
+        return len(self._children)
+
+    def find(self, path):
+        node = self
+        for part in PurePosixPath(str(path).replace("\\", "/")).parts:
+            if not isinstance(node, IFileTree):
+                return None
+            node = node._children.get(part.casefold())
+            if node is None:
+                return None
+        return node
+
+    def exists(self, path, *args):
+        if any(char in str(path) for char in "*?["):
+            return any(fnmatch.fnmatch(child.name().casefold(), str(path).casefold()) for child in self)
+        return self.find(path) is not None
+
+
+def __getattr__(name):
+    placeholder = type(name, (), {"__init__": lambda self, *args, **kwargs: None})
+    globals()[name] = placeholder
+    return placeholder
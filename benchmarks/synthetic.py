@@ -0,0 +1,260 @@
+# Generates synthetic BG3 mod trees: LSPK v18 packages with a realistic meta.lsx, plus the
+# profile, overwrite and game data folders an MO2 instance would have.
+import json
+import os
+import random
+import struct
+import uuid
+import zlib
+from pathlib import Path
+
+_HEADER16 = struct.Struct("<IQIBB16sH")
+_ENTRY18 = struct.Struct("<256sIHBBII")
+_ENTRY15 = struct.Struct("<256sQQQIIII")
+_HEADER15 = struct.Struct("<IQIBB16s")
+
+META_LSX = """<?xml version="1.0" encoding="UTF-8"?>
+<save>
+    <version major="4" minor="0" revision="9" build="331"/>
+    <region id="Config">
+        <node id="root">
+            <children>
+                <node id="Dependencies"/>
+                <node id="ModuleInfo">
+                    <attribute id="Author" type="LSString" value="{author}"/>
+                    <attribute id="CharacterCreationLevelName" type="FixedString" value=""/>
+                    <attribute id="Description" type="LSString" value="{name} generated for benchmarking"/>
+                    <attribute id="Folder" type="LSString" value="{folder}"/>
+                    <attribute id="LevelName" type="FixedString" value=""/>
+                    <attribute id="MD5" type="LSString" value=""/>
+                    <attribute id="Name" type="LSString" value="{name}"/>
+                    <attribute id="NumPlayers" type="uint8" value="4"/>
+                    <attribute id="PhotoBooth" type="FixedString" value=""/>
+                    <attribute id="PublishHandle" type="uint64" value="{handle}"/>
+                    <attribute id="StartupLevelName" type="FixedString" value=""/>
+                    <attribute id="Tags" type="LSString" value=""/>
+                    <attribute id="Type" type="FixedString" value="Add-on"/>
+                    <attribute id="UUID" type="FixedString" value="{uuid}"/>
+                    <attribute id="Version64" type="int64" value="{version64}"/>
+                    <children>
+                        <node id="PublishVersion">
+                            <attribute id="Version64" type="int64" value="{version64}"/>
+                        </node>
+                        <node id="Scripts"/>
+                        <node id="TargetModes">
+                            <children>
+                                <node id="Target">
+                                    <attribute id="Object" type="FixedString" value="Story"/>
+                                </node>
+                            </children>
+                        </node>
+                    </children>
+                </node>
+            </children>
+        </node>
+    </region>
+</save>
+"""
+
+_CONTENT_DIRS = (
+    "Public/{folder}/Stats/Generated/Data",
+    "Public/{folder}/RootTemplates",
+    "Public/{folder}/Assets/Textures",
+    "Localization/English",
+    "Mods/{folder}/Story/RawFiles/Goals",
+)
+# Paths an override PAK replaces in the base game.
+_OVERRIDE_DIRS = ("Public/Shared/Stats/Generated/Data", "Public/Gustav/RootTemplates")
+
+
+def _lz4_literals(data: bytes) -> bytes:
+    # A valid LZ4 block holding one literal-only sequence: cheap to produce, real to decode.
+    out = bytearray()
+    length = len(data)
+    if length >= 15:
+        out.append(0xF0)
+        rest = length - 15
+        while rest >= 255:
+            out.append(255)
+            rest -= 255
+        out.append(rest)
+    else:
+        out.append(length << 4)
+    return bytes(out) + data
+
+
+def _compress(data: bytes, method: int) -> tuple[bytes, int]:
+    if method == 2:
+        return _lz4_literals(data), len(data)
+    if method == 1:
+        return zlib.compress(data), len(data)
+    return data, 0
+
+
+# flags go into the header as they are (0x04 marks a solid package); with parts > 1 the entries
+# are spread round-robin over <name>.pak, <name>_1.pak... as LSLib splits large packages.
+def write_pak(path, files, version=18, method=2, flags=0, parts=1):
+    path = Path(path)
+    base = 4 + (_HEADER15.size if version == 15 else _HEADER16.size)
+    bodies = [bytearray() for _ in range(parts)]
+    file_list = bytearray()
+    for index, (name, data) in enumerate(files):
+        part = index % parts
+        packed, uncompressed = _compress(data, method)
+        offset = (base if part == 0 else 0) + len(bodies[part])
+        encoded = name.encode("utf-8").ljust(256, b"\0")
+        if version >= 18:
+            file_list += _ENTRY18.pack(encoded, offset & 0xFFFFFFFF, offset >> 32, part, method, len(packed), uncompressed)
+        else:
+            file_list += _ENTRY15.pack(encoded, offset, len(packed), uncompressed, part, method, 0, 0)
+        bodies[part] += packed
+    body = bodies[0]
+    compressed_list = _lz4_literals(bytes(file_list))
+    file_list_offset = base + len(body)
+    file_list_size = 8 + len(compressed_list)
+    if version == 15:
+        header = _HEADER15.pack(version, file_list_offset, file_list_size, flags, 0, b"\0" * 16)
+    else:
+        header = _HEADER16.pack(version, file_list_offset, file_list_size, flags, 0, b"\0" * 16, parts)
+    with open(path, "wb") as f:
+        f.write(b"LSPK" + header + body + struct.pack("<II", len(files), len(compressed_list)) + compressed_list)
+    for part in range(1, parts):
+        path.with_name(f"{path.stem}_{part}{path.suffix}").write_bytes(bodies[part])
+
+
+def mod_pak_files(rng: random.Random, folder, name, files_per_pak, override=False, payload=512, module_uuid=None):
+    meta = META_LSX.format(
+        author=f"Author{rng.randrange(1000)}",
+        name=name,
+        folder=folder,
+        handle=rng.randrange(1, 2**32),
+        uuid=module_uuid or uuid.UUID(int=rng.getrandbits(128)),
+        version64=36028797018963968 + rng.randrange(1000),
+    ).encode("utf-8")
+    files = [(f"Mods/{folder}/meta.lsx", meta)]
+    dirs = [d.format(folder=folder) for d in _CONTENT_DIRS] + (list(_OVERRIDE_DIRS) if override else [])
+    for i in range(files_per_pak - 1):
+        directory = dirs[i % len(dirs)]
+        files.append((f"{directory}/file_{i:05d}.txt", rng.randbytes(payload)))
+    return files
+
+
+# Builds <root>/mods/<mod>/PAK_FILES/*.pak (plus some SE_CONFIG and LevelCache folders),
+# <root>/profile, <root>/overwrite and <root>/data/GustavX.pak. Returns the mod names in
+# priority order (lowest first, as modlist.txt lists them bottom-up).
+def make_instance(root, mod_count, paks_per_mod=1, files_per_pak=20, seed=1, method=2) -> list[str]:
+    root = Path(root)
+    rng = random.Random(seed)
+    for name in ("profile", "overwrite", "data"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+    write_pak(root / "data" / "GustavX.pak", mod_pak_files(rng, "GustavX", "GustavX", 50), method=method)
+
+    mod_names = []
+    for i in range(mod_count):
+        mod_name = f"Synthetic Mod {i:05d}"
+        add_mod(root, mod_name, rng, paks_per_mod, files_per_pak, method, override=i % 10 == 0)
+        if i % 7 == 0:
+            se_config = root / "mods" / mod_name / "SE_CONFIG"
+            se_config.mkdir(parents=True, exist_ok=True)
+            (se_config / f"config_{i}.json").write_text(json.dumps({"mod": i}))
+        if i % 13 == 0:
+            level_cache = root / "mods" / mod_name / "LevelCache" / f"Level_{i}"
+            level_cache.mkdir(parents=True, exist_ok=True)
+            (level_cache / "cache.bin").write_bytes(rng.randbytes(256))
+        mod_names.append(mod_name)
+    return mod_names
+
+
+# module_uuids keeps the UUID of each PAK (by index), as an update of an existing mod would.
+def add_mod(root, mod_name, rng=None, paks_per_mod=1, files_per_pak=20, method=2, override=False, module_uuids=None):
+    rng = rng or random.Random(mod_name)
+    pak_dir = Path(root) / "mods" / mod_name / "PAK_FILES"
+    pak_dir.mkdir(parents=True, exist_ok=True)
+    for p in range(paks_per_mod):
+        folder = f"{mod_name.replace(' ', '')}_{p}"
+        module_uuid = module_uuids[p] if module_uuids else None
+        files = mod_pak_files(rng, folder, f"{mod_name} {p}", files_per_pak, override, module_uuid=module_uuid)
+        write_pak(pak_dir / f"{folder}.pak", files, method=method)
+    os.utime(pak_dir)
+    return pak_dir
+
+
+# Story/<name>/<name>.lsv (an LSPK package holding SaveInfo.json and a large Globals.lsf) plus the
+# .webp thumbnail next to it, as the game writes them. Returns the .lsv paths.
+def make_saves(story_dir, count, seed=1, payload=256 * 1024, first=0) -> list[Path]:
+    rng = random.Random(seed)
+    saves = []
+    for i in range(first, first + count):
+        name = f"Tav-{i:04d}__QuickSave_{i}"
+        save_dir = Path(story_dir) / name
+        save_dir.mkdir(parents=True, exist_ok=True)
+        info = {
+            "Save Name": f"QuickSave_{i}",
+            "Current Level": rng.choice(("WLD_Main_A", "SCL_Main_A", "BGO_Main_A")),
+            "Difficulty": "Balanced",
+            "Game Version": "4.1.1.6758295",
+            "Active Party": {"Characters": [{"Origin": "Astarion", "Level": rng.randrange(1, 13)}]},
+        }
+        files = [("SaveInfo.json", json.dumps(info).encode("utf-8")), ("Globals.lsf", rng.randbytes(payload))]
+        write_pak(save_dir / f"{name}.lsv", files)
+        (save_dir / f"{name}.webp").write_bytes(b"RIFF" + rng.randbytes(4096))
+        saves.append(save_dir / f"{name}.lsv")
+    return saves
+
+
+# LevelCache/<level>/<file>.bin as the game leaves it in AppData. Returns the file paths.
+def make_level_cache(root, levels, files_per_level, seed=1, size=1024) -> list[Path]:
+    rng = random.Random(seed)
+    files = []
+    for level in range(levels):
+        level_dir = Path(root) / f"Level_{level:04d}" / "Cache"
+        level_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(files_per_level):
+            path = level_dir / f"chunk_{i:04d}.bin"
+            path.write_bytes(rng.randbytes(size))
+            files.append(path)
+    return files
+
+
+# PAK metadata as the plugin caches it (Override/LoadOrder flags, then the meta.lsx attributes).
+def make_metadata(count, seed=1) -> list[dict]:
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        folder = f"SyntheticMod_{i:05d}"
+        records.append({
+            "Override": rng.random() < 0.1,
+            "LoadOrder": rng.random() < 0.9,
+            "Folder": {"value": folder, "type": "LSString"},
+            "MD5": {"value": rng.randbytes(16).hex(), "type": "LSString"},
+            "Name": {"value": f"Synthetic Mod {i:05d}", "type": "LSString"},
+            "PublishHandle": {"value": str(rng.randrange(1, 2**32)), "type": "uint64"},
+            "UUID": {"value": str(uuid.UUID(int=rng.getrandbits(128))), "type": "FixedString"},
+            "Version64": {"value": str(36028797018963968 + rng.randrange(1000)), "type": "int64"},
+        })
+    return records
+
+
+# Synthetic archive layouts for BG3ModDataChecker: "wide" puts many entries at the top level,
+# "deep" nests directories the way repacked archives often do.
+def make_file_tree(tree_cls, shape="wide", size=1000, seed=1):
+    rng = random.Random(seed)
+    tree = tree_cls()
+    if shape == "wide":
+        for i in range(size):
+            choice = rng.random()
+            if choice < 0.4:
+                tree.add_file(f"Mod_{i}.pak")
+            elif choice < 0.6:
+                tree.add_file(f"readme_{i}.txt")
+            elif choice < 0.8:
+                tree.add_directory(f"Folder_{i}").add_file("data.bin")
+            else:
+                tree.add_file(f"config_{i}.json")
+    else:
+        node = tree
+        for depth in range(size):
+            node = node.add_directory(f"level_{depth}")
+            node.add_file(f"notes_{depth}.txt")
+        node.add_file("Mod.pak")
+    return tree
@@ -2,15 +2,11 @@ from abc import ABC
 import os
 import json
 from pathlib import Path
-import shutil
-import subprocess
-import zipfile
-import tempfile
-import urllib.request
 import re
 
 import mobase # type: ignore
-from PyQt6.QtCore import QDir, QFileInfo, QDirIterator, QFile, qDebug, QCoreApplication, Qt
+from PyQt6.QtCore import QDir, QFileInfo, QDirIterator, QFile, qDebug, QCoreApplication, Qt, QTimer
+from PyQt6.QtGui import QImage
 from PyQt6.QtWidgets import QMessageBox, QMainWindow, QApplication, QPushButton, QProgressDialog
 from PyQt6.QtCore import QCoreApplication
 
@@ -20,11 +16,13 @@ from ..basic_features import (
     BasicModDataChecker,
     GlobPatterns,
 )
-# from ..basic_features.basic_save_game_info import BasicGameSaveGame
+from ..basic_features.basic_save_game_info import BasicGameSaveGame
 from ..basic_features.utils import is_directory
 from ..basic_game import BasicGame
 
-from .baldursgate3 import modSettings
+# Everything else in .baldursgate3 (and the stdlib modules it pulls in: sqlite3, subprocess, xml,
+# concurrent.futures...) is imported where it is first used, so loading the plugin stays cheap.
+from .baldursgate3 import mappingPlanner, modListing, revalidator, tracing, warmup
 
 class BG3ModDataChecker(BasicModDataChecker):
     def __init__(self):
@@ -58,31 +56,58 @@ class BG3ModDataChecker(BasicModDataChecker):
                 }
             )
         )
+        # Classifications of the folders of the tree last checked, by id(): MO2 asks about every
+        # subtree of an archive, and each answer depends on all its ancestors.
+        self._memo_root = None
+        self._memo = {}
+        # valid, move and delete globs merged into one regex; the matching group names the kind.
+        rp = self._regex_patterns
+        kinds = {
+            "move": "|".join(f"(?:{regex.pattern})" for regex in rp.move.values()),
+            "valid": rp.valid.pattern,
+            "delete": rp.delete.pattern,
+        }
+        self._matcher = re.compile(
+            "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in kinds.items() if pattern), re.IGNORECASE
+        )
 
-    _extra_move_patterns = {
-        "*.dll": "Root/bin/",
-    }
+    def _local_status(self, filetree: mobase.IFileTree) -> mobase.ModDataChecker.CheckReturn:
+        status = mobase.ModDataChecker.INVALID
+        match = self._matcher.match
+        for entry in filetree:
+            m = match(entry.name().casefold())
+            if m is None:
+                continue
+            if m.lastgroup == "move":
+                return mobase.ModDataChecker.FIXABLE
+            if m.lastgroup == "valid":
+                status = mobase.ModDataChecker.VALID
+        return status
 
     def dataLooksValid(
         self, filetree: mobase.IFileTree
     ) -> mobase.ModDataChecker.CheckReturn:
-        parent = filetree.parent()
-        if parent is not None and self.dataLooksValid(parent) is self.FIXABLE:
-            return self.FIXABLE
-
-        status = mobase.ModDataChecker.INVALID
-
-        if any(filetree.exists(p) for p in self._extra_move_patterns):
-            return mobase.ModDataChecker.FIXABLE
-        rp = self._regex_patterns
-        for entry in filetree:
-            name = entry.name().casefold()
-            if rp.move_match(name) is not None:
-                status = mobase.ModDataChecker.FIXABLE
-            elif rp.valid.match(name):
-                if status is mobase.ModDataChecker.INVALID:
-                    status = mobase.ModDataChecker.VALID
-        return status
+        chain = [filetree]
+        while (parent := chain[-1].parent()) is not None:
+            chain.append(parent)
+        if chain[-1] is not self._memo_root:
+            self._memo_root = chain[-1]
+            self._memo = {}
+
+        # Anything to move in an ancestor makes the whole subtree fixable. Each folder's entries
+        # are matched once; an entry count that no longer agrees means the folder was edited.
+        for node in reversed(chain):
+            memo = self._memo.get(id(node))
+            if memo is None or memo[0] is not node or memo[1] != len(node):
+                memo = self._memo[id(node)] = (node, len(node), self._local_status(node))
+            if memo[2] is mobase.ModDataChecker.FIXABLE:
+                return mobase.ModDataChecker.FIXABLE
+        return memo[2]
+
+    def fix(self, filetree: mobase.IFileTree) -> mobase.IFileTree | None:
+        self._memo_root = None
+        self._memo = {}
+        return super().fix(filetree)
 
 class BG3Game(BasicGame, mobase.IPluginFileMapper):
     Name = "Baldur's Gate 3 Unofficial Support Plugin"
@@ -122,19 +147,33 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
     def __init__(self):
         BasicGame.__init__(self)
         mobase.IPluginFileMapper.__init__(self)
+        self._mod_listing = modListing.ModListingCache(
+            {mod_type: data["pattern"] for mod_type, data in self._mods_paths.items()}
+        )
+        self._warmup = warmup.WarmupIndexer()
+        self._revalidator = revalidator.LaunchRevalidator()
+        self._revalidation_timer = None
+        self._revalidation_progress = None
+        self._save_index = None
         
     def create_modscache(self, profile_path):
-        profile_path = Path(profile_path)
-        mod_cache_path = profile_path / "modsCache.json"
-        if not mod_cache_path.exists():
-            with open(mod_cache_path, "w") as f:
-                json.dump({}, f)
+        from .baldursgate3 import modsCache
+
+        modsCache.open_cache(profile_path)
+
+    def _saves(self):
+        if self._save_index is None:
+            from .baldursgate3 import saveIndex
+
+            self._save_index = saveIndex.SaveIndex()
+        return self._save_index
 
     def init(self, organizer: mobase.IOrganizer) -> bool:
         super().init(organizer)
         self._register_feature(BG3ModDataChecker())
         self._register_feature(BasicGameSaveGameInfo(
-            lambda s: s.with_suffix(".webp")
+            get_preview=self._save_preview,
+            get_metadata=lambda path, save: self._saves().info(path),
         ))
         self._register_feature(
             BasicLocalSavegames(self.savesDirectory())
@@ -149,9 +188,51 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
 
         self._organizer.onUserInterfaceInitialized(self.onUserInterfaceLoad) # on Mod Organizer 2 Load
         self._organizer.onProfileCreated(self.onProfileCreated) # on Profile Created
+        self._organizer.onProfileChanged(self.onProfileChanged) # on Profile Switched
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.onAboutToQuit) # on Mod Organizer 2 Exit
 
         return True
-    
+
+    def settings(self) -> list[mobase.PluginSetting]:
+        return [
+            mobase.PluginSetting(
+                "paranoid_hashing",
+                "Re-hash every PAK file on launch instead of trusting unchanged size, modification time and file id",
+                False,
+            ),
+            mobase.PluginSetting(
+                "trace_launch",
+                "Record timings of every launch to launch_trace.json (Chrome trace format) in the profile folder",
+                False,
+            ),
+            mobase.PluginSetting(
+                "background_warmup",
+                "Read the metadata of new or changed PAK files in the background after Mod Organizer starts",
+                True,
+            ),
+            mobase.PluginSetting(
+                "fast_launch",
+                "Start the game from the cached metadata of changed PAK files and check them in the background,"
+                " with a warning if the load order turns out different",
+                False,
+            ),
+            mobase.PluginSetting(
+                "pak_conflict_report",
+                "Keep the file list of every PAK and write the files provided by more than one mod to"
+                " pakConflicts.json in the profile folder on every launch",
+                False,
+            ),
+        ]
+
+    # Tells modSettings whether extraction should keep PAK listings for the conflict report.
+    def _keep_listings(self) -> bool:
+        from .baldursgate3 import modSettings
+
+        modSettings.keep_listings = bool(self._organizer.pluginSetting(self.name(), "pak_conflict_report"))
+        return modSettings.keep_listings
+
     def onRefresh(self):
         hasDependencies = check_bg3_paths(self._organizer)
 
@@ -161,11 +242,105 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
         return True
 
     def onAboutToRun(self, executable: str):
-        self.create_modscache(self._organizer.profile().absolutePath())
-        modSettings.generate_mod_settings(self._organizer, self._organizer.modList(), self._organizer.profile())
+        profile_path = self._organizer.profile().absolutePath()
+        trace = bool(self._organizer.pluginSetting(self.name(), "trace_launch"))
+        self._warmup.cancel()
+        self._revalidator.cancel()
+        if trace:
+            tracing.start()
+        try:
+            with tracing.span("onAboutToRun", executable=os.path.basename(executable)):
+                from .baldursgate3 import modSettings
+
+                self.create_modscache(profile_path)
+                conflict_report = self._keep_listings()
+                if self._organizer.pluginSetting(self.name(), "fast_launch"):
+                    launch = modSettings.write_cached_mod_settings(
+                        self._organizer, self._organizer.modList(), self._organizer.profile()
+                    )
+                    if launch is not None:
+                        self._start_revalidation(launch)
+                else:
+                    modSettings.generate_mod_settings(self._organizer, self._organizer.modList(), self._organizer.profile())
+                if conflict_report:
+                    try:
+                        conflicts = modSettings.write_conflict_report(
+                            self._organizer, self._organizer.modList(), self._organizer.profile()
+                        )
+                        qDebug(f"{conflicts} files are provided by more than one PAK, see {modSettings.CONFLICT_REPORT_NAME}.")
+                    except Exception as e:
+                        qDebug(f"Failed to write the PAK conflict report: {e}")
+        finally:
+            if trace:
+                # Tracing stays on so mappings() and onFinishedRun land in the same trace.
+                self._export_trace()
         return True
 
+    def _start_revalidation(self, launch):
+        self._revalidator.start(launch)
+        if self._revalidation_progress is not None:
+            self._revalidation_progress.close()
+        main_window = self._organizer.mainWindow() if hasattr(self._organizer, "mainWindow") else None
+        # Not modal and only shown when the check takes more than a second; the game is running.
+        progress = QProgressDialog("Checking changed PAK files...", None, 0, len(launch.stale), main_window)
+        progress.setWindowTitle("BG3 Plugin - Checking PAK files")
+        progress.setMinimumDuration(1000)
+        progress.setValue(0)
+        self._revalidation_progress = progress
+        if self._revalidation_timer is None:
+            self._revalidation_timer = QTimer()
+            self._revalidation_timer.setInterval(250)
+            self._revalidation_timer.timeout.connect(self._poll_revalidation)
+        self._revalidation_timer.start()
+
+    def _poll_revalidation(self):
+        progress = self._revalidation_progress
+        if progress is not None:
+            progress.setValue(self._revalidator.done)
+        if self._revalidator.is_running():
+            return
+        self._revalidation_timer.stop()
+        if progress is not None:
+            progress.close()
+            self._revalidation_progress = None
+        result = self._revalidator.result()
+        if result is None:
+            return
+        written, resolved = result
+        if written == resolved:
+            qDebug("Changed PAK files checked, the load order the game started with is unchanged.")
+            return
+        added = len(set(resolved) - set(written))
+        removed = len(set(written) - set(resolved))
+        changes = f"{added} modules added, {removed} removed" if added or removed else "the same modules, reordered"
+        main_window = self._organizer.mainWindow() if hasattr(self._organizer, "mainWindow") else None
+        QMessageBox.warning(
+            main_window,
+            "BG3 Plugin - Load order changed",
+            "The game was started from cached metadata, and checking the changed PAK files changed the load order"
+            f" ({changes}).\n"
+            "Restart the game to load the mods in the right order.",
+        )
+
+    def _export_trace(self):
+        trace_path = Path(self._organizer.profile().absolutePath()) / "launch_trace.json"
+        try:
+            tracing.export_chrome_trace(trace_path)
+            qDebug(f"Launch trace written to {trace_path}\n{tracing.summary()}")
+        except OSError as e:
+            qDebug(f"Failed to write launch trace: {e}")
+
     def onFinishedRun(self, executable: str, exit_code: int, error: str = ""):
+        with tracing.span("onFinishedRun", executable=os.path.basename(executable)):
+            self._collect_run_files()
+        if tracing.is_enabled():
+            tracing.stop()
+            self._export_trace()
+        return True
+
+    def _collect_run_files(self):
+        from .baldursgate3 import fileTransfer
+
         # Handle Script Extender files
         appdata_path = Path(os.getenv("LOCALAPPDATA")) / "Larian Studios" / "Baldur's Gate 3"
         
@@ -175,27 +350,10 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
             overwrite_path = Path(self._organizer.overwritePath()) / "SE_CONFIG"
             overwrite_path.mkdir(parents=True, exist_ok=True)
 
-            for file in se_path.glob("**/*"):
-                if file.is_file():
-                    rel_path = file.relative_to(se_path)
-                    dest_file = overwrite_path / rel_path
-                    
-                    dest_file.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    try:
-                        dest_file.write_bytes(file.read_bytes())
-                        file.unlink()
-                        
-                        parent = file.parent
-                        while parent != se_path:
-                            try:
-                                parent.rmdir()
-                                parent = parent.parent
-                            except OSError:
-                                break
-                                
-                    except Exception as e:
-                        qDebug(f"Failed to move {file} to overwrite: {str(e)}")
+            with tracing.span("move_se_config"):
+                failures = fileTransfer.transfer_tree(se_path, overwrite_path, move=True)
+            for file, e in failures:
+                qDebug(f"Failed to move {file} to overwrite: {str(e)}")
 
         # Handle LevelCache files
         levelcache_path = appdata_path / "LevelCache"
@@ -203,27 +361,31 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
             overwrite_path = Path(self._organizer.overwritePath()) / "LevelCache"
             overwrite_path.mkdir(parents=True, exist_ok=True)
 
-            for file in levelcache_path.glob("**/*"):
-                if file.is_file():
-                    rel_path = file.relative_to(levelcache_path)
-                    dest_file = overwrite_path / rel_path
-                    
-                    if not dest_file.exists():
-                        dest_file.parent.mkdir(parents=True, exist_ok=True)
-                        try:
-                            # Copy file to overwrite but don't delete the original
-                            dest_file.write_bytes(file.read_bytes())
-                        except Exception as e:
-                            qDebug(f"Failed to copy {file} to overwrite: {str(e)}")
+            # Copy files to overwrite but don't delete the originals; the manifest in the profile
+            # remembers what earlier runs copied, so only new or changed files are looked at.
+            manifest_path = Path(self._organizer.profile().absolutePath()) / "levelCacheSync.json"
+            with tracing.span("copy_levelcache"):
+                failures = fileTransfer.sync_tree(levelcache_path, overwrite_path, manifest_path, replace_existing=False)
+            for file, e in failures:
+                qDebug(f"Failed to copy {file} to overwrite: {str(e)}")
 
-        return True
-    
     def onModInstalled(self, mod: str):
-        qDebug("BUCK U")
-        modSettings.mod_installed(self._organizer, self._organizer.modList(), self._organizer.profile(), mod)
+        # Installs tend to come in batches; keep the warm-up out of their way.
+        self._warmup.pause_for()
+        self._watch_mods(mod.name())
+        self._mod_listing.invalidate(mod.absolutePath())
+        with tracing.span("onModInstalled", mod=mod.name()):
+            from .baldursgate3 import modSettings
+
+            modSettings.mod_installed(self._organizer, self._organizer.modList(), self._organizer.profile(), mod)
         return True
 
     def onModRemoved(self, mod):
+        self._warmup.pause_for()
+        self._watch_mods(str(mod))
+        self._mod_listing.invalidate(os.path.join(self._organizer.modsPath(), str(mod)))
+        from .baldursgate3 import modSettings
+
         modSettings.mod_removed(self._organizer, self._organizer.profile(), mod)
         return True
 
@@ -235,18 +397,88 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
         if hasDependencies is False:
             return True
         
+        from .baldursgate3 import modSettings, pakWatcher
+
+        modSettings.pak_watcher = pakWatcher.PakWatcher(self._organizer.modsPath())
+        self._watch_mods()
+        self._start_warmup(self._organizer.profile())
+        return True
+
+    def _watch_mods(self, changed_mod=None):
+        from .baldursgate3 import modSettings
+
+        watcher = modSettings.pak_watcher
+        if watcher is None:
+            return
+        if changed_mod is not None:
+            watcher.mod_changed(changed_mod)
+        watcher.watch(self._organizer.modList().allMods())
+
+    def onProfileChanged(self, old_profile: mobase.IProfile, new_profile: mobase.IProfile):
+        self._warmup.cancel()
+        self._revalidator.cancel()
+        from .baldursgate3 import modSettings, modsCache
+
+        # Nothing the old profile buffered may be lost once its cache stops being used.
+        modsCache.flush_all()
+        if modSettings.pak_watcher is not None:
+            # The watcher's history belongs to the old profile's cache.
+            modSettings.pak_watcher.request_full_scan()
+        if new_profile is not None:
+            self.create_modscache(new_profile.absolutePath())
+            self._start_warmup(new_profile)
         return True
 
+    def onAboutToQuit(self):
+        self._warmup.cancel()
+        self._revalidator.cancel()
+        if self._save_index is not None:
+            self._save_index.flush()
+        from .baldursgate3 import modSettings, modsCache
+
+        if modSettings.pak_watcher is not None:
+            modSettings.pak_watcher.stop()
+        modsCache.flush_all()
+
+    def _start_warmup(self, profile: mobase.IProfile):
+        if not self._organizer.pluginSetting(self.name(), "background_warmup"):
+            return
+        # Collected here on the UI thread; the indexer itself never calls into mobase.
+        self._keep_listings()
+        modlist = self._organizer.modList()
+        mods = [
+            (mod_name, modlist.getMod(mod_name).absolutePath())
+            for mod_name in modlist.allModsByProfilePriority()
+            if modlist.state(mod_name) & mobase.ModState.ACTIVE != 0
+        ]
+        self._warmup.start(profile.absolutePath(), mods, self.dataDirectory().absolutePath())
+
     def onProfileCreated(self, profile: mobase.IProfile):
         profile_path = Path(profile.absolutePath())
         print(profile_path)
         self.create_modscache(profile_path)
         return True
 
+    def listSaves(self, folder: QDir) -> list[mobase.ISaveGame]:
+        return [BasicGameSaveGame(path) for path in self._saves().scan(folder.absolutePath())]
+
+    def _save_preview(self, save_path: Path) -> QImage | None:
+        def decode(thumbnail_path):
+            image = QImage(str(thumbnail_path))
+            return None if image.isNull() else image
+
+        return self._saves().thumbnail(save_path, decode)
+
     def iniFiles(self):
         return ["modsettings.lsx"]
 
     def mappings(self) -> list[mobase.Mapping]:
+        with tracing.span("mappings") as mappings_span:
+            map = self._build_mappings()
+            mappings_span.set(count=len(map))
+        return map
+
+    def _build_mappings(self) -> list[mobase.Mapping]:
         map = []
         modlist = self._organizer.modList()
 
@@ -259,35 +491,27 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
                 if not appdata_path.mkdir(dir_name):
                     qDebug(f"Failed to create directory: {dir_path}")
 
-        # Handle regular mods
-        for mod_type, mod_map_data in self._mods_paths.items():
-            mod_pattern = mod_map_data["pattern"]
-            mod_destpath = mod_map_data["pathName"]
-
-            # Handle mods from mod directory
-            for modName in self._get_mods_from_type(mod_type):
-                mod_path = Path(modlist.getMod(modName).absolutePath()) / mod_type
-                mod_files = list(mod_path.glob(mod_pattern))
-
-                for file in mod_files:
-                    map.append(mobase.Mapping(
-                        source=str(file),
-                        destination=os.path.join(appdata_path.absoluteFilePath(mod_destpath), str(file.name)),
-                        is_directory=file.is_dir(),
-                        create_target=True,
-                    ))
-
-            # Handle files from overwrite directory
-            overwrite_path = Path(self._organizer.overwritePath()) / mod_type
-            if overwrite_path.exists():
-                overwrite_files = list(overwrite_path.glob(mod_pattern))
-                for file in overwrite_files:
-                    map.append(mobase.Mapping(
-                        source=str(file),
-                        destination=os.path.join(appdata_path.absoluteFilePath(mod_destpath), str(file.name)),
-                        is_directory=file.is_dir(),
-                        create_target=True,
-                    ))
+        mods_path = self._organizer.modsPath()
+        mod_paths = [
+            os.path.join(mods_path, modName)
+            for modName in modlist.allModsByProfilePriority()
+            if modlist.state(modName) & mobase.ModState.ACTIVE != 0
+        ]
+        mod_paths.append(self._organizer.overwritePath())
+        listings = [(mod_path, self._mod_listing.listing(mod_path)) for mod_path in mod_paths]
+
+        # Handle regular mods, then files from overwrite directory
+        destinations = {
+            mod_type: appdata_path.absoluteFilePath(mod_map_data["pathName"])
+            for mod_type, mod_map_data in self._mods_paths.items()
+        }
+        for planned in mappingPlanner.plan(mappingPlanner.sources(listings, destinations)):
+            map.append(mobase.Mapping(
+                source=planned.source,
+                destination=planned.destination,
+                is_directory=planned.is_directory,
+                create_target=planned.create_target,
+            ))
 
         map.append(mobase.Mapping(
             source=self._organizer.profile().absolutePath() + "/modsettings.lsx",
@@ -298,43 +522,82 @@ class BG3Game(BasicGame, mobase.IPluginFileMapper):
 
         return map
 
-    def _get_mods_from_type(self, mod_type: str):
-        mods_path = Path(self._organizer.modsPath())
-        all_mods = self._organizer.modList().allModsByProfilePriority()
+LSLIB_VERSION = "v1.19.5"
+LSLIB_FILES = frozenset({
+    "CommandLineArgumentsParser.dll",
+    "Divine.dll",
+    "Divine.dll.config",
+    "Divine.exe",
+    "Divine.runtimeconfig.json",
+    "granny2.dll",
+    "LSLib.dll",
+    "LSLibNative.dll",
+    "LZ4.dll",
+    "LZ4pn.dll",
+    "Newtonsoft.Json.dll",
+    "OpenTK.Mathematics.dll",
+    "System.IO.Hashing.dll",
+    "ZstdSharp.dll",
+})
+# Only Divine.exe is required, as before the manifest: installs missing one of the other files
+# keep working (Divine reports the missing file when it needs it) instead of prompting for a download.
+LSLIB_REQUIRED_FILES = frozenset({"Divine.exe"})
+
+
+# The tools folder as last verified: its modification time (which changes whenever a file in it is
+# added, removed or renamed) and the files it held. Kept next to the folder, not in it, so writing
+# the manifest doesn't change the time it records.
+def _tools_manifest_path(tools_dir: Path) -> Path:
+    return tools_dir.with_name("tools_manifest.json")
+
+
+def _tools_verified(tools_dir: Path) -> bool:
+    try:
+        manifest = json.loads(_tools_manifest_path(tools_dir).read_text(encoding="utf-8"))
+        return (
+            manifest["version"] == LSLIB_VERSION
+            and manifest["mtime"] == tools_dir.stat().st_mtime_ns
+            and LSLIB_REQUIRED_FILES.issubset(manifest["files"])
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+# One listing of the tools folder; records the manifest when the required LSLib files are there.
+def _verify_tools(tools_dir: Path) -> bool:
+    try:
+        with os.scandir(tools_dir) as it:
+            files = sorted(entry.name for entry in it if entry.is_file())
+        mtime = tools_dir.stat().st_mtime_ns
+    except OSError:
+        return False
+    if not LSLIB_REQUIRED_FILES.issubset(files):
+        return False
+    missing = LSLIB_FILES.difference(files)
+    if missing:
+        qDebug(f"LSLib tools folder is missing {', '.join(sorted(missing))}; continuing with Divine.exe.")
+    manifest = {"version": LSLIB_VERSION, "mtime": mtime, "files": files}
+    try:
+        _tools_manifest_path(tools_dir).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    except OSError as e:
+        qDebug(f"Failed to write the tools manifest: {e}")
+    return True
 
-        mods: list[str] = []
-        for modName in all_mods:
-            if self._organizer.modList().state(modName) & mobase.ModState.ACTIVE != 0:
-                if mods_path.joinpath(modName, mod_type).exists():
-                    mods.append(modName)
-        return mods
 
 def check_bg3_paths(organizer):
     base_dir = Path(__file__).parent / "baldursgate3"
     temp_dir = base_dir / "temp_extracted"
     tools_dir = base_dir / "tools"
-    divine_exe = tools_dir / "Divine.exe"
-
-    required_files = {
-        "CommandLineArgumentsParser.dll",
-        "Divine.dll",
-        "Divine.dll.config",
-        "Divine.exe",
-        "Divine.runtimeconfig.json",
-        "granny2.dll",
-        "LSLib.dll",
-        "LSLibNative.dll",
-        "LZ4.dll",
-        "LZ4pn.dll",
-        "Newtonsoft.Json.dll",
-        "OpenTK.Mathematics.dll",
-        "System.IO.Hashing.dll",
-        "ZstdSharp.dll",
-    }
 
-    if tools_dir.exists() and divine_exe.exists():
+    if _tools_verified(tools_dir) or _verify_tools(tools_dir):
         return True
 
+    import shutil
+    import subprocess
+    import tempfile
+    import urllib.request
+    import zipfile
+
     main_window = organizer.mainWindow() if hasattr(organizer, "mainWindow") else None
     msg_box = QMessageBox(main_window)
     msg_box.setWindowTitle("Baldur's Gate 3 Plugin - Missing dependencies")
@@ -354,8 +617,8 @@ def check_bg3_paths(organizer):
     progress.show()
 
     try:
-        zip_url = "https://github.com/Norbyte/lslib/releases/download/v1.19.5/ExportTool-v1.19.5.zip"
-        zip_filename = "ExportTool-v1.19.5.zip"
+        zip_filename = f"ExportTool-{LSLIB_VERSION}.zip"
+        zip_url = f"https://github.com/Norbyte/lslib/releases/download/{LSLIB_VERSION}/{zip_filename}"
         zip_path = Path(tempfile.gettempdir()) / zip_filename
 
         def reporthook(block_num, block_size, total_size):
@@ -380,8 +643,10 @@ def check_bg3_paths(organizer):
         tools_dir.mkdir(parents=True, exist_ok=True)
 
         for file in tools_source.iterdir():
-            if file.name in required_files:
+            if file.name in LSLIB_FILES:
                 shutil.copy2(file, tools_dir / file.name)
+        if not _verify_tools(tools_dir):
+            raise RuntimeError("The archive is missing some of the LSLib tools.")
 
         progress.setValue(100)
 
@@ -0,0 +1,62 @@
+# The tests run outside Mod Organizer on top of the benchmark suite's stub mobase, synthetic
+# instance generator and mock organizer, with a fake Divine driving the Divine code paths.
+import os
+import stat
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = REPO_ROOT / "benchmarks"
+sys.path[:0] = [str(BENCH_DIR / "stubs"), str(BENCH_DIR), str(REPO_ROOT)]
+
+from baldursgate3 import fingerprint, modSettings, modsCache, pakReader  # noqa: E402
+
+
+@pytest.fixture
+def fake_divine(tmp_path) -> Path:
+    if os.name == "nt":
+        pytest.skip("the fake Divine is a shell script")
+    wrapper = tmp_path / "Divine"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{BENCH_DIR / "fake_divine.py"}" "$@"\n')
+    wrapper.chmod(wrapper.stat().st_mode | stat.S_IXUSR)
+    return wrapper
+
+
+@pytest.fixture
+def divine_extractor(tmp_path, fake_divine, monkeypatch) -> pakReader.DivineExtractor:
+    monkeypatch.setenv("FAKE_DIVINE_STARTUP", "0")
+    return pakReader.DivineExtractor(fake_divine, tmp_path / "temp_extracted")
+
+
+# Profile caches and the shared metadata store live in tmp_path; PAKs go through the native
+# reader with the fake Divine as fallback.
+@pytest.fixture
+def caches(tmp_path, divine_extractor, monkeypatch):
+    monkeypatch.setattr(modsCache, "STORE_DB_PATH", tmp_path / "metadataCache.db")
+    monkeypatch.setattr(modsCache, "_store", None)
+    monkeypatch.setattr(modsCache, "_caches", {})
+    monkeypatch.setattr(modSettings, "divine_file", divine_extractor.divine_path)
+    monkeypatch.setattr(modSettings, "temp_dir", divine_extractor.temp_dir)
+    monkeypatch.setattr(
+        modSettings, "pak_extractor", pakReader.FallbackExtractor(pakReader.NativeExtractor(), divine_extractor)
+    )
+    monkeypatch.setattr(modSettings, "pak_watcher", None)
+    fingerprint.begin_run()
+    yield
+    for cache in modsCache._caches.values():
+        cache._conn.close()
+    if modsCache._store is not None:
+        modsCache._store._conn.close()
+
+
+# A synthetic MO2 instance: (organizer, root, mod names lowest priority first).
+@pytest.fixture
+def instance(tmp_path, caches):
+    import synthetic
+    from mock_organizer import MockOrganizer
+
+    root = tmp_path / "instance"
+    mod_names = synthetic.make_instance(root, 12)
+    return MockOrganizer(root, mod_names, {"paranoid_hashing": False}), root, mod_names
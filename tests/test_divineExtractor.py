@@ -0,0 +1,140 @@
+import errno
+import os
+import random
+import shutil
+from pathlib import Path
+
+import pytest
+
+import synthetic
+from baldursgate3 import pakReader
+
+
+@pytest.fixture
+def actions(divine_extractor, monkeypatch) -> list[str]:
+    # The Divine action ("extract-packages", "extract-package"...) of every process started.
+    started = []
+    run = divine_extractor._run
+
+    def record(*args, **kwargs):
+        started.append(args[1])
+        return run(*args, **kwargs)
+
+    monkeypatch.setattr(divine_extractor, "_run", record)
+    return started
+
+
+def _paks(folder, count):
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(count)
+    paks = {}
+    for i in range(count):
+        files = synthetic.mod_pak_files(rng, f"Mod{i}", f"Mod {i}", 4)
+        pak = folder / f"Mod{i}.pak"
+        synthetic.write_pak(pak, files)
+        paks[pak] = files
+    return paks
+
+
+def _assert_read(results, paks):
+    for pak, files in paks.items():
+        assert isinstance(results[pak], pakReader.PakContents), results[pak]
+        assert results[pak].meta_lsx == files[0][1]
+        assert results[pak].listing == [name for name, _ in files]
+
+
+def test_one_divine_run_for_the_whole_queue(tmp_path, divine_extractor, actions):
+    paks = _paks(tmp_path / "paks", 4)
+    results = divine_extractor.read_many(list(paks))
+
+    assert actions == ["extract-packages"]
+    assert set(results) == set(paks)
+    _assert_read(results, paks)
+    assert not any(divine_extractor.temp_dir.iterdir())
+
+
+def test_failed_batch_is_extracted_one_by_one(tmp_path, divine_extractor, actions):
+    paks = _paks(tmp_path / "paks", 3)
+    broken = tmp_path / "paks" / "Broken.pak"
+    broken.write_bytes(b"garbage" * 10)
+
+    results = divine_extractor.read_many([*paks, broken])
+
+    assert actions[0] == "extract-packages"
+    assert actions.count("extract-package") == 4
+    _assert_read(results, paks)
+    assert isinstance(results[broken], Exception)
+
+
+def test_paks_that_cannot_be_hardlinked_are_extracted_on_their_own(tmp_path, divine_extractor, actions, monkeypatch):
+    paks = _paks(tmp_path / "paks", 4)
+    other_volume = next(iter(paks))
+    link = os.link
+
+    def cross_volume_link(src, dst):
+        if src == other_volume:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return link(src, dst)
+
+    monkeypatch.setattr(pakReader.os, "link", cross_volume_link)
+    results = divine_extractor.read_many(list(paks))
+
+    assert actions == ["extract-packages", "extract-package"]
+    _assert_read(results, paks)
+
+
+def test_no_batch_when_nothing_can_be_hardlinked(tmp_path, divine_extractor, actions, monkeypatch):
+    paks = _paks(tmp_path / "paks", 3)
+
+    def cross_volume_link(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(pakReader.os, "link", cross_volume_link)
+    results = divine_extractor.read_many(list(paks))
+
+    assert actions == ["extract-package"] * 3
+    _assert_read(results, paks)
+
+
+def test_fallback_extractor_batches_only_what_the_native_reader_refused(tmp_path, divine_extractor, actions):
+    paks = _paks(tmp_path / "paks", 2)
+    solid = _paks(tmp_path / "solid", 2)
+    for pak, files in solid.items():
+        synthetic.write_pak(pak, files, flags=pakReader._PACKAGE_FLAG_SOLID)
+
+    extractor = pakReader.FallbackExtractor(pakReader.NativeExtractor(), divine_extractor)
+    results = extractor.read_many([*paks, *solid])
+
+    assert actions == ["extract-packages"]
+    _assert_read(results, {**paks, **solid})
+
+
+def test_paks_missing_from_the_batch_output_are_extracted_again(tmp_path, divine_extractor, actions, monkeypatch):
+    paks = _paks(tmp_path / "paks", 3)
+    run = divine_extractor._run
+
+    # As Divine without --use-package-name: nothing lands in the <index> folder of the first PAK.
+    def lose_first_package(*args, **kwargs):
+        result = run(*args, **kwargs)
+        if args[1] == "extract-packages":
+            assert "--use-package-name" in args
+            output_dir = Path(args[args.index("-d") + 1])
+            shutil.rmtree(output_dir / "0")
+        return result
+
+    monkeypatch.setattr(divine_extractor, "_run", lose_first_package)
+    results = divine_extractor.read_many(list(paks))
+
+    assert actions == ["extract-packages", "extract-package"]
+    _assert_read(results, paks)
+
+
+def test_split_paks_are_extracted_on_their_own(tmp_path, divine_extractor, actions):
+    paks = _paks(tmp_path / "paks", 3)
+    split = next(iter(paks))
+    synthetic.write_pak(split, paks[split], parts=2)
+
+    results = divine_extractor.read_many(list(paks))
+
+    assert actions == ["extract-packages", "extract-package"]
+    _assert_read(results, paks)
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import mobase
+from mock_organizer import MockProfile
+from baldursgate3 import headless, modSettings
+
+
+# Lays the synthetic instance out the way MO2 does: ModOrganizer.ini, profiles/<name>/modlist.txt
+# and the game's Data folder under gamePath.
+def _mo2_instance(root, mod_names, profiles) -> Path:
+    game = root / "game"
+    game.mkdir()
+    (root / "data").rename(game / "Data")
+    (root / "ModOrganizer.ini").write_text(
+        f"[General]\ngamePath=@ByteArray({game})\n\n[Settings]\n"
+        f"[Plugins]\nBaldur%27s%20Gate%203%20Unofficial%20Support%20Plugin\\paranoid_hashing=false\n",
+        encoding="utf-8",
+    )
+    for name, enabled in profiles.items():
+        profile = root / "profiles" / name
+        profile.mkdir(parents=True)
+        # Top line has the highest priority.
+        lines = [f"{'+' if mod_name in enabled else '-'}{mod_name}" for mod_name in reversed(mod_names)]
+        (profile / "modlist.txt").write_text("\n".join(["# This file was automatically generated"] + lines) + "\n")
+    return root
+
+
+def test_rebuilds_every_profile_and_shares_the_paks(instance):
+    _, root, mod_names = instance
+    _mo2_instance(root, mod_names, {"All": set(mod_names), "Half": set(mod_names[::2])})
+
+    report = headless.run([root])
+
+    assert [(row["profile"], row["active_mods"], row["error"]) for row in report] == [
+        ("All", len(mod_names), None),
+        ("Half", len(mod_names[::2]), None),
+    ]
+    assert report[0]["paks_extracted"] > 0
+    # Every PAK of the smaller profile was already read for the larger one.
+    assert report[1]["paks_extracted"] == 0 and report[1]["paks_shared"] > 0
+    for name in ("All", "Half"):
+        assert (root / "profiles" / name / "modsettings.lsx").is_file()
+
+    assert all(row["unchanged"] and not row["error"] for row in headless.run([root]))
+
+
+def test_matches_the_inputs_fingerprint_computed_in_mo2(instance):
+    organizer, root, mod_names = instance
+    _mo2_instance(root, mod_names, {"Default": set(mod_names[1:])})
+    # The plugin's view of the same profile, with flags a modlist.txt doesn't record.
+    organizer._profile = MockProfile(root / "profiles" / "Default")
+    organizer._game._data._path = str(root / "game" / "Data")
+    organizer._game._version = headless.HeadlessGame(root / "game").gameVersion()
+    active = mobase.ModState.EXISTS | mobase.ModState.ACTIVE | mobase.ModState.VALID
+    organizer.modList().states = {
+        mod_names[0]: int(mobase.ModState.EXISTS | mobase.ModState.VALID),
+        mod_names[1]: int(active | mobase.ModState.ENDORSED),
+        mod_names[2]: int(active | mobase.ModState.EMPTY),
+    }
+    modSettings.generate_mod_settings(organizer, organizer.modList(), organizer.profile())
+
+    report = headless.run([root])
+
+    assert [(row["profile"], row["unchanged"], row["error"]) for row in report] == [("Default", True, None)]
@@ -0,0 +1,155 @@
+import os
+import shutil
+
+import pytest
+
+from baldursgate3 import mappingPlanner, modListing
+
+# mod type -> (pattern, AppData folder), as BG3Game._mods_paths.
+MODS_PATHS = {"PAK_FILES": ("*.pak", "Mods"), "SE_CONFIG": ("*", "Script Extender"), "LevelCache": ("*", "LevelCache")}
+
+
+# What the game sees through a mapping list: every visible file (case-insensitively) and the file
+# it comes from, later mappings replacing earlier ones as in USVFS.
+def _vfs_view(mappings) -> dict[str, str]:
+    view = {}
+    for mapping in mappings:
+        if not mapping.is_directory:
+            view[os.path.normpath(mapping.destination).lower()] = mapping.source
+            continue
+        for root, _, files in os.walk(mapping.source):
+            relative = os.path.relpath(root, mapping.source)
+            for name in files:
+                view[os.path.normpath(os.path.join(mapping.destination, relative, name)).lower()] = os.path.join(root, name)
+    return view
+
+
+# One mapping per top level entry, as mappings() did before mappingPlanner.
+def _per_entry_mappings(sources):
+    return [
+        mappingPlanner.PlannedMapping(os.path.join(source.path, name), os.path.join(source.destination, name), is_dir, True)
+        for source in sources
+        for name, is_dir in source.entries
+    ]
+
+
+def _write(path, text="data"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def plan(tmp_path):
+    # Plans the given folders (lowest priority first, overwrite last) and checks that the game
+    # sees exactly what one mapping per entry showed it.
+    def plan(*folders):
+        cache = modListing.ModListingCache({mod_type: pattern for mod_type, (pattern, _) in MODS_PATHS.items()})
+        listings = [(str(folder), cache.listing(folder)) for folder in folders]
+        destinations = {mod_type: str(tmp_path / "appdata" / name) for mod_type, (_, name) in MODS_PATHS.items()}
+        sources = mappingPlanner.sources(listings, destinations)
+        planned = mappingPlanner.plan(sources)
+        assert _vfs_view(planned) == _vfs_view(_per_entry_mappings(sources))
+        return planned
+
+    return plan
+
+
+def test_pak_folder_with_only_paks_is_one_mapping(tmp_path, plan):
+    mod = tmp_path / "mods" / "A"
+    for name in ("A_0.pak", "A_1.pak", "A_2.pak"):
+        _write(mod / "PAK_FILES" / name)
+
+    assert plan(mod) == [
+        mappingPlanner.PlannedMapping(str(mod / "PAK_FILES"), str(tmp_path / "appdata" / "Mods"), True, False)
+    ]
+
+
+def test_pak_folder_with_other_files_is_mapped_per_pak(tmp_path, plan):
+    mod = tmp_path / "mods" / "A"
+    _write(mod / "PAK_FILES" / "A_0.pak")
+    _write(mod / "PAK_FILES" / "A_1.pak")
+    _write(mod / "PAK_FILES" / "readme.txt")
+
+    planned = plan(mod)
+    assert [os.path.basename(m.source) for m in planned] == ["A_0.pak", "A_1.pak"]
+    assert all(not m.is_directory and m.create_target for m in planned)
+
+
+def test_single_pak_is_mapped_as_a_file(tmp_path, plan):
+    mod = tmp_path / "mods" / "A"
+    _write(mod / "PAK_FILES" / "A_0.pak")
+
+    assert plan(mod) == [
+        mappingPlanner.PlannedMapping(
+            str(mod / "PAK_FILES" / "A_0.pak"), str(tmp_path / "appdata" / "Mods" / "A_0.pak"), False, True
+        )
+    ]
+
+
+def test_shadowed_files_are_dropped(tmp_path, plan):
+    low, high, overwrite = tmp_path / "mods" / "Low", tmp_path / "mods" / "High", tmp_path / "overwrite"
+    for name in ("Shared.pak", "Low.pak"):
+        _write(low / "PAK_FILES" / name, "low")
+    for name in ("SHARED.pak", "High.pak"):
+        _write(high / "PAK_FILES" / name, "high")
+    _write(overwrite / "PAK_FILES" / "High.pak", "overwrite")
+
+    planned = plan(low, high, overwrite)
+    sources = [os.path.relpath(m.source, tmp_path) for m in planned]
+    # Low lost a file, so it is no longer mapped as a whole folder; High lost its other PAK to overwrite.
+    assert sources == [
+        os.path.join("mods", "Low", "PAK_FILES", "Low.pak"),
+        os.path.join("mods", "High", "PAK_FILES", "SHARED.pak"),
+        os.path.join("overwrite", "PAK_FILES", "High.pak"),
+    ]
+
+
+def test_se_config_folders_stay_per_entry(tmp_path, plan):
+    files_only, with_folder = tmp_path / "mods" / "Files", tmp_path / "mods" / "Folder"
+    _write(files_only / "SE_CONFIG" / "a.json")
+    _write(files_only / "SE_CONFIG" / "b.json")
+    _write(with_folder / "SE_CONFIG" / "ModConfig" / "settings.json")
+    _write(with_folder / "SE_CONFIG" / "c.json")
+    _write(tmp_path / "overwrite" / "SE_CONFIG" / "ModConfig" / "local.json")
+
+    planned = plan(files_only, with_folder, tmp_path / "overwrite")
+    script_extender = str(tmp_path / "appdata" / "Script Extender")
+    assert planned[0] == mappingPlanner.PlannedMapping(str(files_only / "SE_CONFIG"), script_extender, True, False)
+    # Folders are mapped one by one with create_target, so USVFS merges them and redirects writes.
+    folders = [m for m in planned if m.is_directory and m.create_target]
+    assert [os.path.relpath(m.source, tmp_path) for m in folders] == [
+        os.path.join("mods", "Folder", "SE_CONFIG", "ModConfig"),
+        os.path.join("overwrite", "SE_CONFIG", "ModConfig"),
+    ]
+
+
+def test_mod_types_and_priorities_keep_their_order(tmp_path, plan):
+    mods = [tmp_path / "mods" / name for name in ("A", "B", "C")]
+    for mod in mods:
+        _write(mod / "PAK_FILES" / f"{mod.name}.pak")
+        _write(mod / "LevelCache" / f"{mod.name}_level" / "cache.bin")
+
+    planned = plan(*mods)
+    assert [os.path.relpath(m.source, tmp_path) for m in planned] == [
+        os.path.join("mods", name, mod_type, name + suffix)
+        for mod_type, suffix in (("PAK_FILES", ".pak"), ("LevelCache", "_level"))
+        for name in ("A", "B", "C")
+    ]
+
+
+def test_synthetic_instance_view_is_unchanged(tmp_path, plan):
+    import synthetic
+
+    root = tmp_path / "instance"
+    mod_names = synthetic.make_instance(root, 40, paks_per_mod=3, files_per_pak=2)
+    for i, mod_name in enumerate(mod_names):
+        pak_dir = root / "mods" / mod_name / "PAK_FILES"
+        if i % 5 == 4:
+            previous = next((root / "mods" / mod_names[i - 1] / "PAK_FILES").glob("*.pak"))
+            shutil.copy2(previous, pak_dir / previous.name)
+        if i % 11 == 3:
+            _write(pak_dir / "readme.txt")
+    _write(root / "overwrite" / "SE_CONFIG" / "config_0.json", "{}")
+
+    planned = plan(*(root / "mods" / name for name in mod_names), root / "overwrite")
+    assert any(m.is_directory and not m.create_target for m in planned)
@@ -0,0 +1,135 @@
+import json
+import random
+import re
+import shutil
+import sqlite3
+from pathlib import Path
+
+import synthetic
+from baldursgate3 import fingerprint, modSettings, modsCache, pakReader, pakWatcher
+
+
+def _settings_path(organizer) -> Path:
+    return Path(organizer.profile().absolutePath()) / "modsettings.lsx"
+
+
+def _generate(organizer):
+    modSettings.generate_mod_settings(organizer, organizer.modList(), organizer.profile())
+    return _settings_path(organizer).read_text(encoding="utf-8")
+
+
+def _module_uuids(settings: str) -> list[str]:
+    order = settings.split('id="Mods"', 1)[0]
+    return re.findall(r'id="UUID"[^>]*value="([^"]+)"', order)
+
+
+def _replace_mod(root, mod_name, seed):
+    synthetic.add_mod(root, mod_name, random.Random(seed))
+
+
+def test_pak_replaced_in_a_mod_the_watcher_did_not_report(instance, monkeypatch):
+    organizer, root, mod_names = instance
+    watcher = pakWatcher.PakWatcher(organizer.modsPath(), use_qt=False, poll_interval=3600)
+    monkeypatch.setattr(modSettings, "pak_watcher", watcher)
+    try:
+        watcher.watch(mod_names)
+        before = _module_uuids(_generate(organizer))
+
+        _replace_mod(root, mod_names[3], "replaced")
+        after = _module_uuids(_generate(organizer))
+        assert after != before
+
+        monkeypatch.setattr(modSettings, "pak_watcher", None)
+        _settings_path(organizer).unlink()
+        assert _module_uuids(_generate(organizer)) == after
+    finally:
+        watcher.stop()
+
+
+class _UnavailableExtractor(pakReader.PakExtractor):
+    name = "unavailable"
+
+    def read(self, pak_path):
+        raise OSError("tools are not available")
+
+
+def test_failed_reads_are_retried_on_the_next_launch(instance, monkeypatch):
+    organizer, root, mod_names = instance
+    working = modSettings.pak_extractor
+    monkeypatch.setattr(modSettings, "pak_extractor", _UnavailableExtractor())
+    assert _module_uuids(_generate(organizer)) == []
+
+    monkeypatch.setattr(modSettings, "pak_extractor", working)
+    assert len(_module_uuids(_generate(organizer))) == len(mod_names)
+
+
+def _jobs(root, mod_names):
+    return [(mod_name, pak) for mod_name in mod_names for pak in (root / "mods" / mod_name / "PAK_FILES").glob("*.pak")]
+
+
+def test_pak_gone_while_linking_is_a_failed_result(instance, monkeypatch):
+    organizer, root, mod_names = instance
+    cache = modsCache.open_cache(organizer.profile().absolutePath())
+    jobs = _jobs(root, mod_names)
+    gone = jobs[4][1]
+    make_fingerprint = fingerprint.make_fingerprint
+
+    def deleted_mid_scan(path, md5=None):
+        if Path(path) == gone:
+            raise FileNotFoundError(2, "No such file", str(path))
+        return make_fingerprint(path, md5)
+
+    # The second pass finds every PAK in the shared store and only links it into the profile.
+    modSettings._collect_metadata(cache, jobs)
+    monkeypatch.setattr(fingerprint, "make_fingerprint", deleted_mid_scan)
+    results = {(r["modName"], r["file"]): r for r in modSettings._collect_metadata(cache, jobs, True)}
+
+    assert len(results) == len(jobs)
+    assert results[(jobs[4][0], gone.name)]["failed"]
+    assert not any(r["failed"] for key, r in results.items() if key != (jobs[4][0], gone.name))
+
+
+def test_pipeline_error_fails_the_pak_and_its_duplicates(instance, monkeypatch):
+    organizer, root, mod_names = instance
+    original = next((root / "mods" / mod_names[2] / "PAK_FILES").glob("*.pak"))
+    for mod_name in mod_names[5:7]:
+        shutil.copy2(original, root / "mods" / mod_name / "PAK_FILES" / original.name)
+    duplicates = {(mod_name, original.name) for mod_name in (mod_names[2], *mod_names[5:7])}
+    store_put = modsCache.MetadataStore.put
+
+    def broken_put(self, key, data):
+        if data["Folder"]["value"] == original.stem:
+            raise sqlite3.OperationalError("disk I/O error")
+        return store_put(self, key, data)
+
+    monkeypatch.setattr(modsCache.MetadataStore, "put", broken_put)
+    before = _generate(organizer)
+    cache = modsCache.open_cache(organizer.profile().absolutePath())
+    results = {(r["modName"], r["file"]): r for r in modSettings._collect_metadata(cache, _jobs(root, mod_names), True)}
+
+    assert {key for key, r in results.items() if r["failed"]} == duplicates
+    assert original.stem not in before
+    # The failed run was not recorded as the inputs' result, so the next launch reads the PAK again.
+    monkeypatch.setattr(modsCache.MetadataStore, "put", store_put)
+    assert _generate(organizer).count(f'value="{original.stem}"') == len(duplicates)
+
+
+def test_conflict_report_uses_the_listings_kept_at_extraction(instance, monkeypatch):
+    organizer, root, mod_names = instance
+    monkeypatch.setattr(modSettings, "keep_listings", True)
+    original = next((root / "mods" / mod_names[2] / "PAK_FILES").glob("*.pak"))
+    shutil.copy2(original, root / "mods" / mod_names[8] / "PAK_FILES" / original.name)
+    _generate(organizer)
+
+    def no_listing(pak_path):
+        raise AssertionError(f"{pak_path} listed again")
+
+    monkeypatch.setattr(modSettings.pak_extractor, "list", no_listing)
+    conflicts = modSettings.write_conflict_report(organizer, organizer.modList(), organizer.profile())
+
+    report = json.loads((_settings_path(organizer).parent / modSettings.CONFLICT_REPORT_NAME).read_text(encoding="utf-8"))
+    assert conflicts == len(report) > 0
+    meta = f"mods/{original.stem.lower()}/meta.lsx"
+    # The later mod in the load order wins.
+    assert report[meta] == [{"mod": mod_names[8], "pak": original.name}, {"mod": mod_names[2], "pak": original.name}]
+    assert all(len(providers) > 1 for providers in report.values())
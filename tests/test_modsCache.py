@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from baldursgate3 import fingerprint, modsCache
+
+
+def _listing(key, files=200):
+    return [f"Public/{key}/Stats/Generated/Data/file_{i}.txt" for i in range(files)]
+
+
+def test_listings_and_prefixes_count_towards_the_size_limit(tmp_path):
+    store = modsCache.MetadataStore(tmp_path / "metadataCache.db", size_limit=1 << 30)
+    try:
+        for i in range(40):
+            key = f"{i:032x}"
+            store.put(key, {"Name": {"value": key, "type": "LSString"}})
+            store.put_listing(key, _listing(key))
+            store._conn.execute("UPDATE metadata SET last_used = ? WHERE key = ?", (i, key))
+            store.flush()
+        metadata_size = store._conn.execute("SELECT SUM(size) FROM metadata").fetchone()[0]
+        total = store._stored_size()
+        assert total > 2 * metadata_size
+
+        store.size_limit = total // 2
+        store.evict()
+
+        assert store._stored_size() <= store.size_limit
+        keys = [key for (key,) in store._conn.execute("SELECT key FROM metadata ORDER BY key")]
+        assert keys and keys[0] != f"{0:032x}"
+        assert [key for (key,) in store._conn.execute("SELECT key FROM listings ORDER BY key")] == keys
+        prefixes = {path for (path,) in store._conn.execute("SELECT path FROM prefixes")}
+        assert prefixes == {f"Public/{key}/Stats/Generated/Data" for key in keys}
+        assert store.get_listing(keys[-1]) == _listing(keys[-1])
+
+        # Prefix ids freed by eviction are not handed out twice.
+        store.put_listing("new", _listing("new"))
+        store.flush()
+        assert store.get_listing("new") == _listing("new")
+        assert store.get_listing(keys[0]) == _listing(keys[0])
+    finally:
+        store._conn.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    store = modsCache.MetadataStore(tmp_path / "metadataCache.db")
+    cache = modsCache.ModsCache(tmp_path, store)
+    yield cache
+    cache._conn.close()
+    store._conn.close()
+
+
+def _entry(md5):
+    return {"Name": {"value": md5, "type": "LSString"}, fingerprint.FINGERPRINT_KEY: [1, 2, 3, md5]}
+
+
+def _rows(cache):
+    return cache._conn.execute("SELECT mod, file, md5 FROM files ORDER BY mod, file").fetchall()
+
+
+def test_failed_flush_keeps_the_writes_for_the_next_one(cache):
+    cache._conn.execute(
+        "CREATE TEMP TRIGGER full BEFORE INSERT ON files BEGIN SELECT RAISE(ABORT, 'database or disk is full'); END"
+    )
+    with cache.batch():
+        cache.put("A", "a.pak", _entry("a" * 32))
+        cache.put("B", "b.pak", _entry("b" * 32))
+    assert _rows(cache) == []
+
+    # Written while the failed rows were buffered again: the newer write wins, a deleted mod stays deleted.
+    with cache.batch():
+        cache.put("A", "a.pak", _entry("c" * 32))
+        cache.delete_mod("B")
+    cache._conn.execute("DROP TRIGGER full")
+    assert cache.flush()
+    assert _rows(cache) == [("A", "a.pak", "c" * 32)]
+    assert cache.store.get("b" * 32) is not None
+
+
+def test_a_batch_only_defers_its_own_thread(cache):
+    entered, release = threading.Event(), threading.Event()
+
+    def hold_batch():
+        with cache.batch():
+            cache.put("Background", "bg.pak", _entry("b" * 32))
+            entered.set()
+            release.wait(10)
+
+    thread = threading.Thread(target=hold_batch)
+    thread.start()
+    try:
+        assert entered.wait(10)
+        cache.put("Foreground", "fg.pak", _entry("f" * 32))
+        assert ("Foreground", "fg.pak", "f" * 32) in _rows(cache)
+    finally:
+        release.set()
+        thread.join()
+    assert len(_rows(cache)) == 2
@@ -0,0 +1,24 @@
+import pytest
+
+from baldursgate3 import modSettings
+
+classifier = modSettings._override_classifier
+
+
+@pytest.mark.parametrize(
+    "listing, folder, expected",
+    [
+        # "Public/" itself is a builtin folder, so any Public file makes an override.
+        (["Mods/MyMod/meta.lsx", "Public/MyMod/Stats/Generated/Data/Armor.txt"], "MyMod", (True, True)),
+        (["Mods/MyMod/meta.lsx", "Mods/MyMod/Story/story.div"], "MyMod", (False, True)),
+        (["Mods/MyMod/meta.lsx"], "MyMod", (False, False)),
+        (["Mods/MyMod/meta.lsx", "Public/Shared/Stats/Generated/Data/Armor.txt"], "MyMod", (True, False)),
+        (["Public/Gustav/Content/UI/[PAK]_UI/_merged.lsf"], None, (True, False)),
+        # Builtin folders under an ignored path are not overrides.
+        (["Mods/MyMod/meta.lsx", "Public/Game/GUI/Assets/icon.DDS"], "MyMod", (False, False)),
+        ([], "MyMod", (False, False)),
+    ],
+)
+def test_classify_listing(listing, folder, expected):
+    result = classifier.classify_text("\n".join(listing), folder)
+    assert (result["Override"], result["LoadOrder"]) == expected
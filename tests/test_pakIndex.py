@@ -0,0 +1,74 @@
+import pytest
+
+from baldursgate3 import pakIndex
+from baldursgate3.pakIndex import Provider
+
+LISTINGS = {
+    "md5-a": ["Mods/A/meta.lsx", "Public/Shared/Stats/Generated/Data/Armor.txt", "Public/A/Assets/a.dds"],
+    "md5-b": ["Mods/B/meta.lsx", "Public/Shared/Stats/Generated/Data/Armor.txt", "Public/Shared/GUI/icon.dds"],
+    "md5-c": ["Mods/C/meta.lsx", "Public\\Shared\\GUI\\ICON.dds"],
+    "md5-c2": ["Mods/C/meta.lsx", "Public/C/Assets/c.dds"],
+}
+
+
+@pytest.fixture
+def index():
+    return pakIndex.PakFileIndex()
+
+
+# Updates the index with (mod, pak) -> md5 and returns the md5s whose listing it read.
+def _update(index, paks, priorities) -> list[str]:
+    reads = []
+
+    def read_listing(md5, path):
+        reads.append(md5)
+        return LISTINGS.get(md5)
+
+    indexed = index.update({key: (md5, f"/mods/{key[0]}/{key[1]}") for key, md5 in paks.items()}, priorities, read_listing)
+    assert indexed == len(reads)
+    return reads
+
+
+def _paks(**md5s):
+    return {(mod, f"{mod}.pak"): md5 for mod, md5 in md5s.items()}
+
+
+def test_providers_winner_and_conflicts(index):
+    _update(index, _paks(A="md5-a", B="md5-b", C="md5-c"), {"A": 0, "B": 1, "C": 2})
+
+    armor = "Public/Shared/Stats/Generated/Data/Armor.txt"
+    assert index.providers(armor) == [Provider("B", "B.pak", 1), Provider("A", "A.pak", 0)]
+    # Paths are matched case-insensitively and with either separator.
+    assert index.winner("public\\shared\\gui\\icon.DDS") == Provider("C", "C.pak", 2)
+    assert index.winner("Public/Missing.txt") is None
+    assert set(index.conflicts()) == {armor.lower(), "public/shared/gui/icon.dds"}
+    assert set(index.conflicts("Public/Shared/GUI")) == {"public/shared/gui/icon.dds"}
+    assert set(index.conflicts_of("A")) == {armor.lower()}
+    # Distinct paths: three meta.lsx, the shared Armor.txt and icon.dds, and a.dds.
+    assert len(index) == 6
+
+
+def test_priorities_are_looked_up_at_query_time(index):
+    paks = _paks(A="md5-a", B="md5-b")
+    _update(index, paks, {"A": 0, "B": 1})
+    assert _update(index, paks, {"A": 5, "B": 1}) == []
+    assert index.winner("Public/Shared/Stats/Generated/Data/Armor.txt").mod == "A"
+
+
+def test_only_changed_paks_are_read_again(index):
+    _update(index, _paks(A="md5-a", B="md5-b", C="md5-c"), {"A": 0, "B": 1, "C": 2})
+
+    assert _update(index, _paks(A="md5-a", B="md5-b", C="md5-c2"), {"A": 0, "B": 1, "C": 2}) == ["md5-c2"]
+    assert index.providers("Public/Shared/GUI/icon.dds") == [Provider("B", "B.pak", 1)]
+    assert index.winner("Public/C/Assets/c.dds") == Provider("C", "C.pak", 2)
+
+    # Removed PAKs leave the index without anything being read.
+    assert _update(index, _paks(A="md5-a", C="md5-c2"), {"A": 0, "C": 2}) == []
+    assert index.conflicts() == {}
+    assert index.winner("Public/Shared/Stats/Generated/Data/Armor.txt") == Provider("A", "A.pak", 0)
+
+
+def test_unreadable_paks_are_retried(index):
+    assert _update(index, _paks(D="md5-unknown"), {"D": 0}) == ["md5-unknown"]
+    assert _update(index, _paks(D="md5-unknown"), {"D": 0}) == ["md5-unknown"]
+    assert len(index) == 0
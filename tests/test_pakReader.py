@@ -0,0 +1,102 @@
+import random
+import zlib
+
+import pytest
+
+import synthetic
+from baldursgate3 import pakReader
+
+
+@pytest.fixture(autouse=True)
+def pure_python_lz4(monkeypatch):
+    # The lz4 module, when installed, would hide the decoder below.
+    monkeypatch.setattr(pakReader, "_lz4_block", None)
+
+
+def _files(count=6, seed=1):
+    rng = random.Random(seed)
+    return synthetic.mod_pak_files(rng, "TestMod", "Test Mod", count)
+
+
+@pytest.mark.parametrize("version", [15, 16, 18])
+@pytest.mark.parametrize("method", [0, 1, 2])
+def test_round_trip(tmp_path, version, method):
+    files = _files()
+    pak = tmp_path / "TestMod.pak"
+    synthetic.write_pak(pak, files, version=version, method=method)
+
+    reader = pakReader.LSPKReader(pak)
+    assert reader.version == version
+    assert reader.listing() == [name for name, _ in files]
+    assert [reader.read(entry) for entry in reader.entries] == [data for _, data in files]
+    contents = pakReader.NativeExtractor().read(pak)
+    assert contents.meta_lsx == files[0][1]
+
+
+def test_lz4_overlapping_and_long_matches():
+    # "ab", then a 10 byte match at offset 2 (overlapping its own output), then a 20 byte match at
+    # offset 12 (15 + extension byte), and the closing literal-only sequence.
+    block = b"\x26ab\x02\x00" + b"\x0f\x0c\x00\x01" + b"\x10Z"
+    expected = b"ab" + b"ababababab" + b"abababababab" + b"abababab" + b"Z"
+    assert pakReader.lz4_block_decompress(block, len(expected)) == expected
+
+
+def test_lz4_long_literals_and_plain_match():
+    literals = bytes(range(40))
+    block = b"\xf4" + bytes([40 - 15]) + literals + b"\x28\x00" + b"\x10!"
+    expected = literals + literals[:8] + b"!"
+    assert pakReader.lz4_block_decompress(block, len(expected)) == expected
+
+
+@pytest.mark.parametrize(
+    "block, size",
+    [
+        (b"\x10a\x05\x00", 5),  # match reaching before the start of the output
+        (b"\x10a\x00\x00", 5),  # zero offset
+        (b"\xf0", 20),  # literal length extension missing
+        (b"\x30ab", 3),  # literals cut short
+    ],
+)
+def test_lz4_corrupt_blocks(block, size):
+    with pytest.raises(pakReader.PakFormatError):
+        pakReader.lz4_block_decompress(block, size)
+
+
+def test_zlib_entry_is_decompressed():
+    data = b"meta" * 100
+    assert pakReader._decompress(zlib.compress(data), 1, len(data)) == data
+
+
+def test_split_archive_reads_every_part(tmp_path):
+    files = _files(9)
+    pak = tmp_path / "Split.pak"
+    synthetic.write_pak(pak, files, parts=3)
+
+    reader = pakReader.LSPKReader(pak)
+    assert reader.num_parts == 3
+    assert {entry.archive_part for entry in reader.entries} == {0, 1, 2}
+    assert [reader.read(entry) for entry in reader.entries] == [data for _, data in files]
+
+
+def test_not_a_package(tmp_path):
+    pak = tmp_path / "Broken.pak"
+    pak.write_bytes(b"garbage" * 10)
+    with pytest.raises(pakReader.PakFormatError):
+        pakReader.LSPKReader(pak)
+    assert pakReader.NativeExtractor().try_read(pak) is None
+
+
+def test_solid_archive_falls_back_to_divine(tmp_path, divine_extractor):
+    files = _files()
+    pak = tmp_path / "Solid.pak"
+    synthetic.write_pak(pak, files, flags=pakReader._PACKAGE_FLAG_SOLID)
+
+    native = pakReader.NativeExtractor()
+    assert native.try_read(pak) is None
+    with pytest.raises(pakReader.PakFormatError):
+        native.read(pak)
+
+    contents = pakReader.FallbackExtractor(native, divine_extractor).read(pak)
+    assert contents.meta_lsx == files[0][1]
+    # The file table is readable even in solid packages, so listing needs no Divine run.
+    assert contents.listing == [name for name, _ in files]
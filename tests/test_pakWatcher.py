@@ -0,0 +1,65 @@
+import os
+import threading
+
+from baldursgate3 import pakWatcher
+
+
+class _FakeQtBackend:
+    # Accepts every folder up to a limit, as QFileSystemWatcher does until it runs out of handles.
+    def __init__(self, on_change, limit=None):
+        self.on_change = on_change
+        self.limit = limit
+        self.paths = []
+
+    def add(self, paths):
+        accepted = paths if self.limit is None else paths[:max(self.limit - len(self.paths), 0)]
+        self.paths.extend(accepted)
+        return [path for path in paths if path not in accepted]
+
+    def remove(self, paths):
+        self.paths = [path for path in self.paths if path not in paths]
+
+    def stop(self):
+        self.paths = []
+
+
+def _mods(tmp_path, count):
+    names = [f"Mod{i}" for i in range(count)]
+    for name in names:
+        (tmp_path / name / "PAK_FILES").mkdir(parents=True)
+    return names
+
+
+def _poller_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "BG3 PAK poller"]
+
+
+def test_no_polling_thread_while_qt_watches_everything(tmp_path, monkeypatch):
+    monkeypatch.setattr(pakWatcher, "_QtBackend", _FakeQtBackend)
+    before = len(_poller_threads())
+    watcher = pakWatcher.PakWatcher(tmp_path)
+    try:
+        watcher.watch(_mods(tmp_path, 3))
+        assert watcher._poller is None
+        assert len(_poller_threads()) == before
+        assert len(watcher._qt.paths) == 4
+    finally:
+        watcher.stop()
+
+
+def test_folders_qt_refuses_are_polled(tmp_path, monkeypatch):
+    monkeypatch.setattr(pakWatcher, "_QtBackend", lambda on_change: _FakeQtBackend(on_change, limit=2))
+    watcher = pakWatcher.PakWatcher(tmp_path, poll_interval=3600)
+    try:
+        mod_names = _mods(tmp_path, 3)
+        watcher.watch(mod_names)
+        assert watcher._poller is not None
+        assert len(watcher._polled) == 2
+
+        watcher.changes()
+        polled_mod = next(name for name in mod_names if os.path.normcase(tmp_path / name / "PAK_FILES") in watcher._polled)
+        (tmp_path / polled_mod / "PAK_FILES" / "New.pak").write_bytes(b"LSPK")
+        watcher._poller.poll()
+        assert watcher.changes() == {polled_mod}
+    finally:
+        watcher.stop()
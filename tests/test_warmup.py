@@ -0,0 +1,23 @@
+import threading
+
+from baldursgate3 import modSettings, modsCache, warmup
+
+
+def test_warmup_work_stays_off_the_launch_pool(instance, monkeypatch):
+    organizer, root, mod_names = instance
+    threads = []
+    get_md5 = modSettings.get_md5
+
+    def recording_md5(path):
+        threads.append(threading.current_thread().name)
+        return get_md5(path)
+
+    monkeypatch.setattr(modSettings, "get_md5", recording_md5)
+    indexer = warmup.WarmupIndexer(chunk_size=4)
+    profile_path = organizer.profile().absolutePath()
+    indexer.start(profile_path, [(name, str(root / "mods" / name)) for name in mod_names], str(root / "data"))
+    assert indexer.wait(30)
+
+    assert indexer.done == indexer.total == len(mod_names) + 1
+    assert threads and all(name.startswith("bg3-warmup") for name in threads)
+    assert modSettings.stale_jobs(modsCache.open_cache(profile_path), modSettings.gustav_jobs(root / "data")) == []